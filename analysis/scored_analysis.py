@@ -0,0 +1,287 @@
+import os
+import json
+import pickle
+import numpy as np
+
+# Out-of-core decomposition and clustering of the scored datasets - see 2_decomposition.ipynb and 3_clustering.ipynb
+# The scored features are read a chunk at a time from a columnar store (Parquet, or a CSV for small datasets), and fitted with
+# incremental estimators - IncrementalPCA, MiniBatchNMF and MiniBatchKMeans - so memory depends on the chunk size, not the corpus
+# t-SNE and spectral clustering don't scale past a few thousand points, so they're fitted to a reproducible sample, and the
+# spectral clusters carried over to every other document by their nearest sampled neighbours
+# Every result is saved alongside the fitted models, so plots load the results rather than refitting
+
+DEFAULT_STORE_PATH = 'scored_datasets/combined.parquet'
+DEFAULT_RESULTS_DIR = 'scored_datasets/analysis'
+DEFAULT_CHUNKSIZE = 100000
+RESULTS_FILENAME = 'results.parquet'
+SAMPLE_FILENAME = 'sample.parquet'
+MODELS_FILENAME = 'models.pkl'
+INFO_FILENAME = 'analysis_info.json'
+
+id_columns = ['type','year','party']
+families = ['vague','subj','emot']
+
+# Eras used to colour the clustering plots - each runs from its first year up to (not including) its last
+era_dict = {'1945-1960':(1945,1960),
+            '1960-1980':(1960,1980),
+            '1980-2010':(1980,2010),
+            '2010-2022':(2010,2023)}
+
+def feature_columns(columns, family=None):
+    # Score columns of a scored dataset - every family's, or just one family's, in dataset order
+    prefixes = families if family is None else [family]
+    return [column for column in columns if any(column.startswith(prefix+'_') for prefix in prefixes)]
+
+def years_of(dates):
+    # Calendar year of each date, parsed in one vectorised call
+    import pandas as pd
+    return pd.to_datetime(pd.Series(dates)).dt.year.to_numpy()
+
+def decade_of(dates):
+    return (years_of(dates)//10)*10
+
+def era_of(dates, era_dict=era_dict):
+    # Era of each date by binary search on the era boundaries, as a categorical - NaN for dates outside every era
+    import pandas as pd
+    starts = np.array([first_year for first_year,last_year in era_dict.values()])
+    ends = np.array([last_year for first_year,last_year in era_dict.values()])
+    order = np.argsort(starts)
+    years = years_of(dates)
+    idx = np.searchsorted(starts[order], years, side='right')-1
+    found = (idx>=0)&(years<ends[order][np.maximum(idx,0)])
+    codes = np.where(found, order[np.maximum(idx,0)], -1)
+    return pd.Categorical.from_codes(codes, categories=list(era_dict.keys()))
+
+def store_columns(path):
+    # Column names of a store, without reading any rows
+    if path.endswith('.csv'):
+        import pandas as pd
+        return pd.read_csv(path, nrows=0).columns.to_list()
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).schema_arrow.names
+
+def store_num_rows(path):
+    if path.endswith('.csv'):
+        return sum(len(chunk) for chunk in iter_chunks(path, columns=store_columns(path)[:1]))
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+def iter_chunks(path, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    # Read a store a chunk of rows at a time, as DataFrames of only the columns asked for
+    import pandas as pd
+    if path.endswith('.csv'):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+        return
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+        yield batch.to_pandas()
+
+def convert_to_store(csv_path, store_path=DEFAULT_STORE_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    # Convert a scored CSV (e.g. combined.csv) to a Parquet store a chunk at a time - dates as timestamps,
+    # text type and party dictionary-encoded, and scores as float64
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    tmp_path = store_path+'.tmp'
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = chunk.drop(columns=['Unnamed: 0'], errors='ignore')
+            arrays = []
+            for column in chunk.columns:
+                if column=='year':
+                    arrays.append(pa.array(pd.to_datetime(chunk[column]).to_numpy().astype('datetime64[ms]')))
+                elif column in id_columns:
+                    arrays.append(pa.array(chunk[column].astype(object), type=pa.string(), from_pandas=True).dictionary_encode())
+                else:
+                    arrays.append(pa.array(chunk[column].to_numpy(dtype=np.float64), from_pandas=True))
+            table = pa.Table.from_arrays(arrays, names=list(chunk.columns))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression='zstd')
+            writer.write_table(table)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, store_path)
+    return n_rows
+
+def iter_feature_arrays(path, columns, chunksize=DEFAULT_CHUNKSIZE, min_rows=1):
+    # Yield the complete rows (no NaN in any column) of a store as float64 arrays, a chunk at a time
+    # ...a final chunk with fewer than min_rows rows is merged into the one before it, as incremental fits need a minimum batch
+    held = None
+    for chunk in iter_chunks(path, columns, chunksize):
+        array = chunk[columns].to_numpy(dtype=np.float64)
+        array = array[~np.isnan(array).any(axis=1)]
+        if len(array)==0:
+            continue
+        if held is not None and len(array)<min_rows:
+            held = np.concatenate([held, array])
+            continue
+        if held is not None:
+            yield held
+        held = array
+    if held is not None:
+        yield held
+
+def fit_incremental(estimator, path, columns, chunksize=DEFAULT_CHUNKSIZE, n_passes=1, min_rows=1, batch_size=None, random_state=0,
+                    progress=False):
+    # Fit an estimator with partial_fit, over n_passes through the store a chunk at a time
+    # ...with a batch_size, each chunk is shuffled and fed in mini-batches of about that many rows - one update each,
+    #    for the mini-batch estimators - rather than as a single update
+    rng = np.random.default_rng(random_state)
+    # A store that fits in a single chunk is only read once, however many passes are made over it
+    in_memory = list(iter_feature_arrays(path, columns, chunksize, min_rows)) if n_passes>1 and store_num_rows(path)<=chunksize else None
+    for n_pass in range(n_passes):
+        arrays = iter(in_memory) if in_memory is not None else iter_feature_arrays(path, columns, chunksize, min_rows)
+        if progress:
+            from tqdm import tqdm
+            arrays = tqdm(arrays, desc=f"Fitting {type(estimator).__name__} (pass {n_pass+1}/{n_passes})")
+        for array in arrays:
+            if batch_size is None:
+                estimator.partial_fit(array)
+                continue
+            # array_split keeps every batch at least batch_size rows (once the chunk is that big), so none is too small to fit
+            for batch in np.array_split(array[rng.permutation(len(array))], max(1, len(array)//batch_size)):
+                estimator.partial_fit(batch)
+    return estimator
+
+def sample_store(path, columns, n=5000, random_state=0, chunksize=DEFAULT_CHUNKSIZE):
+    # A reproducible uniform sample of n complete rows, drawn in one pass over the store - with each row's position in the store
+    import pandas as pd
+    n_rows = store_num_rows(path)
+    rng = np.random.default_rng(random_state)
+    chosen = np.sort(rng.choice(n_rows, min(n, n_rows), replace=False))
+    samples,start = [],0
+    for chunk in iter_chunks(path, columns, chunksize):
+        positions = chosen[(chosen>=start)&(chosen<start+len(chunk))]
+        sample = chunk.iloc[positions-start].copy()
+        sample.index = positions
+        samples.append(sample)
+        start += len(chunk)
+    sample = pd.concat(samples) if len(samples)>0 else pd.DataFrame(columns=columns)
+    feature_names = feature_columns(columns)
+    return sample[~sample[feature_names].isna().any(axis=1)]
+
+def _transform(estimator, array, complete):
+    # Apply a fitted model to the complete rows of a chunk, leaving NaN (or -1 for cluster labels) in incomplete rows
+    if hasattr(estimator, 'predict'):
+        output = np.full(len(array), -1, dtype=np.int32)
+        if complete.any():
+            output[complete] = estimator.predict(array[complete])
+        return output
+    output = None
+    if complete.any():
+        transformed = estimator.transform(array[complete])
+        output = np.full((len(array),transformed.shape[1]), np.nan)
+        output[complete] = transformed
+    return output
+
+def run_analysis(store_path=DEFAULT_STORE_PATH, results_dir=DEFAULT_RESULTS_DIR, n_clusters=4, n_components=2,
+                 sample_size=5000, chunksize=DEFAULT_CHUNKSIZE, batch_size=1024, min_updates=500, random_state=0, progress=True):
+    # Fit every model over the store, transform it a chunk at a time, and save the results, sample and models to results_dir:
+    # ...one-component NMF score per family (vague_score, subj_score, emot_score), as 2_decomposition.ipynb
+    # ...PCA and NMF projections and Mini-batch K-Means clusters of all the features, as 3_clustering.ipynb
+    # ...t-SNE projection and spectral clusters of a sample, with the spectral clusters extended to every row
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from sklearn.decomposition import IncrementalPCA,MiniBatchNMF
+    from sklearn.cluster import MiniBatchKMeans,SpectralClustering
+    from sklearn.manifold import TSNE
+    from sklearn.neighbors import KNeighborsClassifier
+
+    os.makedirs(results_dir, exist_ok=True)
+    columns = store_columns(store_path)
+    all_features = feature_columns(columns)
+    family_features = {family:feature_columns(columns, family) for family in families}
+    # Mini-batch estimators get as many passes over the store as it takes to make at least min_updates updates -
+    # one pass over the full Hansard corpus, but hundreds over the couple of thousand documents scored so far
+    n_passes = max(1, -(-min_updates//max(1, store_num_rows(store_path)//batch_size)))
+    fit = lambda estimator,features,min_rows=1: fit_incremental(estimator, store_path, features, chunksize, n_passes, min_rows,
+                                                                batch_size, random_state, progress)
+
+    # Decomposition and clustering over the full store
+    models = {family+'_score':fit(MiniBatchNMF(n_components=1, random_state=random_state), features)
+              for family,features in family_features.items() if len(features)>0}
+    models['pca'] = fit_incremental(IncrementalPCA(n_components=n_components), store_path, all_features, chunksize,
+                                    n_passes=1, min_rows=n_components, progress=progress) # ...an exact fit in a single pass
+    models['nmf'] = fit(MiniBatchNMF(n_components=n_components, random_state=random_state), all_features)
+    models['kmeans'] = fit(MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3), all_features, n_clusters)
+
+    # t-SNE and spectral clustering on the sample...
+    sample = sample_store(store_path, id_columns+all_features, sample_size, random_state, chunksize)
+    sample_array = sample[all_features].to_numpy(dtype=np.float64)
+    spectral_labels = SpectralClustering(n_clusters=n_clusters, random_state=random_state).fit_predict(sample_array)
+    tsne = TSNE(n_components=2, random_state=random_state, init='pca').fit_transform(sample_array)
+    # ...with every other document given the spectral cluster of its nearest sampled neighbours
+    models['spectral'] = KNeighborsClassifier(n_neighbors=5).fit(sample_array, spectral_labels)
+
+    sample_results = sample[id_columns].copy()
+    sample_results['tsne_1'],sample_results['tsne_2'] = tsne[:,0],tsne[:,1]
+    sample_results['spectral_cluster'] = spectral_labels.astype(np.int32)
+    sample_results['kmeans_cluster'] = models['kmeans'].predict(sample_array).astype(np.int32)
+    sample_results['row'] = sample.index.to_numpy()
+    sample_results.reset_index(drop=True).to_parquet(os.path.join(results_dir, SAMPLE_FILENAME))
+
+    # Transform the whole store a chunk at a time, writing each chunk of results as it's done
+    tmp_path = os.path.join(results_dir, RESULTS_FILENAME+'.tmp')
+    writer = None
+    chunks = iter_chunks(store_path, id_columns+all_features, chunksize)
+    if progress:
+        from tqdm import tqdm
+        chunks = tqdm(chunks, desc='Transforming')
+    try:
+        for chunk in chunks:
+            results = chunk[id_columns].copy()
+            results['decade'] = decade_of(chunk.year)
+            results['era'] = np.asarray(era_of(chunk.year).astype(object))
+            array = chunk[all_features].to_numpy(dtype=np.float64)
+            complete = ~np.isnan(array).any(axis=1)
+            for family,features in family_features.items():
+                if len(features)>0:
+                    family_array = chunk[features].to_numpy(dtype=np.float64)
+                    family_complete = ~np.isnan(family_array).any(axis=1)
+                    output = _transform(models[family+'_score'], family_array, family_complete)
+                    results[family+'_score'] = output[:,0] if output is not None else np.nan
+            for name in ['pca','nmf']:
+                output = _transform(models[name], array, complete)
+                for component in range(n_components):
+                    results[f"{name}_{component+1}"] = output[:,component] if output is not None else np.nan
+            results['kmeans_cluster'] = _transform(models['kmeans'], array, complete)
+            results['spectral_cluster'] = _transform(models['spectral'], array, complete)
+            table = pa.Table.from_pandas(results, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression='zstd')
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, os.path.join(results_dir, RESULTS_FILENAME))
+
+    with open(os.path.join(results_dir, MODELS_FILENAME), 'wb') as file:
+        pickle.dump(models, file, protocol=pickle.HIGHEST_PROTOCOL)
+    # Loadings of each model, readable without unpickling it
+    loadings = {family+'_score':dict(zip(features, models[family+'_score'].components_[0].tolist()))
+                for family,features in family_features.items() if len(features)>0}
+    loadings.update({name:[dict(zip(all_features, component.tolist())) for component in models[name].components_] for name in ['pca','nmf']})
+    with open(os.path.join(results_dir, INFO_FILENAME), 'w') as file:
+        json.dump({'store_path':store_path, 'features':all_features, 'n_clusters':n_clusters, 'n_components':n_components,
+                   'sample_size':len(sample), 'n_passes':n_passes, 'random_state':random_state,
+                   'pca_explained_variance_ratio':models['pca'].explained_variance_ratio_.tolist(),
+                   'loadings':loadings}, file, indent=1)
+    return load_results(results_dir)
+
+def load_results(results_dir=DEFAULT_RESULTS_DIR, columns=None, sample=False):
+    # Saved results (or, with sample=True, the t-SNE sample) of run_analysis() - for plotting without refitting anything
+    import pandas as pd
+    return pd.read_parquet(os.path.join(results_dir, SAMPLE_FILENAME if sample else RESULTS_FILENAME), columns=columns)
+
+def load_models(results_dir=DEFAULT_RESULTS_DIR):
+    with open(os.path.join(results_dir, MODELS_FILENAME), 'rb') as file:
+        return pickle.load(file)
+
+def analysis_info(results_dir=DEFAULT_RESULTS_DIR):
+    with open(os.path.join(results_dir, INFO_FILENAME)) as file:
+        return json.load(file)
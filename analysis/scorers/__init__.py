@@ -0,0 +1 @@
+from scorers.lemmatisation import LemmaCache,lemma_cache
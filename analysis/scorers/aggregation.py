@@ -0,0 +1,277 @@
+import numpy as np
+from scorers.cleaning import word_pattern
+from scorers.lemmatisation import lemma_cache
+from scorers.inference import DEFAULT_BATCH_SIZE,batch_predict
+from scorers.resources import load_classifier
+from scorers.segmentation import split_sentences
+from scorers.instrumentation import instrument
+from scorers.objectivity_vs_subjectivity import speculative_sentence_flags
+from scorers.pipeline import all_families,load_lexicon_table,load_scorer_resources,_start_pool
+
+__all__ = ['feature_statistics','WindowStatistics','ScoreAccumulator','score_windows','score_windows_corpus',
+           'score_windows_dataframe','aggregate_dataframe']
+
+# Granular scoring, with streaming aggregation - see 1_scoring_datasets.ipynb
+# Rather than one score per document, each window of a text (the whole text, or each of its paragraphs) gets the sufficient
+# statistics of every feature - a numerator and a denominator, e.g. matching tokens and tokens, or summed sentence scores and
+# scored sentences - so windows, speeches, days, MPs or parties are aggregated just by adding them up, and each feature is
+# numerator/denominator of the sums
+# ...the windows of a text always add up to exactly that text's document-level statistics, so their weighted means reproduce
+#    score_document() (up to floating point summation order)
+# ...aggregating separately scored speeches gives the scores of the speeches joined with a sentence break between each - joining
+#    them with '' as before can also run the last sentence of one into the first of the next
+
+# Each family's features, in the order score_document() gives them, with the statistic each is the ratio of - and whether it's
+# reported as one minus that ratio
+feature_statistics = {'vague':[('inverse_deictic_word_freq','deictic_word',True),
+                               ('approximator_word_freq','approximator_word',False),
+                               ('inverse_shield_word_freq','shield_word',True),
+                               ('booster_word_freq','booster_word',False),
+                               ('avg_semantic_size','semantic_size',False)],
+                      'subj':[('subjective_sentence_freq','subjective_sentence',False),
+                              ('avg_subjective_sentence_score','subjective_sentence_score',False),
+                              ('speculative_sentence_freq','speculative_sentence',False),
+                              ('modal_verb_freq','modal_verb',False),
+                              ('subjective_adjective_freq','subjective_adjective',False)],
+                      'emot':[('avg_arousal_glasgow','arousal_glasgow',False),
+                              ('avg_arousal_warriner','arousal_warriner',False),
+                              ('avg_valence_glasgow','valence_glasgow',False),
+                              ('avg_valence_warriner','valence_warriner',False),
+                              ('avg_valence_rheault','valence_rheault',False),
+                              ('avg_anger_sentence_score','anger',False),
+                              ('avg_fear_sentence_score','fear',False),
+                              ('avg_joy_sentence_score','joy',False),
+                              ('avg_sadness_sentence_score','sadness',False)]}
+
+def _feature_layout(families):
+    # (feature name, statistic, inverse) of every feature of the selected families, with family-prefixed names
+    return [(family+'_'+name,statistic,inverse) for family in families for name,statistic,inverse in feature_statistics[family]]
+
+class WindowStatistics:
+    # Sufficient statistics of every feature for each window of a text - numerators and denominators are (windows, features) arrays,
+    # and spans holds each window's (start, end) offsets into the text
+    def __init__(self, feature_names, inverse, spans, numerators, denominators, tokens, sentences):
+        self.feature_names = feature_names
+        self.inverse = inverse
+        self.spans = spans
+        self.numerators = numerators
+        self.denominators = denominators
+        self.tokens = tokens
+        self.sentences = sentences
+
+    def __len__(self):
+        return len(self.spans)
+
+    def scores(self):
+        # Feature scores of each window, as a (windows, features) array - NaN where a window has nothing to score a feature on
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = self.numerators/self.denominators
+        return np.where(self.inverse, 1-ratios, ratios)
+
+    def total(self):
+        # The statistics of the whole text, as a single window
+        return WindowStatistics(self.feature_names, self.inverse, np.array([[self.spans[0,0],self.spans[-1,1]]]) if len(self.spans)>0 else self.spans,
+                                self.numerators.sum(axis=0, keepdims=True), self.denominators.sum(axis=0, keepdims=True),
+                                self.tokens.sum(keepdims=True), self.sentences.sum(keepdims=True))
+
+def _window_spans(text, windows):
+    # 'document' is one window over the whole text, 'paragraph' one per line, with blank lines dropped - as clean_to_paragraphs()
+    if windows=='document':
+        return np.array([[0,len(text)]], dtype=np.int64)
+    if windows=='paragraph':
+        spans,start = [],0
+        while start<=len(text):
+            end = text.find('\n', start)
+            if end==-1:
+                end = len(text)
+            if end>start:
+                spans.append((start,end))
+            start = end+1
+        return np.array(spans, dtype=np.int64).reshape(-1,2)
+    raise ValueError(f"Unknown window {windows!r}")
+
+def _window_of(spans, offsets):
+    # Window holding each offset - anything before the first window (e.g. blank lines at the top) counts towards the first
+    return np.maximum(np.searchsorted(spans[:,0], offsets, side='right')-1, 0)
+
+@instrument
+def score_windows(text, families=all_families, windows='paragraph', batch_size=DEFAULT_BATCH_SIZE):
+    # Sufficient statistics of every feature for each window of a text - None for a text with no words, as score_document()
+    # ...sentences are segmented over the whole text, as the document-level scorers do, and each counts towards the window it starts in
+    families = tuple(families)
+    matches = list(word_pattern.finditer(text))
+    if len(matches)==0:
+        return None
+    text_list = [match.group().lower() for match in matches] # ...the same words as clean(text)
+    spans = _window_spans(text, windows)
+    n_windows = len(spans)
+    token_windows = _window_of(spans, np.fromiter((match.start() for match in matches), dtype=np.int64, count=len(matches)))
+    window_tokens = np.bincount(token_windows, minlength=n_windows).astype(np.float64)
+    layout = _feature_layout(families)
+    statistics = dict()
+
+    # Word lists - matching tokens over tokens - and norm lexicons - summed norms over lemmas found in the lexicon
+    table = load_lexicon_table(families)
+    if len(table.word_list_names)>0:
+        memberships = table.word_list_table[:, table.token_ids(text_list)]
+        for name,membership in zip(table.word_list_names, memberships):
+            statistics[name] = (np.bincount(token_windows, weights=membership, minlength=n_windows),window_tokens)
+    if len(table.norm_lexicon_names)>0:
+        norms = table.norm_table[:, table.token_ids(lemma_cache.lemmatise_list(text_list))]
+        for name,norm in zip(table.norm_lexicon_names, norms):
+            found = ~np.isnan(norm)
+            statistics[name] = (np.bincount(token_windows, weights=np.where(found, norm, 0.0), minlength=n_windows),
+                                np.bincount(token_windows, weights=found, minlength=n_windows))
+
+    def sentence_statistics(values, sentence_windows):
+        # Summed values over the sentences with a value, per window - as the nanmean of the sentence-level scorers
+        found = ~np.isnan(values)
+        return (np.bincount(sentence_windows, weights=np.where(found, values, 0.0), minlength=n_windows),
+                np.bincount(sentence_windows, weights=found, minlength=n_windows))
+
+    window_sentences = np.zeros(n_windows)
+    if 'subj' in families:
+        sentences = split_sentences(text, 'period')
+        sentence_windows = _window_of(spans, sentences.spans[:,0])
+        window_sentences = np.bincount(sentence_windows, minlength=n_windows).astype(np.float64)
+        outputs = batch_predict(load_classifier('subjectivity'), sentences, ['class_ids','probabilities'], encoding='utf-16', batch_size=batch_size)
+        statistics['subjective_sentence'] = (np.bincount(sentence_windows, weights=outputs['class_ids'][:,0], minlength=n_windows),window_sentences)
+        statistics['subjective_sentence_score'] = sentence_statistics(outputs['probabilities'][:,1].astype(np.float64), sentence_windows)
+        statistics['speculative_sentence'] = (np.bincount(sentence_windows, weights=speculative_sentence_flags(sentences), minlength=n_windows),
+                                              window_sentences)
+    if 'emot' in families:
+        sentences = split_sentences(text, 'punkt')
+        sentence_windows = _window_of(spans, sentences.spans[:,0])
+        for emotion in ['anger','fear','joy','sadness']:
+            outputs = batch_predict(load_classifier(emotion), sentences, ['predictions'], encoding='utf-8', batch_size=batch_size)
+            statistics[emotion] = sentence_statistics(outputs['predictions'][:,0].astype(np.float64), sentence_windows)
+        if 'subj' not in families:
+            window_sentences = np.bincount(sentence_windows, minlength=n_windows).astype(np.float64)
+
+    numerators = np.column_stack([statistics[statistic][0] for name,statistic,inverse in layout])
+    denominators = np.column_stack([statistics[statistic][1] for name,statistic,inverse in layout])
+    return WindowStatistics([name for name,statistic,inverse in layout], np.array([inverse for name,statistic,inverse in layout]),
+                            spans, numerators, denominators, window_tokens, window_sentences)
+
+def _score_windows_task(args):
+    text,families,windows = args
+    return score_windows(text, families, windows)
+
+def score_windows_corpus(texts, families=all_families, windows='paragraph', processes=None, chunksize=4, threads_per_worker=1,
+                         lemma_cache_path=None):
+    # Yield WindowStatistics (or None for a text with no words) for each text, in input order
+    # ...processes=1 scores in this process, otherwise texts are fanned out to a pool of workers, as score_corpus()
+    families = tuple(families)
+    tasks = ((text,families,windows) for text in texts)
+    if processes==1:
+        if lemma_cache_path is not None:
+            lemma_cache.load(lemma_cache_path)
+        load_scorer_resources(families)
+        yield from map(_score_windows_task, tasks)
+        return
+    pool = _start_pool(families, processes, threads_per_worker, lemma_cache_path)
+    try:
+        yield from pool.imap(_score_windows_task, tasks, chunksize)
+    except BaseException:
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+
+class ScoreAccumulator:
+    # Running sums of the sufficient statistics of every feature, by group - add as many windows, speeches or documents as needed,
+    # then read off each group's scores, without keeping (or re-scoring) any text
+    def __init__(self):
+        self.feature_names = None
+        self.inverse = None
+        self.groups = dict()
+
+    def add(self, key, statistics):
+        # Add every window of a text's WindowStatistics to a group
+        if statistics is None:
+            return # ...texts with no words add nothing
+        if self.feature_names is None:
+            self.feature_names,self.inverse = statistics.feature_names,statistics.inverse
+        sums = [statistics.numerators.sum(axis=0), statistics.denominators.sum(axis=0),
+                float(statistics.tokens.sum()), float(statistics.sentences.sum()), len(statistics), 1]
+        if key not in self.groups:
+            self.groups[key] = sums
+            return
+        group = self.groups[key]
+        for idx,value in enumerate(sums):
+            group[idx] = group[idx]+value
+
+    def merge(self, other):
+        # Fold in another accumulator - e.g. one per chunk of a dataset, or per worker
+        for key,(numerators,denominators,tokens,sentences,windows,texts) in other.groups.items():
+            if self.feature_names is None:
+                self.feature_names,self.inverse = other.feature_names,other.inverse
+            if key not in self.groups:
+                self.groups[key] = [numerators.copy(),denominators.copy(),tokens,sentences,windows,texts]
+                continue
+            group = self.groups[key]
+            for idx,value in enumerate([numerators,denominators,tokens,sentences,windows,texts]):
+                group[idx] = group[idx]+value
+        return self
+
+    def to_frame(self, index_names=None):
+        # One row per group - each feature's score, and the number of texts, windows, tokens and sentences behind it
+        import pandas as pd
+        keys = list(self.groups.keys())
+        if len(keys)==0:
+            return pd.DataFrame()
+        numerators = np.vstack([self.groups[key][0] for key in keys])
+        denominators = np.vstack([self.groups[key][1] for key in keys])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = numerators/denominators
+        scores_df = pd.DataFrame(np.where(self.inverse, 1-ratios, ratios), columns=self.feature_names)
+        for idx,column in enumerate(['n_tokens','n_sentences','n_windows','n_texts']):
+            scores_df[column] = [self.groups[key][idx+2] for key in keys]
+        if all(isinstance(key, tuple) for key in keys):
+            scores_df.index = pd.MultiIndex.from_tuples(keys, names=index_names)
+        else:
+            scores_df.index = pd.Index(keys, name=index_names[0] if index_names is not None else None)
+        return scores_df
+
+def score_windows_dataframe(df, text_column, families=all_families, windows='paragraph', processes=None, chunksize=4,
+                            lemma_cache_path=None, desc=None):
+    # One row per window of every text - its row's index in df, window number and offsets into the text, and each feature's score
+    import pandas as pd
+    all_statistics = score_windows_corpus(df[text_column], families, windows, processes, chunksize, lemma_cache_path=lemma_cache_path)
+    if desc is not None:
+        from tqdm import tqdm
+        all_statistics = tqdm(all_statistics, total=len(df), desc=desc)
+    frames = []
+    for index,statistics in zip(df.index, all_statistics):
+        if statistics is None or len(statistics)==0:
+            continue
+        window_df = pd.DataFrame(statistics.scores(), columns=statistics.feature_names)
+        window_df.insert(0, 'row', index)
+        window_df.insert(1, 'window', np.arange(len(statistics)))
+        window_df.insert(2, 'start', statistics.spans[:,0])
+        window_df.insert(3, 'end', statistics.spans[:,1])
+        window_df['n_tokens'] = statistics.tokens
+        window_df['n_sentences'] = statistics.sentences
+        frames.append(window_df)
+    return pd.concat(frames, ignore_index=True) if len(frames)>0 else pd.DataFrame()
+
+def aggregate_dataframe(df, text_column, levels, families=all_families, windows='document', processes=None, chunksize=4,
+                        lemma_cache_path=None, desc=None):
+    # Score each text once and aggregate it at several levels at the same time, returning a DataFrame of scores per level
+    # ...levels maps a name to the column (or list of columns) to group by - e.g. for PMQs answers, rather than joining each day's
+    #    answers into one text: aggregate_dataframe(pmqs, 'answer_text', {'day':'date','mp':'answerer_name','party':'answerer_party'})
+    levels = {name:[columns] if isinstance(columns, str) else list(columns) for name,columns in levels.items()}
+    accumulators = {name:ScoreAccumulator() for name in levels}
+    level_keys = {name:list(df[columns].itertuples(index=False, name=None)) for name,columns in levels.items()}
+    all_statistics = score_windows_corpus(df[text_column], families, windows, processes, chunksize, lemma_cache_path=lemma_cache_path)
+    if desc is not None:
+        from tqdm import tqdm
+        all_statistics = tqdm(all_statistics, total=len(df), desc=desc)
+    for idx,statistics in enumerate(all_statistics):
+        if statistics is None:
+            continue
+        statistics = statistics.total() # ...summed over the windows once, rather than by every level
+        for name,accumulator in accumulators.items():
+            key = level_keys[name][idx]
+            accumulator.add(key if len(key)>1 else key[0], statistics)
+    return {name:accumulator.to_frame(levels[name]) for name,accumulator in accumulators.items()}
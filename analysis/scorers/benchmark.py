@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import numpy as np
+from scorers.cleaning import clean
+from scorers.lemmatisation import lemma_cache
+from scorers.lexicon import LexiconTable
+from scorers.inference import DEFAULT_BATCH_SIZE,batch_predict
+from scorers.segmentation import iter_sentence_spans
+from scorers.resources import load_classifier,load_lexicon
+from scorers.specificity_vs_vagueness import vagueness_word_lists,measure_vagueness
+from scorers.objectivity_vs_subjectivity import modal_verb_list,measure_subjectivity
+from scorers.rationality_vs_emotionality import emotionality_lexicon_names
+from scorers.pipeline import score_document,load_lexicon_table
+
+# Scorer throughput benchmark - run from analysis/ with: python -m scorers.benchmark --output benchmark.json
+# A reproducible corpus shaped like the three scored datasets is timed stage by stage - cleaning, lemmatisation,
+# segmentation, each lexicon feature, the speculative cue count and each classifier signature - and the results are saved
+# as JSON (with the git revision), so a run can be compared against one from another commit with --compare
+
+# Shape of each dataset's documents - words per document (lognormal median and spread), words per sentence and sentences per paragraph
+# ...manifestos from the forewords in manifesto-forewords/manifestos.csv, PMQs as a day's answers joined as in 1_scoring_datasets.ipynb
+corpus_profiles = {'manifesto':{'median_words':630, 'sigma':0.8, 'sentence_words':32, 'paragraph_sentences':4},
+                   'pmqs':{'median_words':3000, 'sigma':0.5, 'sentence_words':22, 'paragraph_sentences':3},
+                   'conference':{'median_words':5000, 'sigma':0.4, 'sentence_words':20, 'paragraph_sentences':2}}
+
+# Where real texts are sampled from, when they're present
+corpus_sources = {'manifesto':('../manifesto-forewords/manifestos.csv','foreword'),
+                  'conference':('../conference-speeches/conference.csv','content')}
+
+# Every feature in the scored datasets, with the stage its time is measured by - the two subjectivity features share one model call
+feature_stages = {'vague_inverse_deictic_word_freq':'lexicon:deictic_word',
+                  'vague_approximator_word_freq':'lexicon:approximator_word',
+                  'vague_inverse_shield_word_freq':'lexicon:shield_word',
+                  'vague_booster_word_freq':'lexicon:booster_word',
+                  'vague_avg_semantic_size':'lexicon:semantic_size',
+                  'subj_subjective_sentence_freq':'model:subjectivity',
+                  'subj_avg_subjective_sentence_score':'model:subjectivity',
+                  'subj_speculative_sentence_freq':'speculative_cues',
+                  'subj_modal_verb_freq':'lexicon:modal_verb',
+                  'subj_subjective_adjective_freq':'lexicon:subjective_adjective',
+                  'emot_avg_arousal_glasgow':'lexicon:arousal_glasgow',
+                  'emot_avg_arousal_warriner':'lexicon:arousal_warriner',
+                  'emot_avg_valence_glasgow':'lexicon:valence_glasgow',
+                  'emot_avg_valence_warriner':'lexicon:valence_warriner',
+                  'emot_avg_valence_rheault':'lexicon:valence_rheault',
+                  'emot_avg_anger_sentence_score':'model:anger',
+                  'emot_avg_fear_sentence_score':'model:fear',
+                  'emot_avg_joy_sentence_score':'model:joy',
+                  'emot_avg_sadness_sentence_score':'model:sadness'}
+
+# Frequent words every synthetic document draws on, alongside the lexicon vocabularies
+filler_words = ['the','of','and','to','a','in','that','is','we','it','for','have','be','will','our','this','on','are','not',
+                'with','as','by','government','people','country','I','they','which','has','but','at','an','would','all']
+
+def peak_rss_mb():
+    # Peak resident set size of this process so far - ru_maxrss is in kilobytes on Linux but bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak/(1024*1024) if sys.platform=='darwin' else peak/1024
+
+def git_revision():
+    try:
+        return subprocess.run(['git','rev-parse','HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _vocabulary():
+    # Filler words first (so they're the most frequent under a Zipf draw), then every lexicon word that can be loaded, then made-up words
+    words = list(filler_words)
+    for word_list in list(vagueness_word_lists.values())+[modal_verb_list]:
+        words += word_list
+    for name in ['semantic_size','subjective_adjectives']+emotionality_lexicon_names:
+        try:
+            words += list(load_lexicon(name))[:2000]
+        except OSError:
+            pass # ...a lexicon file that isn't in lexicon_data just isn't drawn on
+    words += [f"word{idx}" for idx in range(2000)] # ...out-of-vocabulary words, which miss the lemma cache on first sight
+    return list(dict.fromkeys(word for word in words if isinstance(word, str) and word.strip()!=''))
+
+def synthetic_document(rng, vocabulary, profile):
+    # Sentences joined by '. ', grouped into paragraphs on separate lines, of words drawn from a Zipf-like distribution
+    n_words = max(20, int(rng.lognormal(np.log(profile['median_words']), profile['sigma'])))
+    word_ids = (rng.zipf(1.3, n_words)-1)%len(vocabulary)
+    sentence_lengths = np.maximum(3, rng.poisson(profile['sentence_words'], n_words//3+1))
+    paragraphs,sentences,start = [],[],0
+    for length in sentence_lengths:
+        if start>=n_words:
+            break
+        words = [vocabulary[word_id] for word_id in word_ids[start:start+length]]
+        sentences.append(' '.join(words).capitalize())
+        start += length
+        if len(sentences)==profile['paragraph_sentences']:
+            paragraphs.append('. '.join(sentences)+'.')
+            sentences = []
+    if len(sentences)>0:
+        paragraphs.append('. '.join(sentences)+'.')
+    return '\n'.join(paragraphs)
+
+def build_corpus(n_docs=300, seed=0, sample=True):
+    # A reproducible list of (dataset, text), split evenly across the datasets
+    # ...with sample=True, texts are sampled from the real datasets where they're present, and generated otherwise
+    rng = np.random.default_rng(seed)
+    vocabulary = _vocabulary()
+    corpus = []
+    for idx,(dataset,profile) in enumerate(corpus_profiles.items()):
+        n_dataset = n_docs//len(corpus_profiles)+(1 if idx<n_docs%len(corpus_profiles) else 0)
+        path,column = corpus_sources.get(dataset, (None,None))
+        if sample and path is not None and os.path.exists(path):
+            import pandas as pd
+            texts = pd.read_csv(path)[column].dropna().to_list()
+            corpus += [(dataset,texts[text_idx]) for text_idx in rng.choice(len(texts), n_dataset, replace=len(texts)<n_dataset)]
+        else:
+            corpus += [(dataset,synthetic_document(rng, vocabulary, profile)) for _ in range(n_dataset)]
+    return corpus
+
+def _time(function, repeats):
+    # Best of several runs, which is the least disturbed by anything else running on the machine
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter()-start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _rates(seconds, docs, tokens, sentences):
+    return {'seconds':seconds,
+            'docs_per_sec':docs/seconds if seconds>0 else None,
+            'tokens_per_sec':tokens/seconds if seconds>0 else None,
+            'sentences_per_sec':sentences/seconds if seconds>0 else None}
+
+def run_benchmark(corpus, repeats=3, models=True, batch_size=DEFAULT_BATCH_SIZE, progress=True):
+    # Time every stage over the whole corpus, returning a dict of results by stage, and the time attributed to each feature
+    # ...a stage whose resources can't be loaded (a lexicon file missing from lexicon_data, TensorFlow not installed) is recorded as skipped
+    texts = [text for dataset,text in corpus]
+    text_lists = [clean(text) for text in texts]
+    scorable = [idx for idx,text_list in enumerate(text_lists) if len(text_list)>0]
+    texts = [texts[idx] for idx in scorable]
+    text_lists = [text_lists[idx] for idx in scorable]
+    n_docs,n_tokens = len(texts),sum(len(text_list) for text_list in text_lists)
+    period_sentences = [list(iter_sentence_spans(text, 'period')) for text in texts]
+    n_period = sum(len(spans) for spans in period_sentences)
+
+    stages = dict()
+    def record(name, function, sentences=n_period, runs=repeats, setup=None):
+        # ...setup builds whatever function needs (passed as its argument), outside of the time measured
+        if progress:
+            print(f"Timing {name}...", file=sys.stderr)
+        try:
+            if setup is not None:
+                prepared = setup()
+                function = lambda function=function: function(prepared)
+            seconds = _time(function, runs)
+        except (ImportError, OSError, LookupError) as error:
+            stages[name] = {'skipped':repr(error)}
+            return
+        stages[name] = {**_rates(seconds, n_docs, n_tokens, sentences), 'peak_rss_mb':peak_rss_mb()}
+
+    record('clean', lambda: [clean(text) for text in texts])
+    # Lemmatisation from an empty cache (one run, as a second would be warm) and then from a warm one
+    saved_lemmas = dict(lemma_cache.lemmas)
+    lemma_cache.clear()
+    record('lemmatise_cold', lambda: [lemma_cache.lemmatise_list(text_list) for text_list in text_lists], runs=1)
+    record('lemmatise_warm', lambda: [lemma_cache.lemmatise_list(text_list) for text_list in text_lists])
+    for word,lemma in saved_lemmas.items():
+        lemma_cache._store(word, lemma)
+    lemma_lists = [lemma_cache.lemmatise_list(text_list) for text_list in text_lists] if 'skipped' not in stages['lemmatise_warm'] else None
+
+    # Segmentation is timed without the sentence cache, as the first pass over a corpus would be
+    record('segment_period', lambda: [list(iter_sentence_spans(text, 'period')) for text in texts])
+    punkt_sentences = None
+    try:
+        punkt_sentences = [list(iter_sentence_spans(text, 'punkt')) for text in texts]
+        n_punkt = sum(len(spans) for spans in punkt_sentences)
+    except LookupError:
+        n_punkt = 0
+    record('segment_punkt', lambda: [list(iter_sentence_spans(text, 'punkt')) for text in texts], sentences=n_punkt)
+
+    # Lexicon features - all of them in one table, as the pipeline scores them, and then each on its own
+    if lemma_lists is not None:
+        record('lexicon_tables', lambda table: [table.score(text_list, lemma_list) for text_list,lemma_list in zip(text_lists,lemma_lists)],
+               setup=load_lexicon_table)
+        word_lists = {**vagueness_word_lists, 'modal_verb':modal_verb_list}
+        for name in list(word_lists)+['subjective_adjective']:
+            word_list_table = lambda name=name: LexiconTable({name:word_lists[name] if name in word_lists else load_lexicon('subjective_adjectives')})
+            record('lexicon:'+name, lambda table: [table.score(text_list) for text_list in text_lists], setup=word_list_table)
+        for name in ['semantic_size']+emotionality_lexicon_names:
+            norm_lexicon_table = lambda name=name: LexiconTable(norm_lexicons={name:load_lexicon(name)})
+            record('lexicon:'+name, lambda table: [table.score(text_list, lemma_list) for text_list,lemma_list in zip(text_lists,lemma_lists)],
+                   setup=norm_lexicon_table)
+
+        # The speculative cue count on its own - model outputs and lexicon scores are supplied, so nothing else is computed
+        def count_speculative_cues():
+            lexicon_scores = {'modal_verb':0.0,'subjective_adjective':0.0}
+            for text,text_list,spans in zip(texts,text_lists,period_sentences):
+                outputs = {'class_ids':np.zeros((len(spans),1), dtype=np.int64),'probabilities':np.zeros((len(spans),2))}
+                measure_subjectivity(text_list, text, subjectivity_outputs=outputs, lexicon_scores=lexicon_scores)
+        record('speculative_cues', count_speculative_cues)
+        record('measure_vagueness', lambda: [measure_vagueness(text_list, lemma_list=lemma_list) for text_list,lemma_list in zip(text_lists,lemma_lists)])
+
+    # Classifier signatures - once each, as they dominate a full run
+    if models:
+        from scorers.segmentation import split_sentences
+        model_inputs = {'subjectivity':('period','utf-16',['class_ids','probabilities']),
+                        **{emotion:('punkt','utf-8',['predictions']) for emotion in ['anger','fear','joy','sadness']}}
+        for name,(method,encoding,output_keys) in model_inputs.items():
+            sentences = n_period if method=='period' else n_punkt
+            def predict(name=name, method=method, encoding=encoding, output_keys=output_keys):
+                estimator = load_classifier(name)
+                return [batch_predict(estimator, split_sentences(text, method), output_keys, encoding=encoding, batch_size=batch_size) for text in texts]
+            load = lambda name=name: load_classifier(name)
+            record('model_load:'+name, load, runs=1)
+            record('model:'+name, predict, sentences=sentences, runs=1)
+        record('score_document', lambda: [score_document(text) for text in texts], runs=1)
+
+    # Time attributed to each feature - features sharing a stage are each shown its full time
+    features = {feature:stages.get(stage, {'skipped':'not run'}).get('seconds') for feature,stage in feature_stages.items()}
+    return {'stages':stages, 'features':features}
+
+def benchmark(n_docs=300, seed=0, sample=True, repeats=3, models=True, batch_size=DEFAULT_BATCH_SIZE, progress=True):
+    # Build the corpus and run every stage, returning the full results with the corpus shape and the environment they came from
+    corpus = build_corpus(n_docs, seed, sample)
+    corpus_summary = dict()
+    for dataset,text in corpus:
+        summary = corpus_summary.setdefault(dataset, {'docs':0,'tokens':0,'period_sentences':0,'characters':0})
+        summary['docs'] += 1
+        summary['tokens'] += len(clean(text))
+        summary['period_sentences'] += sum(1 for _ in iter_sentence_spans(text, 'period'))
+        summary['characters'] += len(text)
+    results = run_benchmark(corpus, repeats, models, batch_size, progress)
+    return {'git_revision':git_revision(),
+            'timestamp':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':platform.python_version(),
+            'platform':platform.platform(),
+            'cpu_count':os.cpu_count(),
+            'settings':{'n_docs':n_docs,'seed':seed,'sample':sample,'repeats':repeats,'models':models,'batch_size':batch_size},
+            'corpus':corpus_summary,
+            'peak_rss_mb':peak_rss_mb(),
+            **results}
+
+def compare(baseline, results):
+    # Speed-up of each stage against a baseline run (above 1 is faster) - stages skipped in either run are left out
+    import pandas as pd
+    rows = dict()
+    for stage,timing in results['stages'].items():
+        baseline_timing = baseline['stages'].get(stage, {})
+        if 'seconds' in timing and 'seconds' in baseline_timing:
+            rows[stage] = {'baseline_seconds':baseline_timing['seconds'],
+                           'seconds':timing['seconds'],
+                           'speedup':baseline_timing['seconds']/timing['seconds'] if timing['seconds']>0 else None}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+def summary_table(results):
+    import pandas as pd
+    return pd.DataFrame.from_dict(results['stages'], orient='index')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark scorer throughput stage by stage')
+    parser.add_argument('--docs', type=int, default=300, help='number of documents, split evenly across the datasets')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--synthetic', action='store_true', help='generate every document rather than sampling real texts where present')
+    parser.add_argument('--repeats', type=int, default=3, help='runs of each CPU stage, keeping the fastest')
+    parser.add_argument('--no-models', action='store_true', help='skip the TensorFlow classifiers')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--output', help='JSON file to save the results to')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.docs, args.seed, not args.synthetic, args.repeats, not args.no_models, args.batch_size)
+    import pandas as pd
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(summary_table(results))
+        if args.compare is not None:
+            with open(args.compare) as file:
+                print(compare(json.load(file), results))
+    if args.output is not None:
+        tmp_path = args.output+'.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(results, file, indent=1)
+        os.replace(tmp_path, args.output)
+    return results
+
+if __name__=='__main__':
+    main()
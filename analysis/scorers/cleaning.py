@@ -1,41 +1,44 @@
+import re
+from scorers.lemmatisation import lemma_cache
+from scorers.instrumentation import instrument
+
+__all__ = ['clean','clean_to_paragraphs','iter_clean','iter_clean_paragraphs','clean_and_lemmatise']
+
+# Characters treated as word separators - every one is replaced by a space before splitting
+punctuation = '\\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\''
+
+# A word is any run of characters that isn't a space, a newline or punctuation - so a text is tokenised in a single pass
+# ...each word is lower-cased on its own, as before - lower-casing the whole text first isn't the same, since some lower-casing
+#    depends on context (a Greek capital sigma becomes a final sigma only at the end of a word, and punctuation doesn't end one)
+word_pattern = re.compile('[^ \n'+re.escape(punctuation)+']+')
+
+@instrument
 def clean(text):
-    def replace_whitespace(text):
-        return text.replace('\n',' ')
-    
-    def delete_punctuation(text):
-        punctuation = '\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\''
-        for punct in punctuation:
-            text = text.replace(punct, ' ')
-        return text
-    
-    no_whitespace = replace_whitespace(text)
-    no_punct = delete_punctuation(no_whitespace)
-    
-    while '  ' in no_punct:
-        no_punct = no_punct.replace('  ',' ')
-
-    text_list = [word.lower() for word in no_punct.split(' ') if word!='']
-
-    return text_list
+    return [word.lower() for word in word_pattern.findall(text)]
 
+@instrument
 def clean_to_paragraphs(text):
-    def replace_whitespace(text):
-        return text.split('\n')
-    
-    def delete_punctuation(text):
-        punctuation = '\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\''
-        for punct in punctuation:
-            text = text.replace(punct, ' ')
-        return text
-    
-    no_whitespace = replace_whitespace(text)
-    no_punct = [delete_punctuation(paragraph) for paragraph in no_whitespace]
-    
-    for idx,paragraph in enumerate(no_punct):
-        while '  ' in paragraph:
-            paragraph = paragraph.replace('  ',' ')
-            no_punct[idx] = paragraph
-
-    text_list = [[word.lower() for word in paragraph.split(' ') if word!=''] for paragraph in no_punct if paragraph!='']
-
-    return text_list
\ No newline at end of file
+    # As clean(), but keeping one word list per line - blank lines are dropped, lines of only punctuation give empty lists
+    return [[word.lower() for word in word_pattern.findall(paragraph)] for paragraph in text.split('\n') if paragraph!='']
+
+def iter_clean(text):
+    # Yield the same words as clean(text), one at a time, without building the cleaned copy of the text
+    for match in word_pattern.finditer(text):
+        yield match.group().lower()
+
+def iter_clean_paragraphs(text):
+    # Yield the same word lists as clean_to_paragraphs(text), one line at a time
+    start = 0
+    while start<=len(text):
+        end = text.find('\n', start)
+        if end==-1:
+            end = len(text)
+        if end>start:
+            yield [match.group().lower() for match in word_pattern.finditer(text, start, end)]
+        start = end+1
+
+@instrument
+def clean_and_lemmatise(text, cache=lemma_cache):
+    # Clean a text and lemmatise its words through the shared cache, so every scorer can reuse both lists
+    text_list = clean(text)
+    return text_list,cache.lemmatise_list(text_list)
@@ -0,0 +1,46 @@
+import numpy as np
+from scorers.instrumentation import instrument,span,record_value
+
+__all__ = ['DEFAULT_BATCH_SIZE','serialise_sentences','batch_predict','batch_predict_corpus']
+
+# Number of sentences passed to a classifier signature in a single call
+DEFAULT_BATCH_SIZE = 256
+
+@instrument
+def serialise_sentences(sent_list, encoding='utf-8'):
+    # Wrap each sentence in a tf.train.Example, encoded the same way as the per-sentence scorers
+    import tensorflow as tf
+    serialised = []
+    for sent in sent_list:
+        example = tf.train.Example()
+        example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, encoding)])
+        serialised.append(example.SerializeToString())
+    return serialised
+
+@instrument
+def batch_predict(estimator, sent_list, output_keys, encoding='utf-8', batch_size=DEFAULT_BATCH_SIZE):
+    # Run the 'predict' signature once per batch of sentences, collecting every requested output head from the same call
+    # ...no sentences gives empty outputs without calling the model - so with no trailing shape, which only a call would give
+    if len(sent_list)==0:
+        return {key:np.zeros((0,0), dtype=np.float32) for key in output_keys}
+    import tensorflow as tf
+    serialised = serialise_sentences(sent_list, encoding=encoding)
+    predict = estimator.signatures['predict']
+    outputs = {key:[] for key in output_keys}
+    for start in range(0, len(serialised), batch_size):
+        batch = serialised[start:start+batch_size]
+        record_value('scorers.inference.batch_size', len(batch))
+        with span('scorers.inference.predict_signature'):
+            batch_outputs = predict(examples=tf.constant(batch, dtype=tf.string))
+        for key in output_keys:
+            outputs[key].append(batch_outputs[key].numpy())
+    # ...and stitch the batches back together so row i is the output for sentence i
+    return {key:np.concatenate(arrays, axis=0) for key,arrays in outputs.items()}
+
+def batch_predict_corpus(estimator, sent_lists, output_keys, encoding='utf-8', batch_size=DEFAULT_BATCH_SIZE):
+    # Flatten the sentences of every document so batches are filled across document boundaries...
+    flat_sent_list = [sent for sent_list in sent_lists for sent in sent_list]
+    outputs = batch_predict(estimator, flat_sent_list, output_keys, encoding=encoding, batch_size=batch_size)
+    # ...then split the outputs back into one dict per document
+    offsets = np.cumsum([0]+[len(sent_list) for sent_list in sent_lists])
+    return [{key:array[start:end] for key,array in outputs.items()} for start,end in zip(offsets[:-1],offsets[1:])]
@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import random
+import threading
+import functools
+import contextlib
+import multiprocessing.util
+
+__all__ = ['ENABLED','instrument','span','record_value','record_cache','register_cache','profile','summary','dump','collect']
+
+# Opt-in profiling of the scorers - set SCORERS_PROFILE=1 before the scorers are imported, e.g. %env SCORERS_PROFILE=1 in a notebook
+# ...SCORERS_PROFILE_TRACE=1 also keeps every call as a trace event, for write_chrome_trace() (open in chrome://tracing or Perfetto)
+# ...SCORERS_PROFILE_DIR=<folder> has every process - including pool workers - dump what it recorded there when it exits,
+#    so collect(<folder>) can merge a whole multi-process run
+# With SCORERS_PROFILE unset, instrument() hands back each function untouched, so there's no cost at all
+
+ENABLED = os.environ.get('SCORERS_PROFILE', '') not in ('','0')
+TRACE = ENABLED and os.environ.get('SCORERS_PROFILE_TRACE', '') not in ('','0')
+PROFILE_DIR = os.environ.get('SCORERS_PROFILE_DIR') if ENABLED else None
+
+# Latencies kept per function for percentiles - beyond this a uniform reservoir sample is kept, while counts and totals stay exact
+MAX_SAMPLES = 100000
+# Trace events kept per process, so a long traced run can't exhaust memory
+MAX_TRACE_EVENTS = 1000000
+
+class Stats:
+    # Count, total, extremes and a reservoir sample of a stream of numbers - call latencies in nanoseconds, or recorded values
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.samples = []
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None or value<self.min else self.min
+        self.max = value if self.max is None or value>self.max else self.max
+        if len(self.samples)<MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            idx = random.randrange(self.count)
+            if idx<MAX_SAMPLES:
+                self.samples[idx] = value
+
+    def merge(self, other):
+        # ...the merged sample is only approximately uniform when the two samples are capped, which is fine for percentiles
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None or (other.min is not None and other.min<self.min) else self.min
+        self.max = other.max if self.max is None or (other.max is not None and other.max>self.max) else self.max
+        self.samples = (self.samples+other.samples)[:MAX_SAMPLES] if len(self.samples)+len(other.samples)<=MAX_SAMPLES else \
+                       random.sample(self.samples+other.samples, MAX_SAMPLES)
+
+    def percentile(self, q):
+        import numpy as np
+        return float(np.percentile(self.samples, q)) if len(self.samples)>0 else None
+
+    def to_dict(self):
+        return {'count':self.count, 'total':self.total, 'min':self.min, 'max':self.max, 'samples':self.samples}
+
+    @classmethod
+    def from_dict(cls, stats_dict):
+        stats = cls()
+        for key,value in stats_dict.items():
+            setattr(stats, key, value)
+        return stats
+
+# Caches whose hit and miss counters are read whenever a profile is summarised or dumped, by name
+cache_providers = dict()
+
+def register_cache(name, provider):
+    # provider() returns the cache's (hits, misses) so far in this process
+    cache_providers[name] = provider
+
+class Profile:
+    # Everything recorded in one process (or merged from several): call latencies, values such as batch sizes,
+    # cache hits/misses and trace events - the live profile of this process also reads the registered caches' own counters
+    def __init__(self, live=False):
+        self.live = live
+        self.lock = threading.Lock()
+        self.functions = dict()
+        self.values = dict()
+        self.caches = dict()
+        self.trace = []
+        self.pids = [os.getpid()]
+
+    def record_call(self, name, start_ns, end_ns):
+        with self.lock:
+            if name not in self.functions:
+                self.functions[name] = Stats()
+            self.functions[name].add(end_ns-start_ns)
+            if TRACE and len(self.trace)<MAX_TRACE_EVENTS:
+                self.trace.append((name, start_ns, end_ns-start_ns, os.getpid(), threading.get_ident()))
+
+    def record_value(self, name, value):
+        with self.lock:
+            if name not in self.values:
+                self.values[name] = Stats()
+            self.values[name].add(value)
+
+    def record_cache(self, name, hits, misses):
+        with self.lock:
+            cache_hits,cache_misses = self.caches.get(name, (0,0))
+            self.caches[name] = (cache_hits+hits, cache_misses+misses)
+
+    def cache_counts(self):
+        # Counts recorded directly, plus (for the live profile) the current counters of every registered cache
+        caches = dict(self.caches)
+        for name,provider in (cache_providers.items() if self.live else []):
+            hits,misses = provider()
+            cache_hits,cache_misses = caches.get(name, (0,0))
+            caches[name] = (cache_hits+hits, cache_misses+misses)
+        return caches
+
+    def merge(self, other):
+        for name,stats in other.functions.items():
+            self.functions.setdefault(name, Stats()).merge(stats)
+        for name,stats in other.values.items():
+            self.values.setdefault(name, Stats()).merge(stats)
+        for name,(hits,misses) in other.caches.items():
+            cache_hits,cache_misses = self.caches.get(name, (0,0))
+            self.caches[name] = (cache_hits+hits, cache_misses+misses)
+        self.trace += other.trace
+        self.pids += other.pids
+
+    def to_dict(self):
+        return {'pids':self.pids,
+                'functions':{name:stats.to_dict() for name,stats in self.functions.items()},
+                'values':{name:stats.to_dict() for name,stats in self.values.items()},
+                'caches':self.cache_counts(),
+                'trace':self.trace}
+
+    @classmethod
+    def from_dict(cls, profile_dict):
+        merged = cls()
+        merged.pids = list(profile_dict['pids'])
+        merged.functions = {name:Stats.from_dict(stats) for name,stats in profile_dict['functions'].items()}
+        merged.values = {name:Stats.from_dict(stats) for name,stats in profile_dict['values'].items()}
+        merged.caches = {name:tuple(counts) for name,counts in profile_dict['caches'].items()}
+        merged.trace = [tuple(event) for event in profile_dict['trace']]
+        return merged
+
+    def summary(self):
+        # One row per instrumented function - calls, cumulative time (including any instrumented functions it calls) and latency percentiles
+        import pandas as pd
+        rows = {name:{'calls':stats.count,
+                      'total_s':stats.total/1e9,
+                      'mean_ms':stats.total/stats.count/1e6,
+                      'p50_ms':stats.percentile(50)/1e6,
+                      'p90_ms':stats.percentile(90)/1e6,
+                      'p99_ms':stats.percentile(99)/1e6,
+                      'max_ms':stats.max/1e6}
+                for name,stats in self.functions.items() if stats.count>0}
+        return pd.DataFrame.from_dict(rows, orient='index').sort_values('total_s', ascending=False) if len(rows)>0 else pd.DataFrame()
+
+    def value_summary(self):
+        # One row per recorded value, such as the number of sentences in each model batch
+        import pandas as pd
+        rows = {name:{'count':stats.count,
+                      'mean':stats.total/stats.count,
+                      'min':stats.min,
+                      'p50':stats.percentile(50),
+                      'p90':stats.percentile(90),
+                      'max':stats.max}
+                for name,stats in self.values.items() if stats.count>0}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def cache_summary(self):
+        import pandas as pd
+        rows = {name:{'hits':hits, 'misses':misses, 'hit_rate':hits/(hits+misses) if hits+misses>0 else None}
+                for name,(hits,misses) in self.cache_counts().items()}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def write_chrome_trace(self, path):
+        # Trace Event Format 'complete' events - perf_counter_ns is a system-wide monotonic clock on Linux, so processes line up
+        events = [{'name':name, 'cat':'scorers', 'ph':'X', 'ts':start_ns/1000, 'dur':duration_ns/1000, 'pid':pid, 'tid':tid}
+                  for name,start_ns,duration_ns,pid,tid in self.trace]
+        tmp_path = path+'.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump({'traceEvents':events, 'displayTimeUnit':'ms'}, file)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self.lock:
+            self.functions.clear()
+            self.values.clear()
+            self.caches.clear()
+            self.trace.clear()
+
+# What this process has recorded
+profile = Profile(live=True)
+
+def instrument(function=None, name=None):
+    # Decorator timing every call of a function - named module.qualname unless a name is given
+    if function is None:
+        return lambda function: instrument(function, name)
+    if not ENABLED:
+        return function
+    name = name if name is not None else f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def instrumented(*args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.record_call(name, start, time.perf_counter_ns())
+    return instrumented
+
+@contextlib.contextmanager
+def _span(name):
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        profile.record_call(name, start, time.perf_counter_ns())
+
+_null_span = contextlib.nullcontext()
+
+def span(name):
+    # Time a block of code as if it were an instrumented function
+    return _span(name) if ENABLED else _null_span
+
+def record_value(name, value):
+    if ENABLED:
+        profile.record_value(name, value)
+
+def record_cache(name, hits, misses):
+    if ENABLED:
+        profile.record_cache(name, hits, misses)
+
+def summary():
+    return profile.summary()
+
+def dump(directory=None):
+    # Write what this process has recorded to <directory>/scorers_profile_<pid>.json
+    directory = directory if directory is not None else PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"scorers_profile_{os.getpid()}.json")
+    tmp_path = path+'.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(profile.to_dict(), file)
+    os.replace(tmp_path, path)
+    return path
+
+def collect(directory=None, include_self=True):
+    # Merge the dumps of every process in a folder (by default SCORERS_PROFILE_DIR), and this process's own records, into one Profile
+    directory = directory if directory is not None else PROFILE_DIR
+    merged = Profile.from_dict(profile.to_dict()) if include_self else Profile()
+    if not include_self:
+        merged.pids = []
+    own_dump = f"scorers_profile_{os.getpid()}.json"
+    for filename in sorted(os.listdir(directory)) if directory is not None and os.path.isdir(directory) else []:
+        if filename.startswith('scorers_profile_') and filename.endswith('.json') and not (include_self and filename==own_dump):
+            with open(os.path.join(directory, filename)) as file:
+                merged.merge(Profile.from_dict(json.load(file)))
+    return merged
+
+# Every process dumps on exit - pool workers run their finalizers when the pool is closed and joined (not when it's terminated)
+if PROFILE_DIR is not None:
+    multiprocessing.util.Finalize(None, dump, args=(PROFILE_DIR,), exitpriority=10)
@@ -0,0 +1,87 @@
+import os
+import pickle
+from collections import OrderedDict
+from scorers.instrumentation import instrument,register_cache
+
+# Number of distinct words kept in the shared cache before the least recently used are dropped
+DEFAULT_CACHE_SIZE = 500000
+# Where the cache is persisted between runs, so warm runs can skip WordNet entirely
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__),'lexicon_data/lemma_cache.pkl')
+
+class LemmaCache:
+    # Bounded, least-recently-used cache of WordNet lemmas shared across every scorer
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.lemmas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lemmatiser = None
+
+    @instrument(name='scorers.lemmatisation.wordnet_lemmatize')
+    def _lemmatise_uncached(self, word):
+        # Only load WordNet once we actually meet a word we haven't seen before
+        if self._lemmatiser is None:
+            from nltk.stem import WordNetLemmatizer
+            self._lemmatiser = WordNetLemmatizer()
+        return self._lemmatiser.lemmatize(word)
+
+    def _store(self, word, lemma):
+        self.lemmas[word] = lemma
+        if len(self.lemmas)>self.maxsize:
+            self.lemmas.popitem(last=False)
+
+    def lemmatise(self, word):
+        if word in self.lemmas:
+            self.hits += 1
+            self.lemmas.move_to_end(word)
+            return self.lemmas[word]
+        self.misses += 1
+        lemma = self._lemmatise_uncached(word)
+        self._store(word, lemma)
+        return lemma
+
+    @instrument
+    def lemmatise_list(self, text_list):
+        # Look up each distinct word once per list, then map the whole list through that lookup
+        lemma_lookup = {word:self.lemmatise(word) for word in set(text_list)}
+        return [lemma_lookup[word] for word in text_list]
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits+self.misses
+        return self.hits/lookups if lookups>0 else 0.0
+
+    def stats(self):
+        return {'size':len(self.lemmas),
+                'maxsize':self.maxsize,
+                'hits':self.hits,
+                'misses':self.misses,
+                'hit_rate':self.hit_rate}
+
+    def clear(self):
+        self.lemmas.clear()
+        self.hits,self.misses = 0,0
+
+    def save(self, path=DEFAULT_CACHE_PATH):
+        # Write to a temporary file first so an interrupted save never leaves a corrupt cache behind
+        tmp_path = path+'.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(dict(self.lemmas), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path=DEFAULT_CACHE_PATH):
+        # Merge a saved cache into this one - a missing file just means a cold start
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'rb') as file:
+            saved_lemmas = pickle.load(file)
+        for word,lemma in saved_lemmas.items():
+            self._store(word, lemma)
+        return len(saved_lemmas)
+
+# Shared cache used by all of the scorers
+lemma_cache = LemmaCache()
+register_cache('lemma_cache', lambda: (lemma_cache.hits,lemma_cache.misses))
+
+def lemmatise(text_list, cache=None):
+    return (cache if cache is not None else lemma_cache).lemmatise_list(text_list)
@@ -0,0 +1,86 @@
+import numpy as np
+from scorers.lemmatisation import lemma_cache
+from scorers.instrumentation import instrument
+
+__all__ = ['LexiconTable']
+
+class LexiconTable:
+    # Compiles word lists and norm lexicons into one vocabulary-indexed table:
+    # ...word lists are scored on raw tokens, as the share of tokens in the list
+    # ...norm lexicons are scored on lemmas, as the mean norm over lemmas found in the lexicon
+    def __init__(self, word_lists=None, norm_lexicons=None):
+        self.word_lists = dict(word_lists or {})
+        self.norm_lexicons = dict(norm_lexicons or {})
+        self.word_list_names = list(self.word_lists.keys())
+        self.norm_lexicon_names = list(self.norm_lexicons.keys())
+
+        # Every word across every list and lexicon gets one integer ID...
+        self.vocabulary = dict()
+        for words in list(self.word_lists.values())+list(self.norm_lexicons.values()):
+            for word in words:
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = len(self.vocabulary)
+        # ...and the final column is reserved for out-of-vocabulary words
+        self.oov_id = len(self.vocabulary)
+
+        # One row per feature, one column per word - word lists hold 1/0 membership, norm lexicons hold the norm or NaN
+        self.word_list_table = np.zeros((len(self.word_list_names), self.oov_id+1), dtype=np.float64)
+        for row,name in enumerate(self.word_list_names):
+            for word in self.word_lists[name]:
+                self.word_list_table[row, self.vocabulary[word]] = 1.0
+        self.norm_table = np.full((len(self.norm_lexicon_names), self.oov_id+1), np.nan, dtype=np.float64)
+        for row,name in enumerate(self.norm_lexicon_names):
+            for word,norm in self.norm_lexicons[name].items():
+                self.norm_table[row, self.vocabulary[word]] = float(norm)
+
+    @classmethod
+    def merge(cls, *tables):
+        # Combine several tables into one, so a document can be scored for all of their features in one pass
+        word_lists,norm_lexicons = dict(),dict()
+        for table in tables:
+            for sources,table_sources in [(word_lists,table.word_lists),(norm_lexicons,table.norm_lexicons)]:
+                for name,source in table_sources.items():
+                    if name in sources and sources[name] is not source:
+                        raise ValueError(f"Conflicting definitions for lexicon feature '{name}'")
+                    sources[name] = source
+        return cls(word_lists, norm_lexicons)
+
+    def built_from(self, word_lists=None, norm_lexicons=None):
+        # Check whether this table was compiled from exactly these lists and lexicons (not copies of them)
+        return (list((word_lists or {}).keys())==self.word_list_names and
+                list((norm_lexicons or {}).keys())==self.norm_lexicon_names and
+                all(source is self.word_lists[name] for name,source in (word_lists or {}).items()) and
+                all(source is self.norm_lexicons[name] for name,source in (norm_lexicons or {}).items()))
+
+    @property
+    def feature_names(self):
+        return self.word_list_names+self.norm_lexicon_names
+
+    def token_ids(self, text_list):
+        # Map a list of words to vocabulary IDs, sending unknown words to the out-of-vocabulary column
+        vocabulary,oov_id = self.vocabulary,self.oov_id
+        return np.fromiter((vocabulary.get(word, oov_id) for word in text_list), dtype=np.intp, count=len(text_list))
+
+    @instrument
+    def score(self, text_list, lemma_list=None):
+        lexicon_scores = dict()
+        if len(self.word_list_names)>0:
+            # An empty text has no share of words in a list - raised, as by the original per-word loops, rather than returned as NaN
+            if len(text_list)==0:
+                raise ZeroDivisionError("Can't score word lists over an empty text")
+            # Gather membership for every token at once and count down each row
+            word_list_counts = self.word_list_table[:, self.token_ids(text_list)].sum(axis=1)
+            for name,count in zip(self.word_list_names, word_list_counts):
+                lexicon_scores[name] = count/len(text_list)
+        if len(self.norm_lexicon_names)>0:
+            # Lemmatise through the shared cache if lemmas haven't been supplied
+            if lemma_list is None:
+                lemma_list = lemma_cache.lemmatise_list(text_list)
+            # Gather norms for every lemma at once and average the ones found in each lexicon
+            # ...a text with no lemma in a lexicon (an empty text included) scores NaN, with numpy's 'Mean of empty slice' warning,
+            #    as np.nanmean() always gave here
+            norm_scores = np.nanmean(self.norm_table[:, self.token_ids(lemma_list)], axis=1)
+            for name,norm_score in zip(self.norm_lexicon_names, norm_scores):
+                lexicon_scores[name] = norm_score
+
+        return lexicon_scores
@@ -1,15 +1,14 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import functools
 import numpy as np
-import tensorflow as tf
-import regex as re
-import os
-from nltk.stem import WordNetLemmatizer
+from scorers.lemmatisation import lemma_cache
 from scorers.cleaning import *
+from scorers.inference import *
+from scorers.segmentation import split_sentences
+from scorers.lexicon import *
+from scorers.resources import load_classifier,load_lexicon
+from scorers.instrumentation import instrument
 
-# Load pre-trained TensorFlow model
-saved_model_path = os.path.join(os.path.dirname(__file__),'classifiers\subjectivity_classifier')
-subjectivity_estimator = tf.saved_model.load(saved_model_path)
+# The pre-trained TensorFlow model and the subjective adjective list are loaded on first use - see scorers.resources
 
 # Speculative cues taken from 
 speculative_cues = ['may','might','can','would','should','could',
@@ -23,53 +22,78 @@ modal_verb_list = ['can','could','may','might','will','shall','would','should','
                    'dare','need','ought','used','going','able']
 
 # Subjective adjectives taken from Wiebe (2000) 'Learning subjective adjectives from corpora'
-subjective_adjective_list = pd.read_csv('https://people.cs.pitt.edu/~wiebe/pubs/aaai00/adjsMPQA', header=None)[0].to_list()
-subjective_adjective_list = [word.strip() for word in subjective_adjective_list]
+# ...vendored as lexicon_data/wiebe_adjectives.txt
 
+@functools.lru_cache(maxsize=None)
+def load_subjectivity_lexicon_table():
+    # Compile the word lists into a single lookup table
+    return LexiconTable({'modal_verb':modal_verb_list,
+                         'subjective_adjective':load_lexicon('subjective_adjectives')})
+
+def __getattr__(name):
+    # Keep the model, word list and table available as module attributes, loading them when first accessed
+    if name=='subjectivity_estimator':
+        return load_classifier('subjectivity')
+    if name=='subjective_adjective_list':
+        return load_lexicon('subjective_adjectives')
+    if name=='subjectivity_lexicon_table':
+        return load_subjectivity_lexicon_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def speculative_sentence_flags(sent_list, speculative_cues=speculative_cues):
+    # Whether each sentence holds a speculative cue - each sentence is read from the shared segmentation, and only until its first cue
+    speculative_cue_set = frozenset(speculative_cues)
+    return np.fromiter((any(lemma in speculative_cue_set for lemma in lemma_cache.lemmatise_list(clean(sent))) for sent in sent_list),
+                       dtype=bool, count=len(sent_list))
+
+@instrument
 def measure_subjectivity(text_list,raw_text,
-                         subjectivity_estimator=subjectivity_estimator,
+                         subjectivity_estimator=None,
                          speculative_cues=speculative_cues,
                          modal_verb_list=modal_verb_list,
-                         subjective_adjective_list=subjective_adjective_list):
+                         subjective_adjective_list=None,
+                         batch_size=DEFAULT_BATCH_SIZE,
+                         subjectivity_outputs=None,
+                         lexicon_scores=None,
+                         sentences=None):
     
-    def measure_subjective_sentence_freq(sent_list, subjectivity_estimator=subjectivity_estimator):
-        subjectivity_predictions = []
-        # For each sentence:
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-16")]) # ...encode the sentence as UTF-18
-            subjectivity_predictions.append(subjectivity_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['class_ids'][0][0].numpy()) # ...append subjectivity prediction to list
-        return sum(subjectivity_predictions)/len(subjectivity_predictions)
+    def measure_subjective_sentence_freq(subjectivity_outputs):
+        subjectivity_predictions = subjectivity_outputs['class_ids'][:,0] # ...subjectivity prediction for each sentence
+        return subjectivity_predictions.sum()/len(subjectivity_predictions)
 
-    def measure_avg_subjective_sentence_score(sent_list, subjectivity_estimator=subjectivity_estimator):
-        subjectivity_scores = []
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-16")]) # ...encode the sentence as UTF-18
-            subjectivity_scores.append(subjectivity_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['probabilities'][0][1].numpy()) # ...append subjectivity score to list
+    def measure_avg_subjective_sentence_score(subjectivity_outputs):
+        subjectivity_scores = subjectivity_outputs['probabilities'][:,1] # ...subjectivity score for each sentence
         return np.nanmean(subjectivity_scores)
 
+    @instrument
     def measure_speculative_sentence_freq(sent_list, speculative_cues=speculative_cues):
-        wnl = WordNetLemmatizer()
-        cleaned_sent_list = [clean(sent) for sent in sent_list]
-        lemmatised_sent_list = [[wnl.lemmatize(word) for word in sent] for sent in cleaned_sent_list]
-        speculative_sent_count = sum([1 for lemma_sent in lemmatised_sent_list if any([lemma in speculative_cues for lemma in lemma_sent])])
-        return speculative_sent_count/len(sent_list)
+        return speculative_sentence_flags(sent_list, speculative_cues).sum()/len(sent_list)
 
-    def measure_modal_verb_freq(text_list, modal_verb_list=modal_verb_list):
-        modal_verb_count = sum([word in modal_verb_list for word in text_list])
-        return modal_verb_count/len(text_list)
-
-    def measure_subjective_adjective_freq(text_list, subjective_adjective_list=subjective_adjective_list):
-        subjective_adjective_count = sum([word in subjective_adjective_list for word in text_list])
-        return subjective_adjective_count/len(text_list)
+    # Score the word list features in one pass - rebuilding the table only if non-default lists were passed
+    if lexicon_scores is None:
+        if subjective_adjective_list is None:
+            subjective_adjective_list = load_lexicon('subjective_adjectives')
+        word_lists = {'modal_verb':modal_verb_list,
+                      'subjective_adjective':subjective_adjective_list}
+        lexicon_table = load_subjectivity_lexicon_table()
+        if not lexicon_table.built_from(word_lists):
+            lexicon_table = LexiconTable(word_lists)
+        lexicon_scores = lexicon_table.score(text_list)
+    
+    # Sentences as re.sub('\s+',' ',raw_text).split('. '), held as offsets and segmented once per text - see scorers.segmentation
+    sent_list = sentences if sentences is not None else split_sentences(raw_text, 'period')
     
-    sent_list = re.sub('\s+',' ',raw_text).split('. ')
+    # Both sentence-level features come from the same batched model call - sentences are encoded as UTF-16
+    if subjectivity_outputs is None:
+        if subjectivity_estimator is None:
+            subjectivity_estimator = load_classifier('subjectivity')
+        subjectivity_outputs = batch_predict(subjectivity_estimator, sent_list, ['class_ids','probabilities'],
+                                             encoding='utf-16', batch_size=batch_size)
     
-    subjectivity_feature_dict = {'subjective_sentence_freq':measure_subjective_sentence_freq(sent_list),
-                                 'avg_subjective_sentence_score':measure_avg_subjective_sentence_score(sent_list),
+    subjectivity_feature_dict = {'subjective_sentence_freq':measure_subjective_sentence_freq(subjectivity_outputs),
+                                 'avg_subjective_sentence_score':measure_avg_subjective_sentence_score(subjectivity_outputs),
                                  'speculative_sentence_freq':measure_speculative_sentence_freq(sent_list),
-                                 'modal_verb_freq':measure_modal_verb_freq(text_list),
-                                 'subjective_adjective_freq':measure_subjective_adjective_freq(text_list)}
+                                 'modal_verb_freq':lexicon_scores['modal_verb'],
+                                 'subjective_adjective_freq':lexicon_scores['subjective_adjective']}
     
     return subjectivity_feature_dict
\ No newline at end of file
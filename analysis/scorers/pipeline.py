@@ -0,0 +1,191 @@
+import functools
+import itertools
+import multiprocessing
+from scorers.cleaning import clean
+from scorers.lemmatisation import lemma_cache
+from scorers.lexicon import LexiconTable
+from scorers.resources import load_classifier,lexicon_fingerprint,classifier_fingerprint
+from scorers.score_cache import ScoreCache
+from scorers.instrumentation import instrument
+from scorers.segmentation import split_sentences
+from scorers.specificity_vs_vagueness import measure_vagueness,load_vagueness_lexicon_table
+from scorers.objectivity_vs_subjectivity import measure_subjectivity,load_subjectivity_lexicon_table
+from scorers.rationality_vs_emotionality import measure_emotionality,load_emotionality_lexicon_table
+
+# Scorer families, keyed by the prefix given to their features in the scored datasets
+scorer_families = {'vague':measure_vagueness,
+                   'subj':measure_subjectivity,
+                   'emot':measure_emotionality}
+family_lexicon_tables = {'vague':load_vagueness_lexicon_table,
+                         'subj':load_subjectivity_lexicon_table,
+                         'emot':load_emotionality_lexicon_table}
+family_classifiers = {'vague':[],
+                      'subj':['subjectivity'],
+                      'emot':['anger','fear','joy','sadness']}
+family_lexicons = {'vague':['semantic_size'],
+                   'subj':['subjective_adjectives'],
+                   'emot':['arousal_glasgow','valence_glasgow','arousal_warriner','valence_warriner','valence_rheault']}
+all_families = tuple(scorer_families.keys())
+
+@functools.lru_cache(maxsize=None)
+def load_lexicon_table(families=all_families):
+    # One table holding every lexicon feature of the selected families, so each document is scored in a single pass
+    return LexiconTable.merge(*[family_lexicon_tables[family]() for family in families])
+
+def load_scorer_resources(families=all_families):
+    # Load every model and lexicon needed by the selected families up front
+    load_lexicon_table(tuple(families))
+    for family in families:
+        for classifier in family_classifiers[family]:
+            load_classifier(classifier)
+
+@functools.lru_cache(maxsize=None)
+def family_fingerprint(family):
+    # Identifies everything a family's scores depend on - its scorer version, and the exact lexicons and models it uses
+    resource_fingerprints = [lexicon_fingerprint(name) for name in family_lexicons[family]]
+    resource_fingerprints += [classifier_fingerprint(name) for name in family_classifiers[family]]
+    return ScoreCache.family_fingerprint(family, resource_fingerprints)
+
+@instrument
+def score_document(text, families=all_families):
+    # Clean and lemmatise the text once, and score every lexicon feature in one pass, sharing both with each family
+    text_list = clean(text)
+    if len(text_list)==0:
+        return None # ...texts with no words can't be scored
+    lemma_list = lemma_cache.lemmatise_list(text_list)
+    lexicon_scores = load_lexicon_table(tuple(families)).score(text_list, lemma_list)
+
+    scores = dict()
+    for family in families:
+        if family=='vague':
+            family_scores = measure_vagueness(text_list, lemma_list=lemma_list, lexicon_scores=lexicon_scores)
+        elif family=='subj':
+            family_scores = measure_subjectivity(text_list, text, lexicon_scores=lexicon_scores,
+                                                 sentences=split_sentences(text, 'period'))
+        elif family=='emot':
+            family_scores = measure_emotionality(text_list, text, lemma_list=lemma_list, lexicon_scores=lexicon_scores,
+                                                 sentences=split_sentences(text, 'punkt'))
+        for key,value in family_scores.items():
+            scores[family+'_'+key] = value
+    return scores
+
+def _init_worker(families, threads_per_worker, lemma_cache_path):
+    # Each worker warms its lemma cache from disk, limits TensorFlow to its share of the cores, then loads the models once for its lifetime
+    if lemma_cache_path is not None:
+        lemma_cache.load(lemma_cache_path)
+    if threads_per_worker is not None and any(family_classifiers[family] for family in families):
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads_per_worker)
+        tf.config.threading.set_inter_op_parallelism_threads(threads_per_worker)
+    load_scorer_resources(families)
+
+def _score_document_task(args):
+    text,families = args
+    return score_document(text, families)
+
+def score_corpus(texts, families=all_families, processes=None, chunksize=4, threads_per_worker=1, lemma_cache_path=None,
+                 cache=None, block_size=1024):
+    # Yield a score dict (or None for a text with no words) for each text, in input order
+    # ...processes=1 scores in this process, otherwise texts are fanned out to a pool of workers
+    # ...with a ScoreCache, each family's scores are looked up first, and only the families missing for a text are scored
+    families = tuple(families)
+    if cache is None:
+        yield from _score_texts(((text,families) for text in texts), families, processes, chunksize, threads_per_worker, lemma_cache_path)
+        return
+
+    fingerprints = {family:family_fingerprint(family) for family in families}
+    if processes==1 and lemma_cache_path is not None:
+        lemma_cache.load(lemma_cache_path) # ...once, rather than for every block
+        lemma_cache_path = None
+    texts = iter(texts)
+    pool = None
+    try:
+        # Work through the corpus a block at a time, so lookups are batched and memory stays bounded
+        while True:
+            block = list(itertools.islice(texts, block_size))
+            if len(block)==0:
+                break
+            keys = [{family:ScoreCache.key(text, family, fingerprints[family]) for family in families} for text in block]
+            cached = cache.get_many(key for text_keys in keys for key in text_keys.values())
+
+            tasks,task_keys = [],[]
+            for text,text_keys in zip(block,keys):
+                missing = tuple(family for family in families if text_keys[family] not in cached)
+                if len(missing)>0:
+                    tasks.append((text,missing))
+                    task_keys.append(text_keys)
+            if len(tasks)>0 and pool is None and processes!=1:
+                pool = _start_pool(families, processes, threads_per_worker, lemma_cache_path)
+            scored = _score_texts(tasks, families, processes, chunksize, threads_per_worker, lemma_cache_path, pool)
+
+            # Store each newly scored family separately, so a later change to one family only re-scores that family
+            new_entries = []
+            for (text,missing),text_keys,scores in zip(tasks,task_keys,scored):
+                for family in missing:
+                    family_scores = None
+                    if scores is not None:
+                        family_scores = {name[len(family)+1:]:value for name,value in scores.items() if name.startswith(family+'_')}
+                    new_entries.append((text_keys[family],family,fingerprints[family],family_scores))
+                    cached[text_keys[family]] = family_scores
+            cache.put_many(new_entries)
+
+            for text_keys in keys:
+                family_scores = [cached[text_keys[family]] for family in families]
+                if any(scores is None for scores in family_scores):
+                    yield None
+                    continue
+                yield {family+'_'+name:value for family,scores in zip(families,family_scores) for name,value in scores.items()}
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+def _start_pool(families, processes, threads_per_worker, lemma_cache_path):
+    # TensorFlow isn't fork-safe, so workers are spawned fresh
+    context = multiprocessing.get_context('spawn')
+    return context.Pool(processes, initializer=_init_worker, initargs=(families,threads_per_worker,lemma_cache_path))
+
+def _score_texts(tasks, families, processes, chunksize, threads_per_worker, lemma_cache_path, pool=None):
+    # Score (text, families) tasks in order, in this process or on a pool - a pool passed in is left open for reuse
+    if processes==1:
+        if lemma_cache_path is not None:
+            lemma_cache.load(lemma_cache_path)
+        load_scorer_resources(families)
+        for task in tasks:
+            yield _score_document_task(task)
+        return
+
+    if pool is not None:
+        yield from pool.imap(_score_document_task, tasks, chunksize)
+        return
+    # Closed and joined once every text is scored (so workers exit cleanly, running their finalizers), terminated otherwise
+    pool = _start_pool(families, processes, threads_per_worker, lemma_cache_path)
+    try:
+        yield from pool.imap(_score_document_task, tasks, chunksize)
+    except BaseException:
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+
+def score_dataframe(df, text_column, families=all_families, processes=None, chunksize=4, lemma_cache_path=None, desc=None, cache=None):
+    # Score a column of texts, returning a copy of df with one column per feature (NaN for texts with no words),
+    # along with the positional indexes of those texts - as the NaN indexes in 1_scoring_datasets.ipynb
+    import numpy as np
+    scores = score_corpus(df[text_column], families=families, processes=processes, chunksize=chunksize,
+                          lemma_cache_path=lemma_cache_path, cache=cache)
+    if desc is not None:
+        from tqdm import tqdm
+        scores = tqdm(scores, total=len(df), desc=desc)
+
+    score_list,nans = [],[]
+    for idx,score_dict in enumerate(scores):
+        if score_dict is None:
+            nans.append(idx)
+        score_list.append(score_dict)
+
+    score_names = next((list(score_dict.keys()) for score_dict in score_list if score_dict is not None), [])
+    scored_df = df.copy()
+    for name in score_names:
+        scored_df[name] = [score_dict[name] if score_dict is not None else np.nan for score_dict in score_list]
+    return scored_df,nans
@@ -1,143 +1,92 @@
-import matplotlib.pyplot as plt
-import pandas as pd
+import functools
 import numpy as np
-import tensorflow as tf
-import regex as re
-import os
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import sent_tokenize
 from scorers.cleaning import *
+from scorers.inference import *
+from scorers.segmentation import split_sentences
+from scorers.lexicon import *
+from scorers.resources import load_classifier,load_lexicon
+from scorers.instrumentation import instrument
 
-# Load pre-trained TensorFlow models
-# ...Anger
-saved_anger_path = os.path.join(os.path.dirname(__file__),'classifiers/anger_classifier')
-anger_estimator = tf.saved_model.load(saved_anger_path)
-# ...Fear
-saved_fear_path = os.path.join(os.path.dirname(__file__),'classifiers/fear_classifier')
-fear_estimator = tf.saved_model.load(saved_fear_path)
-# ...Joy
-saved_joy_path = os.path.join(os.path.dirname(__file__),'classifiers/joy_classifier')
-joy_estimator = tf.saved_model.load(saved_joy_path)
-# ...Sadness
-saved_sadness_path = os.path.join(os.path.dirname(__file__),'classifiers/sadness_classifier')
-sadness_estimator = tf.saved_model.load(saved_sadness_path)
+# Pre-trained TensorFlow models for anger, fear, joy and sadness, and the arousal and valence lexicons, are loaded on first use - see scorers.resources
+# ...Arousal and valence lexicon taken from Scott, et al. (2019) 'The Glasgow Norms: Ratings of 5,500 words on nine scales'
+# ...Arousal and valence lexicon from from Warriner, et al. (2013) 'Norms of valence, arousal, and dominance for 13,915 English lemmas'
+# ...Valence lexicon from Rheault, et al. (2016), vendored as lexicon_data/rheault_polarity.csv
+emotionality_lexicon_names = ['arousal_glasgow','arousal_warriner','valence_glasgow','valence_warriner','valence_rheault']
 
-# Arousal and valence lexicon taken from Scott, et al. (2019) 'The Glasgow Norms: Ratings of 5,500 words on nine scales'
-df = pd.read_csv(os.path.join(os.path.dirname(__file__),'lexicon_data/glasgow.csv'))
-df = df[['Words','AROU','VAL']]
-df = df.drop(0, axis=0)
-df.AROU = df.AROU.apply(lambda x: float(x)/10) # Arousal is originally on a 0-10 scale - so rescale to 0-1
-df.VAL = df.VAL.apply(lambda x: abs(float(x)-5)/5) # Valence is on a 0-10 scale - rescale to give absolute distance from 5 on a 0-1 scale (i.e. 5:=0, 10:=1, 0:=1)
-a_glasgow_lexicon,v_glasgow_lexicon = dict(),dict()
-for row in df.iterrows():
-    a_glasgow_lexicon[row[1]['Words']] = row[1]['AROU']
-    v_glasgow_lexicon[row[1]['Words']] = row[1]['VAL']
+@functools.lru_cache(maxsize=None)
+def load_emotionality_lexicon_table():
+    # Compile the arousal and valence lexicons into a single lookup table
+    return LexiconTable(norm_lexicons={name:load_lexicon(name) for name in emotionality_lexicon_names})
 
-# Arousal and valence lexicon from from Warriner, et al. (2013) 'Norms of valence, arousal, and dominance for 13,915 English lemmas'
-df = pd.read_csv(os.path.join(os.path.dirname(__file__),'lexicon_data/warriner.csv'))
-df = df[['Word','A.Mean.Sum','V.Mean.Sum']]
-df['A.Mean.Sum'] = df['A.Mean.Sum'].apply(lambda x: float(x)/10) # Arousal is originally on a 0-10 scale - so rescale to 0-1
-df['V.Mean.Sum'] = df['V.Mean.Sum'].apply(lambda x: abs(float(x)-5)/5) # Valence is on a 0-10 scale - rescale to give absolute distance from 5 on a 0-1 scale (i.e. 5:=0, 10:=1, 0:=1)
-a_warriner_lexicon,v_warriner_lexicon = dict(),dict()
-for row in df.iterrows():
-    a_warriner_lexicon[row[1]['Word']] = row[1]['A.Mean.Sum']
-    v_warriner_lexicon[row[1]['Word']] = row[1]['V.Mean.Sum']
-    
-# Valence lexicon from Rheault, et al. (2016)
-df = pd.read_csv('https://raw.githubusercontent.com/lrheault/emotion/master/lexicon-polarity.csv')
-df = df[['lemma','polarity']]
-df['polarity'] = df['polarity'].apply(lambda x: abs(float(x))) # Valence is on a -1 - 1 scale - rescale to give absolute distance from 5 on a 0-1 scale (i.e. 5:=0, 10:=1, 0:=1)
-v_rheault_lexicon = dict()
-for row in df.iterrows():
-    v_rheault_lexicon[row[1]['lemma']] = row[1]['polarity']
+# Module attributes kept for the lexicons and models, loaded when first accessed
+lazy_attributes = {'a_glasgow_lexicon':lambda: load_lexicon('arousal_glasgow'),
+                   'v_glasgow_lexicon':lambda: load_lexicon('valence_glasgow'),
+                   'a_warriner_lexicon':lambda: load_lexicon('arousal_warriner'),
+                   'v_warriner_lexicon':lambda: load_lexicon('valence_warriner'),
+                   'v_rheault_lexicon':lambda: load_lexicon('valence_rheault'),
+                   'anger_estimator':lambda: load_classifier('anger'),
+                   'fear_estimator':lambda: load_classifier('fear'),
+                   'joy_estimator':lambda: load_classifier('joy'),
+                   'sadness_estimator':lambda: load_classifier('sadness'),
+                   'emotionality_lexicon_table':load_emotionality_lexicon_table}
 
-def measure_emotionality(text_list, raw_text,
-                       a_glasgow_lexicon=a_glasgow_lexicon,
-                       v_glasgow_lexicon=v_glasgow_lexicon,
-                       a_warriner_lexicon=a_warriner_lexicon,
-                       v_warriner_lexicon=v_warriner_lexicon,
-                       v_rheault_lexicon=v_rheault_lexicon, 
-                       anger_estimator=anger_estimator,
-                       fear_estimator=fear_estimator,
-                       joy_estimator=joy_estimator,
-                       sadness_estimator=sadness_estimator):
-    
-    def measure_avg_anger_sentence_score(sent_list, anger_estimator=anger_estimator):
-        anger_scores = []
-        # For each sentence:
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-8")]) # ...encode the sentence as UTF-18
-            anger_scores.append(anger_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['predictions'][0][0].numpy()) # ...append anger score to list
-        return np.nanmean(anger_scores)
+def __getattr__(name):
+    if name in lazy_attributes:
+        return lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    def measure_avg_fear_sentence_score(sent_list, fear_estimator=fear_estimator):
-        fear_scores = []
-        # For each sentence:
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-8")]) # ...encode the sentence as UTF-18
-            fear_scores.append(fear_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['predictions'][0][0].numpy()) # ...append fear score to list
-        return np.nanmean(fear_scores)
-    
-    def measure_avg_joy_sentence_score(sent_list, joy_estimator=joy_estimator):
-        joy_scores = []
-        # For each sentence:
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-8")]) # ...encode the sentence as UTF-18
-            joy_scores.append(joy_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['predictions'][0][0].numpy()) # ...append fear score to list
-        return np.nanmean(joy_scores)
+@instrument
+def measure_emotionality(text_list, raw_text,
+                       a_glasgow_lexicon=None,
+                       v_glasgow_lexicon=None,
+                       a_warriner_lexicon=None,
+                       v_warriner_lexicon=None,
+                       v_rheault_lexicon=None, 
+                       anger_estimator=None,
+                       fear_estimator=None,
+                       joy_estimator=None,
+                       sadness_estimator=None,
+                       batch_size=DEFAULT_BATCH_SIZE,
+                       estimator_outputs=None,
+                       lemma_list=None,
+                       lexicon_scores=None,
+                       sentences=None):
     
-    def measure_avg_sadness_sentence_score(sent_list, sadness_estimator=sadness_estimator):
-        sadness_scores = []
-        # For each sentence:
-        for sent in sent_list:
-            example = tf.train.Example() # ...prepare an example for the sentence to be wrapped in
-            example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, "utf-8")]) # ...encode the sentence as UTF-18
-            sadness_scores.append(sadness_estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))['predictions'][0][0].numpy()) # ...append fear score to list
-        return np.nanmean(sadness_scores)
+    def measure_avg_sentence_score(estimator_outputs):
+        sentence_scores = estimator_outputs['predictions'][:,0] # ...score for each sentence
+        return np.nanmean(sentence_scores)
 
-    def measure_avg_arousal_glasgow(text_list, a_glasgow_lexicon=a_glasgow_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(a_glasgow_lexicon[word]) if word in a_glasgow_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
-                      
-    def measure_avg_arousal_warriner(text_list, a_warriner_lexicon=a_warriner_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(a_warriner_lexicon[word]) if word in a_warriner_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
-                      
-    def measure_avg_valence_glasgow(text_list, v_glasgow_lexicon=v_glasgow_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(v_glasgow_lexicon[word]) if word in v_glasgow_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
-                      
-    def measure_avg_valence_warriner(text_list, v_warriner_lexicon=v_warriner_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(v_warriner_lexicon[word]) if word in v_warriner_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
+    # Score every lexicon in one pass over the lemmatised text - rebuilding the table only if non-default lexicons were passed
+    if lexicon_scores is None:
+        norm_lexicons = {'arousal_glasgow':a_glasgow_lexicon,
+                         'arousal_warriner':a_warriner_lexicon,
+                         'valence_glasgow':v_glasgow_lexicon,
+                         'valence_warriner':v_warriner_lexicon,
+                         'valence_rheault':v_rheault_lexicon}
+        norm_lexicons = {name:lexicon if lexicon is not None else load_lexicon(name) for name,lexicon in norm_lexicons.items()}
+        lexicon_table = load_emotionality_lexicon_table()
+        if not lexicon_table.built_from(norm_lexicons=norm_lexicons):
+            lexicon_table = LexiconTable(norm_lexicons=norm_lexicons)
+        lexicon_scores = lexicon_table.score(text_list, lemma_list)
     
-    def measure_avg_valence_rheault(text_list, v_rheault_lexicon=v_rheault_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(v_rheault_lexicon[word]) if word in v_rheault_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
+    # Sentences as NLTK's sent_tokenize(raw_text), held as offsets and segmented once per text - see scorers.segmentation
+    sent_list = sentences if sentences is not None else split_sentences(raw_text, 'punkt')
     
-    sent_list = sent_tokenize(raw_text)
+    # Each classifier is run once per batch of sentences rather than once per sentence
+    if estimator_outputs is None:
+        estimators = {'anger':anger_estimator,'fear':fear_estimator,'joy':joy_estimator,'sadness':sadness_estimator}
+        estimator_outputs = {emotion:batch_predict(estimator if estimator is not None else load_classifier(emotion), sent_list, ['predictions'],
+                                                   encoding='utf-8', batch_size=batch_size)
+                             for emotion,estimator in estimators.items()}
     
-    emotionality_feature_dict = {'avg_arousal_glasgow':measure_avg_arousal_glasgow(text_list),
-                                 'avg_arousal_warriner':measure_avg_arousal_warriner(text_list),
-                                 'avg_valence_glasgow':measure_avg_valence_glasgow(text_list),
-                                 'avg_valence_warriner':measure_avg_valence_warriner(text_list),
-                                 'avg_valence_rheault':measure_avg_valence_rheault(text_list),
-                                 'avg_anger_sentence_score':measure_avg_anger_sentence_score(sent_list),
-                                 'avg_fear_sentence_score':measure_avg_fear_sentence_score(sent_list),
-                                 'avg_joy_sentence_score':measure_avg_joy_sentence_score(sent_list),
-                                 'avg_sadness_sentence_score':measure_avg_sadness_sentence_score(sent_list)}
+    emotionality_feature_dict = {'avg_arousal_glasgow':lexicon_scores['arousal_glasgow'],
+                                 'avg_arousal_warriner':lexicon_scores['arousal_warriner'],
+                                 'avg_valence_glasgow':lexicon_scores['valence_glasgow'],
+                                 'avg_valence_warriner':lexicon_scores['valence_warriner'],
+                                 'avg_valence_rheault':lexicon_scores['valence_rheault'],
+                                 'avg_anger_sentence_score':measure_avg_sentence_score(estimator_outputs['anger']),
+                                 'avg_fear_sentence_score':measure_avg_sentence_score(estimator_outputs['fear']),
+                                 'avg_joy_sentence_score':measure_avg_sentence_score(estimator_outputs['joy']),
+                                 'avg_sadness_sentence_score':measure_avg_sentence_score(estimator_outputs['sadness'])}
     
     return emotionality_feature_dict
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import pickle
+import functools
+import hashlib
+import urllib.request
+from scorers.instrumentation import instrument
+
+# Models and lexicons are loaded on first use rather than at import, so importing the scorers is fast and works offline
+
+scorers_path = os.path.dirname(__file__)
+lexicon_data_path = os.path.join(scorers_path,'lexicon_data')
+classifiers_path = os.path.join(scorers_path,'classifiers')
+
+# Pre-trained TensorFlow classifiers, by name
+classifier_paths = {'subjectivity':os.path.join(classifiers_path,'subjectivity_classifier'),
+                    'anger':os.path.join(classifiers_path,'anger_classifier'),
+                    'fear':os.path.join(classifiers_path,'fear_classifier'),
+                    'joy':os.path.join(classifiers_path,'joy_classifier'),
+                    'sadness':os.path.join(classifiers_path,'sadness_classifier')}
+
+# Lexicons originally read over HTTP - these are vendored into lexicon_data (see the README there), and only downloaded if the local copy is missing
+remote_lexicons = {'wiebe_adjectives.txt':'https://people.cs.pitt.edu/~wiebe/pubs/aaai00/adjsMPQA',
+                   'rheault_polarity.csv':'https://raw.githubusercontent.com/lrheault/emotion/master/lexicon-polarity.csv'}
+
+# Parsed lexicons are pickled here, and only re-parsed when their source file changes
+lexicon_cache_path = os.path.join(lexicon_data_path,'lexicons.pkl')
+# ...bump this whenever the parsing below changes, to invalidate every cached lexicon
+LEXICON_CACHE_VERSION = 1
+
+@functools.lru_cache(maxsize=None)
+@instrument
+def load_classifier(name):
+    import tensorflow as tf
+    return tf.saved_model.load(classifier_paths[name])
+
+def lexicon_source_path(filename):
+    # Return the local copy of a lexicon file, downloading (and so vendoring) a remote lexicon the first time it's needed
+    path = os.path.join(lexicon_data_path, filename)
+    if not os.path.exists(path):
+        if filename not in remote_lexicons:
+            raise FileNotFoundError(f"Lexicon file {path} not found")
+        tmp_path = path+'.tmp'
+        try:
+            urllib.request.urlretrieve(remote_lexicons[filename], tmp_path)
+        except OSError as error:
+            raise FileNotFoundError(f"Lexicon file {path} not found, and couldn't be fetched from {remote_lexicons[filename]}: {error}") from error
+        os.replace(tmp_path, path)
+    return path
+
+def _parse_glasgow(path):
+    # Arousal, valence and semantic size from Scott, et al. (2019) 'The Glasgow Norms: Ratings of 5,500 words on nine scales'
+    import pandas as pd
+    df = pd.read_csv(path)
+    df = df[['Words','AROU','VAL','SIZE']]
+    df = df.drop(0, axis=0) # The first row holds sub-headers for each scale
+    arousal = df.AROU.apply(lambda x: float(x)/10) # Arousal is originally on a 0-10 scale - so rescale to 0-1
+    valence = df.VAL.apply(lambda x: abs(float(x)-5)/5) # Valence is on a 0-10 scale - rescale to give absolute distance from 5 on a 0-1 scale (i.e. 5:=0, 10:=1, 0:=1)
+    size = df.SIZE.apply(lambda x: float(x)/10) # Size is originally on a 0-10 scale - so rescale to 0-1
+    return {'arousal_glasgow':dict(zip(df.Words, arousal)),
+            'valence_glasgow':dict(zip(df.Words, valence)),
+            'semantic_size':dict(zip(df.Words, size))}
+
+def _parse_warriner(path):
+    # Arousal and valence from Warriner, et al. (2013) 'Norms of valence, arousal, and dominance for 13,915 English lemmas'
+    import pandas as pd
+    df = pd.read_csv(path)
+    df = df[['Word','A.Mean.Sum','V.Mean.Sum']]
+    arousal = df['A.Mean.Sum'].apply(lambda x: float(x)/10) # Arousal is originally on a 0-10 scale - so rescale to 0-1
+    valence = df['V.Mean.Sum'].apply(lambda x: abs(float(x)-5)/5) # Valence is on a 0-10 scale - rescale to give absolute distance from 5 on a 0-1 scale
+    return {'arousal_warriner':dict(zip(df.Word, arousal)),
+            'valence_warriner':dict(zip(df.Word, valence))}
+
+def _parse_rheault(path):
+    # Valence from Rheault, et al. (2016)
+    import pandas as pd
+    df = pd.read_csv(path)
+    df = df[['lemma','polarity']]
+    polarity = df['polarity'].apply(lambda x: abs(float(x))) # Valence is on a -1 - 1 scale - rescale to give absolute distance from 0 on a 0-1 scale
+    return {'valence_rheault':dict(zip(df.lemma, polarity))}
+
+def _parse_wiebe(path):
+    # Subjective adjectives from Wiebe (2000) 'Learning subjective adjectives from corpora'
+    import pandas as pd
+    subjective_adjective_list = pd.read_csv(path, header=None)[0].to_list()
+    return {'subjective_adjectives':[word.strip() for word in subjective_adjective_list]}
+
+# Each lexicon, with the file it comes from and the parser for that file
+lexicon_sources = {'arousal_glasgow':('glasgow.csv',_parse_glasgow),
+                   'valence_glasgow':('glasgow.csv',_parse_glasgow),
+                   'semantic_size':('glasgow.csv',_parse_glasgow),
+                   'arousal_warriner':('warriner.csv',_parse_warriner),
+                   'valence_warriner':('warriner.csv',_parse_warriner),
+                   'valence_rheault':('rheault_polarity.csv',_parse_rheault),
+                   'subjective_adjectives':('wiebe_adjectives.txt',_parse_wiebe)}
+
+def _source_fingerprint(path):
+    stat = os.stat(path)
+    return (LEXICON_CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+
+def _read_lexicon_cache():
+    if not os.path.exists(lexicon_cache_path):
+        return dict()
+    try:
+        with open(lexicon_cache_path, 'rb') as file:
+            return pickle.load(file)
+    except (pickle.UnpicklingError, EOFError):
+        return dict() # A corrupt cache is simply rebuilt
+
+def _write_lexicon_cache(lexicon_cache):
+    tmp_path = lexicon_cache_path+'.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(lexicon_cache, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, lexicon_cache_path)
+
+@functools.lru_cache(maxsize=None)
+@instrument
+def load_lexicon(name):
+    # Return a lexicon from the binary cache, parsing its source file (and refreshing the cache) only if the file has changed
+    filename,parser = lexicon_sources[name]
+    path = lexicon_source_path(filename)
+    fingerprint = _source_fingerprint(path)
+
+    lexicon_cache = _read_lexicon_cache()
+    if name in lexicon_cache and lexicon_cache[name][0]==fingerprint:
+        return lexicon_cache[name][1]
+
+    # Parse the whole file once, caching every lexicon it holds
+    for parsed_name,lexicon in parser(path).items():
+        lexicon_cache[parsed_name] = (fingerprint,lexicon)
+    try:
+        _write_lexicon_cache(lexicon_cache)
+    except OSError:
+        pass # A read-only checkout just means re-parsing next time
+    return lexicon_cache[name][1]
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1<<20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def lexicon_fingerprint(name):
+    # Identifies the exact contents of a lexicon's source file (and the parsing applied to it)
+    filename,parser = lexicon_sources[name]
+    return f"{filename}:{LEXICON_CACHE_VERSION}:{_file_digest(lexicon_source_path(filename))}"
+
+@functools.lru_cache(maxsize=None)
+def classifier_fingerprint(name):
+    # Identifies the exact version of a classifier - the variables index holds a checksum of every weight
+    path = classifier_paths[name]
+    digests = [_file_digest(os.path.join(path, filename)) for filename in ['saved_model.pb','variables/variables.index']]
+    return f"{name}:{':'.join(digests)}"
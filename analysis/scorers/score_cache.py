@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from scorers.instrumentation import instrument,record_cache
+
+# Bump a family's version whenever its scoring code changes, so documents scored by the old code are re-scored
+SCORER_VERSIONS = {'vague':1,
+                   'subj':1,
+                   'emot':1}
+
+# Default location of the score store, next to the scored datasets
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__),'..','scored_datasets','score_cache.sqlite')
+
+class ScoreCache:
+    # On-disk store of per-family document scores, keyed by a hash of (document text, scorer version, lexicon/model fingerprint)
+    # ...so re-scoring an unchanged document is a lookup, and a changed lexicon or model misses automatically
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY,
+                                                                      family TEXT NOT NULL,
+                                                                      fingerprint TEXT NOT NULL,
+                                                                      scores TEXT NOT NULL,
+                                                                      last_used REAL NOT NULL)''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS scores_family ON scores (family, fingerprint)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+        self.connection.commit()
+
+    @staticmethod
+    def family_fingerprint(family, resource_fingerprints):
+        # Combine a family's scorer version with the fingerprints of every lexicon and model it uses
+        return hashlib.sha256('|'.join([family,str(SCORER_VERSIONS[family])]+list(resource_fingerprints)).encode()).hexdigest()
+
+    @staticmethod
+    def key(text, family, fingerprint):
+        return hashlib.sha256('\x00'.join([family,fingerprint,text]).encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    @instrument
+    def get_many(self, keys):
+        # Return the cached scores for whichever of these keys are present, marking them as recently used
+        found = dict()
+        keys = list(keys)
+        for start in range(0, len(keys), 500): # ...staying under SQLite's limit on query parameters
+            batch = keys[start:start+500]
+            rows = self.connection.execute(f"SELECT key,scores FROM scores WHERE key IN ({','.join('?'*len(batch))})", batch)
+            for key,scores in rows:
+                found[key] = json.loads(scores)
+        if len(found)>0:
+            now = time.time()
+            self.connection.executemany('UPDATE scores SET last_used=? WHERE key=?', [(now,key) for key in found])
+            self.connection.commit()
+        self.hits += len(found)
+        self.misses += len(keys)-len(found)
+        record_cache('score_cache', len(found), len(keys)-len(found))
+        return found
+
+    @instrument
+    def put_many(self, entries):
+        # Store (key, family, fingerprint, scores) entries - scores are a dict of floats (NaN allowed), or None for a text with no words
+        now = time.time()
+        self.connection.executemany('INSERT OR REPLACE INTO scores VALUES (?,?,?,?,?)',
+                                    [(key,family,fingerprint,json.dumps(scores),now) for key,family,fingerprint,scores in entries])
+        self.connection.commit()
+
+    def invalidate(self, family, keep_fingerprint=None):
+        # Drop a family's cached scores - e.g. after its lexicon or classifier changes - optionally keeping those of the current fingerprint
+        if keep_fingerprint is None:
+            cursor = self.connection.execute('DELETE FROM scores WHERE family=?', (family,))
+        else:
+            cursor = self.connection.execute('DELETE FROM scores WHERE family=? AND fingerprint!=?', (family,keep_fingerprint))
+        self.connection.commit()
+        return cursor.rowcount
+
+    def compact(self, max_entries=None, max_age_days=None):
+        # Evict the least recently used entries beyond max_entries, and any unused for max_age_days, then reclaim the space on disk
+        evicted = 0
+        if max_age_days is not None:
+            cursor = self.connection.execute('DELETE FROM scores WHERE last_used<?', (time.time()-max_age_days*86400,))
+            evicted += cursor.rowcount
+        if max_entries is not None:
+            cursor = self.connection.execute('''DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used DESC
+                                                                                 LIMIT -1 OFFSET ?)''', (max_entries,))
+            evicted += cursor.rowcount
+        self.connection.commit()
+        self.connection.execute('VACUUM')
+        return evicted
+
+    def stats(self):
+        entries = dict(self.connection.execute('SELECT family,COUNT(*) FROM scores GROUP BY family').fetchall())
+        lookups = self.hits+self.misses
+        return {'entries':entries,
+                'hits':self.hits,
+                'misses':self.misses,
+                'hit_rate':self.hits/lookups if lookups>0 else 0.0}
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
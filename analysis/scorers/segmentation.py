@@ -0,0 +1,88 @@
+import functools
+import itertools
+import numpy as np
+import regex as re
+from scorers.instrumentation import instrument,register_cache
+
+__all__ = ['SENTENCE_CACHE_SIZE','SENTENCE_CACHE_MAX_CHARS','Sentences','iter_sentence_spans','split_sentences']
+
+# Number of segmented documents kept before the least recently used are dropped - only enough to share one document's
+# segmentation between the scorers that need it, as callers scoring a corpus hold each document's Sentences themselves
+SENTENCE_CACHE_SIZE = 16
+# Texts longer than this (e.g. a whole day's PMQs) are segmented afresh each time rather than kept alive by the cache
+SENTENCE_CACHE_MAX_CHARS = 1000000
+
+# The subjectivity scorer's sentences - re.sub('\s+',' ',text).split('. ') - end at a full stop followed by any run of whitespace
+period_boundary_pattern = re.compile(r'\.\s+')
+whitespace_pattern = re.compile(r'\s+')
+
+class Sentences:
+    # Sentences of a text held as an (n, 2) array of start/end offsets into it, rather than as copied substrings
+    # ...each sentence is only sliced out (and its whitespace collapsed, for the 'period' splitter) when it's read
+    def __init__(self, text, spans, collapse_whitespace=False):
+        self.text = text
+        self.spans = spans
+        self.collapse_whitespace = collapse_whitespace
+
+    def __len__(self):
+        return len(self.spans)
+
+    def _sentence(self, start, end):
+        sentence = self.text[start:end]
+        return whitespace_pattern.sub(' ', sentence) if self.collapse_whitespace else sentence
+
+    def __getitem__(self, idx):
+        start,end = self.spans[idx]
+        return self._sentence(start, end)
+
+    def __iter__(self):
+        for start,end in self.spans.tolist():
+            yield self._sentence(start, end)
+
+    def lengths(self):
+        return self.spans[:,1]-self.spans[:,0]
+
+def _period_spans(text):
+    # Offsets of the sentences re.sub('\s+',' ',text).split('. ') gives - a '. ' in the collapsed text is always a full stop
+    # followed by a whitespace run in the original, so splitting there and collapsing each slice gives the same sentences
+    start = 0
+    for boundary in period_boundary_pattern.finditer(text):
+        yield start,boundary.start()
+        start = boundary.end()
+    yield start,len(text)
+
+@functools.lru_cache(maxsize=None)
+def _punkt_tokenizer(language='english'):
+    # The tokenizer behind NLTK's sent_tokenize(), loaded once
+    try:
+        from nltk.tokenize import PunktTokenizer
+        return PunktTokenizer(language)
+    except ImportError:
+        import nltk
+        return nltk.data.load(f'tokenizers/punkt/{language}.pickle') # ...NLTK releases before punkt_tab
+
+def iter_sentence_spans(text, method='period'):
+    # Yield the (start, end) offsets of each sentence in turn, without holding any of them - for very long texts
+    # ...'period' splits as the subjectivity scorer always has, 'punkt' as NLTK's sent_tokenize() used by the emotionality scorer
+    if method=='period':
+        return _period_spans(text)
+    if method=='punkt':
+        return _punkt_tokenizer().span_tokenize(text)
+    raise ValueError(f"Unknown sentence splitter {method!r}")
+
+@instrument(name='scorers.segmentation.split_sentences') # ...inside the cache, so only documents actually segmented are timed
+def _split_sentences(text, method):
+    dtype = np.int32 if len(text)<2**31 else np.int64
+    spans = np.fromiter(itertools.chain.from_iterable(iter_sentence_spans(text, method)), dtype=dtype).reshape(-1,2)
+    spans.flags.writeable = False
+    return Sentences(text, spans, collapse_whitespace=(method=='period'))
+
+_cached_split_sentences = functools.lru_cache(maxsize=SENTENCE_CACHE_SIZE)(_split_sentences)
+
+def split_sentences(text, method='period'):
+    # Segment a text into a read-only Sentences, shared by every scorer that needs the same split of the same text
+    if len(text)>SENTENCE_CACHE_MAX_CHARS:
+        return _split_sentences(text, method)
+    return _cached_split_sentences(text, method)
+
+register_cache('sentence_cache', lambda: _cached_split_sentences.cache_info()[:2])
@@ -1,8 +1,7 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import numpy as np
-import os
-from nltk.stem import WordNetLemmatizer
+import functools
+from scorers.lexicon import *
+from scorers.resources import load_lexicon
+from scorers.instrumentation import instrument
 
 # Deictic words taken from Culpeper and Haugh (2014) Pragmatics and the English Language
 deictic_word_list = ['the','this','these','that','those','they','them']
@@ -31,47 +30,54 @@ booster_word_list = ['actually','always','argue','assuredly','certain','certainl
                      'unmistakably','unquestionably','will','wrong']
 
 # Semantic size lexicon taken from Scott, et al. (2019) 'The Glasgow Norms: Ratings of 5,500 words on nine scales'
-df = pd.read_csv(os.path.join(os.path.dirname(__file__),'lexicon_data/glasgow.csv'))
-df = df[['Words','SIZE']]
-df = df.drop(0, axis=0)
-df.SIZE = df.SIZE.apply(lambda x: float(x)/10) # Size is originally on a 0-10 scale - so rescale to 0-1
-semantic_size_lexicon = dict()
-for row in df.iterrows():
-    semantic_size_lexicon[row[1]['Words']] = row[1]['SIZE']
+# ...this is loaded on first use - see scorers.resources
 
+vagueness_word_lists = {'deictic_word':deictic_word_list,
+                        'approximator_word':approximator_word_list,
+                        'shield_word':shield_word_list,
+                        'booster_word':booster_word_list}
+
+@functools.lru_cache(maxsize=None)
+def load_vagueness_lexicon_table():
+    # Compile the word lists and the semantic size lexicon into a single lookup table
+    return LexiconTable(vagueness_word_lists, {'semantic_size':load_lexicon('semantic_size')})
+
+def __getattr__(name):
+    # Keep the lexicon and table available as module attributes, loading them when first accessed
+    if name=='semantic_size_lexicon':
+        return load_lexicon('semantic_size')
+    if name=='vagueness_lexicon_table':
+        return load_vagueness_lexicon_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@instrument
 def measure_vagueness(text_list, 
                        deictic_word_list=deictic_word_list,
                        approximator_word_list=approximator_word_list,
                        shield_word_list=shield_word_list,
                        booster_word_list=booster_word_list,
-                       semantic_size_lexicon=semantic_size_lexicon):
-    
-    def measure_inverse_deictic_word_freq(text_list, deictic_word_list=deictic_word_list):
-        deictic_word_count = sum([word in deictic_word_list for word in text_list])
-        return 1-(deictic_word_count/len(text_list))
+                       semantic_size_lexicon=None,
+                       lemma_list=None,
+                       lexicon_scores=None):
     
-    def measure_approximator_word_freq(text_list, approximator_word_list=approximator_word_list):
-        approximator_word_count = sum([word in approximator_word_list for word in text_list])
-        return approximator_word_count/len(text_list)
-
-    def measure_inverse_shield_word_freq(text_list, shield_word_list=shield_word_list):
-        shield_word_count = sum([word in shield_word_list for word in text_list])
-        return 1-(shield_word_count/len(text_list))
-
-    def measure_booster_word_freq(text_list, booster_word_list=booster_word_list):
-        booster_word_count = sum([word in booster_word_list for word in text_list])
-        return booster_word_count/len(text_list)
-
-    def measure_avg_semantic_size(text_list, semantic_size_lexicon=semantic_size_lexicon):
-        wnl = WordNetLemmatizer()
-        lemmatised_text_list = [wnl.lemmatize(word) for word in text_list]
-        lemma_score_list = [float(semantic_size_lexicon[word]) if word in semantic_size_lexicon.keys() else np.nan for word in lemmatised_text_list]
-        return np.nanmean(lemma_score_list)
+    # Score every lexicon feature in one pass - rebuilding the table only if non-default lexicons were passed
+    if lexicon_scores is None:
+        if semantic_size_lexicon is None:
+            semantic_size_lexicon = load_lexicon('semantic_size')
+        word_lists = {'deictic_word':deictic_word_list,
+                      'approximator_word':approximator_word_list,
+                      'shield_word':shield_word_list,
+                      'booster_word':booster_word_list}
+        norm_lexicons = {'semantic_size':semantic_size_lexicon}
+        lexicon_table = load_vagueness_lexicon_table()
+        if not lexicon_table.built_from(word_lists, norm_lexicons):
+            lexicon_table = LexiconTable(word_lists, norm_lexicons)
+        lexicon_scores = lexicon_table.score(text_list, lemma_list)
     
-    vagueness_feature_dict = {'inverse_deictic_word_freq':measure_inverse_deictic_word_freq(text_list),
-                              'approximator_word_freq':measure_approximator_word_freq(text_list),
-                              'inverse_shield_word_freq':measure_inverse_shield_word_freq(text_list),
-                              'booster_word_freq':measure_booster_word_freq(text_list),
-                              'avg_semantic_size':measure_avg_semantic_size(text_list)}
+    vagueness_feature_dict = {'inverse_deictic_word_freq':1-lexicon_scores['deictic_word'],
+                              'approximator_word_freq':lexicon_scores['approximator_word'],
+                              'inverse_shield_word_freq':1-lexicon_scores['shield_word'],
+                              'booster_word_freq':lexicon_scores['booster_word'],
+                              'avg_semantic_size':lexicon_scores['semantic_size']}
     
     return vagueness_feature_dict
\ No newline at end of file
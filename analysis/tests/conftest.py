@@ -0,0 +1,107 @@
+import os
+import sys
+import types
+import collections
+import numpy as np
+import pytest
+
+# The scorers are imported as a top-level package from the analysis folder, as the notebooks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stand-ins for the parts of TensorFlow the scorers use, so the batching around the classifiers can be tested without it
+# ...each serialised example is just the encoded sentence, and a constant is the list of examples
+
+class _Feature:
+    def __init__(self):
+        self.bytes_list = types.SimpleNamespace(value=[])
+
+class _Example:
+    def __init__(self):
+        self.features = types.SimpleNamespace(feature=collections.defaultdict(_Feature))
+
+    def SerializeToString(self):
+        return self.features.feature['sentence'].bytes_list.value[0]
+
+class _Tensor:
+    def __init__(self, array):
+        self.array = array
+
+    def numpy(self):
+        return self.array
+
+@pytest.fixture
+def fake_tensorflow(monkeypatch):
+    tf = types.ModuleType('tensorflow')
+    tf.train = types.SimpleNamespace(Example=_Example)
+    tf.string = 'string'
+    tf.constant = lambda values, dtype=None: list(values)
+    monkeypatch.setitem(sys.modules, 'tensorflow', tf)
+    return tf
+
+def sentence_score(sentence):
+    # A deterministic stand-in for a classifier's score of a sentence, in [0, 1)
+    return (sum(map(ord, sentence))%97)/97
+
+class StubEstimator:
+    # A stand-in classifier with a 'predict' signature, scoring each sentence from its text and recording every batch it's given
+    # ...examples must decode with the encoding the real classifier was trained on
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self.batch_sizes = []
+        self.signatures = {'predict':self.predict}
+
+    def predict(self, examples):
+        self.batch_sizes.append(len(examples))
+        scores = np.array([sentence_score(example.decode(self.encoding)) for example in examples], dtype=np.float32).reshape(-1,1)
+        return {'predictions':_Tensor(scores),
+                'probabilities':_Tensor(np.hstack([1-scores, scores])),
+                'class_ids':_Tensor((scores>0.5).astype(np.int64))}
+
+@pytest.fixture
+def stub_classifiers(fake_tensorflow, monkeypatch):
+    # Every scorer module's load_classifier() gives a stub, with the subjectivity classifier's UTF-16 input
+    from scorers import pipeline,aggregation,objectivity_vs_subjectivity,rationality_vs_emotionality
+    estimators = {name:StubEstimator('utf-16' if name=='subjectivity' else 'utf-8') for name in ['subjectivity','anger','fear','joy','sadness']}
+    for module in [pipeline,aggregation,objectivity_vs_subjectivity,rationality_vs_emotionality]:
+        monkeypatch.setattr(module, 'load_classifier', estimators.__getitem__)
+    return estimators
+
+# Small stand-ins for the lexicons fetched over HTTP, for checkouts they aren't vendored in
+stub_remote_lexicons = {'wiebe_adjectives.txt':"absurd\ngreat\nterrible\ndisgraceful\nwonderful\n",
+                        'rheault_polarity.csv':"lemma,polarity\ngovernment,0.25\nhouse,0.1\ncrisis,-0.8\nwonderful,0.9\nschool,0.3\n"}
+
+def _clear_scorer_caches():
+    from scorers import resources,pipeline,segmentation,objectivity_vs_subjectivity,rationality_vs_emotionality,specificity_vs_vagueness
+    for cached in [resources.load_lexicon, resources.lexicon_fingerprint, pipeline.load_lexicon_table, pipeline.family_fingerprint,
+                   objectivity_vs_subjectivity.load_subjectivity_lexicon_table, rationality_vs_emotionality.load_emotionality_lexicon_table,
+                   specificity_vs_vagueness.load_vagueness_lexicon_table, segmentation._cached_split_sentences]:
+        cached.cache_clear()
+
+@pytest.fixture
+def offline_scorers(stub_classifiers, tmp_path, monkeypatch):
+    # The scorers, with stub classifiers - and stand-ins for any NLTK data or remote lexicon this checkout doesn't have
+    from scorers import resources,segmentation
+    from scorers.lemmatisation import lemma_cache
+    _clear_scorer_caches()
+    monkeypatch.setattr(resources, 'lexicon_cache_path', str(tmp_path/'lexicons.pkl'))
+    source_path = resources.lexicon_source_path
+    def lexicon_source_path(filename):
+        if filename in stub_remote_lexicons and not os.path.exists(os.path.join(resources.lexicon_data_path, filename)):
+            path = tmp_path/filename
+            path.write_text(stub_remote_lexicons[filename])
+            return str(path)
+        return source_path(filename)
+    monkeypatch.setattr(resources, 'lexicon_source_path', lexicon_source_path)
+
+    monkeypatch.setattr(lemma_cache, 'lemmas', collections.OrderedDict())
+    try:
+        lemma_cache._lemmatise_uncached('tests')
+    except LookupError: # ...no WordNet data - stand in a lemmatiser that drops a plural 's'
+        monkeypatch.setattr(type(lemma_cache), '_lemmatise_uncached', lambda self, word: word[:-1] if word.endswith('s') and len(word)>3 else word)
+    try:
+        segmentation._punkt_tokenizer()
+    except LookupError: # ...no punkt data - stand in an untrained Punkt tokenizer
+        from nltk.tokenize.punkt import PunktSentenceTokenizer
+        monkeypatch.setattr(segmentation, '_punkt_tokenizer', lambda language='english': PunktSentenceTokenizer())
+    yield stub_classifiers
+    _clear_scorer_caches()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+from scorers.pipeline import score_document,all_families
+from scorers.aggregation import score_windows,score_windows_dataframe,aggregate_dataframe,feature_statistics
+
+texts = ["The Government's schools policy is a wonderful success. Perhaps it may help, or it might not.\n\n"
+         "Order! The hon. Member is absurd - this crisis is terrible, and it is about a million pounds.",
+         "I think that the house should vote. Honestly, it is roughly the biggest issue of our time.\nSchools and hospitals.\n",
+         "\nWe will always support our schools.  The crisis is, apparently, disgraceful.\n\nIt could possibly be great. Maybe.",
+         "Yes."]
+
+def assert_scores_equal(scores, expected):
+    assert list(scores)==list(expected)
+    for name,value in expected.items():
+        assert np.isclose(scores[name], value, rtol=1e-6, atol=1e-6, equal_nan=True), (name,scores[name],value)
+
+@pytest.mark.parametrize('windows', ['paragraph','document'])
+def test_windows_add_up_to_score_document(offline_scorers, windows):
+    for text in texts:
+        statistics = score_windows(text, all_families, windows)
+        total = statistics.total()
+        assert_scores_equal(dict(zip(total.feature_names, total.scores()[0])), score_document(text))
+        assert len(statistics)==(len([line for line in text.split('\n') if line!='']) if windows=='paragraph' else 1)
+    assert score_windows('...', all_families, windows) is None
+
+def test_aggregate_dataframe_reproduces_score_document(offline_scorers):
+    df = pd.DataFrame({'doc':range(len(texts)), 'speaker':['a','b','a','b'], 'text':texts})
+    levels = aggregate_dataframe(df, 'text', {'doc':'doc', 'speaker':'speaker', 'doc_speaker':['doc','speaker']}, windows='paragraph', processes=1)
+    for doc,text in enumerate(texts):
+        expected = score_document(text)
+        assert_scores_equal(levels['doc'].loc[doc, list(expected)].to_dict(), expected)
+        assert_scores_equal(levels['doc_speaker'].loc[(doc,df.speaker[doc]), list(expected)].to_dict(), expected)
+    assert levels['doc'].n_texts.tolist()==[1,1,1,1]
+
+    # A group of texts scores as the texts joined by a line break, for every lexicon feature
+    lexicon_features = [family+'_'+name for family,features in feature_statistics.items() for name,statistic,inverse in features
+                        if 'sentence' not in statistic and statistic not in ('anger','fear','joy','sadness')]
+    for speaker,speaker_df in df.groupby('speaker'):
+        expected = score_document('\n'.join(speaker_df.text))
+        assert_scores_equal(levels['speaker'].loc[speaker, lexicon_features].to_dict(), {name:expected[name] for name in lexicon_features})
+
+def test_window_frame_weighted_means(offline_scorers):
+    # Each window's word list scores, weighted by its tokens, give back the document's - and each window scores as its own paragraph
+    df = pd.DataFrame({'text':texts})
+    windows_df = score_windows_dataframe(df, 'text', ('vague',), windows='paragraph', processes=1)
+    word_list_features = ['vague_inverse_deictic_word_freq','vague_approximator_word_freq','vague_inverse_shield_word_freq','vague_booster_word_freq']
+    for row,text in enumerate(texts):
+        row_df = windows_df[windows_df.row==row]
+        expected = score_document(text, ('vague',))
+        weighted = {name:np.average(row_df[name], weights=row_df.n_tokens) for name in word_list_features}
+        assert_scores_equal(weighted, {name:expected[name] for name in word_list_features})
+        for window in row_df.itertuples():
+            paragraph_scores = score_document(text[window.start:window.end], ('vague',))
+            assert_scores_equal({name:getattr(window, name) for name in list(paragraph_scores)}, paragraph_scores)
@@ -0,0 +1,41 @@
+import random
+from scorers.cleaning import clean,clean_to_paragraphs,iter_clean,iter_clean_paragraphs
+
+# The original replace-and-split implementations, which the single-pass tokeniser must reproduce exactly
+def baseline_clean(text):
+    no_punct = text.replace('\n',' ')
+    for punct in '\\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\'':
+        no_punct = no_punct.replace(punct, ' ')
+    while '  ' in no_punct:
+        no_punct = no_punct.replace('  ',' ')
+    return [word.lower() for word in no_punct.split(' ') if word!='']
+
+def baseline_clean_to_paragraphs(text):
+    no_punct = text.split('\n')
+    for idx,paragraph in enumerate(no_punct):
+        for punct in '\\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\'':
+            paragraph = paragraph.replace(punct, ' ')
+        while '  ' in paragraph:
+            paragraph = paragraph.replace('  ',' ')
+        no_punct[idx] = paragraph
+    return [[word.lower() for word in paragraph.split(' ') if word!=''] for paragraph in no_punct if paragraph!='']
+
+# Letters whose lower-casing depends on context or changes length, mixed with separators and other whitespace
+alphabet = list('aZ ΟΔΣσςİIẞß\u0130\u03a3\n\t\r.,\'-£_é') + ['  ','\n\n',' .']
+
+def random_texts(n, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0,30))) for _ in range(n)]
+
+def test_clean_matches_baseline():
+    for text in random_texts(20000):
+        assert clean(text)==baseline_clean(text), repr(text)
+        assert list(iter_clean(text))==baseline_clean(text), repr(text)
+
+def test_clean_to_paragraphs_matches_baseline():
+    for text in random_texts(20000, seed=1):
+        assert clean_to_paragraphs(text)==baseline_clean_to_paragraphs(text), repr(text)
+        assert list(iter_clean_paragraphs(text))==baseline_clean_to_paragraphs(text), repr(text)
+
+def test_final_sigma():
+    assert clean('ΟΔΟΣ.X ΟΔΟΣ')==['οδος','x','οδος']
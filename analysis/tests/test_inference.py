@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from scorers.inference import batch_predict,batch_predict_corpus,serialise_sentences
+from conftest import StubEstimator
+
+sentences = ['The hon. Member is right', 'Order, order', "Ça va - the Minister's reply was 'très bien' 😀", '', 'Yes']*23
+
+def per_sentence_predict(tf, estimator, sent_list, output_key, column, encoding):
+    # The scorers' original path - one example, and one call of the signature, per sentence
+    scores = []
+    for sent in sent_list:
+        example = tf.train.Example()
+        example.features.feature['sentence'].bytes_list.value.extend([bytes(sent, encoding)])
+        scores.append(estimator.signatures['predict'](examples=tf.constant([example.SerializeToString()]))[output_key].numpy()[0][column])
+    return np.array(scores)
+
+@pytest.mark.parametrize('encoding', ['utf-8','utf-16'])
+def test_batches_match_per_sentence(fake_tensorflow, encoding):
+    estimator = StubEstimator(encoding)
+    outputs = batch_predict(estimator, sentences, ['class_ids','probabilities'], encoding=encoding, batch_size=32)
+    assert estimator.batch_sizes==[32,32,32,19]
+    assert outputs['class_ids'].shape==(len(sentences),1) and outputs['probabilities'].shape==(len(sentences),2)
+    reference = StubEstimator(encoding)
+    assert np.array_equal(outputs['class_ids'][:,0], per_sentence_predict(fake_tensorflow, reference, sentences, 'class_ids', 0, encoding))
+    assert np.array_equal(outputs['probabilities'][:,1], per_sentence_predict(fake_tensorflow, reference, sentences, 'probabilities', 1, encoding))
+    assert reference.batch_sizes==[1]*2*len(sentences)
+
+def test_sentences_are_encoded_as_asked(fake_tensorflow):
+    # The subjectivity classifier reads UTF-16 (with its byte order mark), the emotion classifiers UTF-8
+    assert serialise_sentences(['Ça va'], encoding='utf-16')==[bytes('Ça va', 'utf-16')]
+    assert serialise_sentences(['Ça va'])==['Ça va'.encode('utf-8')]
+    with pytest.raises(UnicodeDecodeError):
+        batch_predict(StubEstimator('utf-8'), ['Ça va'], ['predictions'], encoding='utf-16')
+
+def test_empty_sentence_list_skips_the_model(fake_tensorflow):
+    estimator = StubEstimator()
+    outputs = batch_predict(estimator, [], ['predictions','probabilities'])
+    assert estimator.batch_sizes==[]
+    assert sorted(outputs)==['predictions','probabilities'] and all(len(array)==0 for array in outputs.values())
+
+def test_corpus_batches_across_documents(fake_tensorflow):
+    # Sentences are batched across document boundaries, then split back into one output per document - empty documents included
+    sent_lists = [sentences[:7], [], sentences[7:8], sentences[8:60], [], sentences[60:]]
+    estimator = StubEstimator()
+    outputs = batch_predict_corpus(estimator, sent_lists, ['predictions'], batch_size=50)
+    assert estimator.batch_sizes==[50,50,15]
+    assert [len(document_outputs['predictions']) for document_outputs in outputs]==[len(sent_list) for sent_list in sent_lists]
+    for sent_list,document_outputs in zip(sent_lists, outputs):
+        expected = batch_predict(StubEstimator(), sent_list, ['predictions'])['predictions']
+        assert np.array_equal(document_outputs['predictions'].reshape(-1), expected.reshape(-1))
+
+    estimator = StubEstimator()
+    assert [len(document_outputs['predictions']) for document_outputs in batch_predict_corpus(estimator, [[],[]], ['predictions'])]==[0,0]
+    assert estimator.batch_sizes==[]
@@ -0,0 +1,54 @@
+import pytest
+
+from scorers.lemmatisation import LemmaCache,lemmatise
+
+class CountingLemmaCache(LemmaCache):
+    # A cache over a stand-in lemmatiser, counting how often it's called on each word
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.lookups = []
+
+    def _lemmatise_uncached(self, word):
+        self.lookups.append(word)
+        return word.rstrip('s')
+
+def test_least_recently_used_words_are_evicted():
+    cache = CountingLemmaCache(maxsize=3)
+    assert [cache.lemmatise(word) for word in ['cats','dogs','birds']]==['cat','dog','bird']
+    assert cache.lemmatise('cats')=='cat' # ...a hit, making 'dogs' the least recently used
+    cache.lemmatise('fishes')
+    assert list(cache.lemmas)==['birds','cats','fishes']
+    cache.lemmatise('dogs') # ...evicted, so looked up again - evicting 'birds'
+    assert list(cache.lemmas)==['cats','fishes','dogs']
+    assert cache.lookups==['cats','dogs','birds','fishes','dogs']
+    assert cache.stats()=={'size':3, 'maxsize':3, 'hits':1, 'misses':5, 'hit_rate':1/6}
+
+def test_lemmatise_list_looks_up_each_word_once():
+    cache = CountingLemmaCache(maxsize=100)
+    assert lemmatise(['cats','sat','cats','mats','sat'], cache)==['cat','sat','cat','mat','sat']
+    assert sorted(cache.lookups)==['cats','mats','sat'] and (cache.hits,cache.misses)==(0,3)
+    assert cache.lemmatise_list(['mats','dogs'])==['mat','dog']
+    assert (cache.hits,cache.misses)==(1,4)
+    cache.clear()
+    assert len(cache.lemmas)==0 and cache.hit_rate==0.0
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path/'lemma_cache.pkl')
+    cache = CountingLemmaCache(maxsize=10)
+    cache.lemmatise_list(['cats','dogs','birds'])
+    cache.lemmatise('cats')
+    cache.save(path)
+    assert not (tmp_path/'lemma_cache.pkl.tmp').exists()
+
+    # A warm cache answers every saved word without the lemmatiser, in the saved recency order
+    warm_cache = CountingLemmaCache(maxsize=10)
+    assert warm_cache.load(path)==3
+    assert list(warm_cache.lemmas.items())==list(cache.lemmas.items())
+    assert warm_cache.lemmatise_list(['birds','cats','dogs'])==['bird','cat','dog'] and warm_cache.lookups==[]
+    assert warm_cache.hits==3 and warm_cache.misses==0
+
+    # ...a smaller cache keeps only the most recently used of what was saved, and a missing file is a cold start
+    small_cache = CountingLemmaCache(maxsize=2)
+    small_cache.load(path)
+    assert list(small_cache.lemmas)==list(cache.lemmas)[-2:]
+    assert CountingLemmaCache(maxsize=2).load(str(tmp_path/'missing.pkl'))==0
@@ -0,0 +1,59 @@
+import random
+import warnings
+import numpy as np
+import pytest
+
+from scorers.lexicon import LexiconTable
+
+# Word lists and norm lexicons over a small vocabulary, with out-of-vocabulary words mixed into every text
+vocabulary = ['the','house','may','possibly','clearly','never','about','crisis','schools','school','nan','vote',"member's",'Ça']
+word_lists = {'shield_word':['may','possibly','about'], 'booster_word':['clearly','never','may'], 'empty_list':[]}
+norm_lexicons = {'semantic_size':{'house':0.6,'school':0.4,'crisis':0.9,'vote':0.35},
+                 'valence':{'crisis':0.8,'house':0.05,'never':0.3,'member':0.5}}
+
+def lemmatise(word):
+    return word[:-1] if word.endswith('s') else word
+
+# The scorers' original formulas, one word at a time
+def baseline_word_list_freq(text_list, word_list):
+    word_count = sum([word in word_list for word in text_list])
+    return word_count/len(text_list)
+
+def baseline_avg_norm(text_list, lexicon):
+    lemmatised_text_list = [lemmatise(word) for word in text_list]
+    lemma_score_list = [float(lexicon[word]) if word in lexicon.keys() else np.nan for word in lemmatised_text_list]
+    return np.nanmean(lemma_score_list)
+
+def test_matches_baseline_formulas():
+    table = LexiconTable(word_lists, norm_lexicons)
+    assert table.feature_names==['shield_word','booster_word','empty_list','semantic_size','valence']
+    rng = random.Random(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # ...texts with no lemma in a lexicon
+        for _ in range(2000):
+            text_list = [rng.choice(vocabulary+['oov','words']) for _ in range(rng.randint(1,25))]
+            scores = table.score(text_list, [lemmatise(word) for word in text_list])
+            for name,word_list in word_lists.items():
+                assert scores[name]==pytest.approx(baseline_word_list_freq(text_list, word_list), abs=1e-12)
+            for name,lexicon in norm_lexicons.items():
+                assert np.isclose(scores[name], baseline_avg_norm(text_list, lexicon), atol=1e-12, equal_nan=True)
+
+def test_merged_tables_score_alike():
+    merged = LexiconTable.merge(LexiconTable(word_lists), LexiconTable(norm_lexicons=norm_lexicons))
+    text_list = ['the','house','may','possibly','never','crisis','schools']
+    lemma_list = [lemmatise(word) for word in text_list]
+    assert merged.score(text_list, lemma_list)==LexiconTable(word_lists, norm_lexicons).score(text_list, lemma_list)
+    assert merged.built_from(word_lists, norm_lexicons)
+    assert not merged.built_from({name:list(words) for name,words in word_lists.items()}, norm_lexicons) # ...copies aren't the same lists
+    with pytest.raises(ValueError):
+        LexiconTable.merge(LexiconTable({'shield_word':['may']}), LexiconTable({'shield_word':['might']}))
+
+def test_empty_text():
+    # Word lists raise on an empty text, as the original loops did - norm lexicons give NaN, with nanmean's warning
+    with pytest.raises(ZeroDivisionError):
+        LexiconTable(word_lists, norm_lexicons).score([], [])
+    with pytest.warns(RuntimeWarning):
+        scores = LexiconTable(norm_lexicons=norm_lexicons).score([], [])
+    assert np.isnan(scores['semantic_size']) and np.isnan(scores['valence'])
+    with pytest.warns(RuntimeWarning):
+        assert np.isnan(baseline_avg_norm([], norm_lexicons['valence']))
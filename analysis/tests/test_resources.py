@@ -0,0 +1,69 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+import pytest
+
+pytest.importorskip('pandas')
+from scorers import resources
+from scorers.resources import lexicon_sources,remote_lexicons,lexicon_data_path,load_lexicon
+
+@pytest.mark.parametrize('name', sorted(lexicon_sources))
+def test_every_lexicon_loads(name):
+    filename,parser = lexicon_sources[name]
+    if filename in remote_lexicons and not os.path.exists(os.path.join(lexicon_data_path, filename)):
+        pytest.skip(f"{filename} isn't vendored in this checkout")
+    lexicon = load_lexicon(name)
+    assert len(lexicon)>0
+    if isinstance(lexicon, dict):
+        assert all(isinstance(word, str) for word in lexicon if word==word) # ...bar Warriner's 'null', which pandas reads as NaN, as it always has
+        assert all(0<=score<=1 for score in lexicon.values()) # ...every score is rescaled to 0-1
+
+# Small stand-ins for the remote lexicon files, in the format each source serves
+remote_files = {'wiebe_adjectives.txt':b"absurd\nadmirable \nawful\n",
+                'rheault_polarity.csv':b"lemma,polarity\ngood,0.5\nbad,-0.75\n"}
+
+class LexiconHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = remote_files[self.path.lstrip('/')]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def lexicon_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LexiconHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_missing_remote_lexicon_is_vendored_once(lexicon_server, tmp_path, monkeypatch):
+    base_url = f"http://127.0.0.1:{lexicon_server.server_address[1]}/"
+    monkeypatch.setattr(resources, 'lexicon_data_path', str(tmp_path))
+    monkeypatch.setattr(resources, 'remote_lexicons', {filename:base_url+filename for filename in remote_files})
+
+    for filename in remote_files:
+        path = resources.lexicon_source_path(filename)
+        assert path==os.path.join(str(tmp_path), filename)
+        assert open(path, 'rb').read()==remote_files[filename]
+        resources.lexicon_source_path(filename) # ...the local copy is used from then on
+    assert sorted(lexicon_server.requests)==['/rheault_polarity.csv','/wiebe_adjectives.txt']
+    assert not any(name.endswith('.tmp') for name in os.listdir(str(tmp_path)))
+
+    assert resources._parse_wiebe(os.path.join(str(tmp_path), 'wiebe_adjectives.txt'))=={'subjective_adjectives':['absurd','admirable','awful']}
+    assert resources._parse_rheault(os.path.join(str(tmp_path), 'rheault_polarity.csv'))=={'valence_rheault':{'good':0.5,'bad':0.75}}
+
+def test_unreachable_lexicon_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(resources, 'lexicon_data_path', str(tmp_path))
+    monkeypatch.setattr(resources, 'remote_lexicons', {'wiebe_adjectives.txt':'http://127.0.0.1:9/wiebe_adjectives.txt'})
+    with pytest.raises(FileNotFoundError):
+        resources.lexicon_source_path('wiebe_adjectives.txt')
+    with pytest.raises(FileNotFoundError):
+        resources.lexicon_source_path('not_a_lexicon.csv')
@@ -0,0 +1,50 @@
+import re as std_re
+import random
+import pytest
+
+from scorers import segmentation
+from scorers.segmentation import split_sentences,iter_sentence_spans
+
+def random_text(rng):
+    # Sentences and abbreviations joined by every kind of whitespace run, with stray full stops at the ends
+    pieces = ['The Bill', 'Mr. Speaker', 'e.g. this', '3.5 per cent', 'Order', 'Hon. Members', 'U.K.', '...', 'yes', '']
+    whitespace = [' ', '  ', '\n', '\n\n', '\t', ' \r\n ', ' ', ' ']
+    return ''.join(rng.choice(pieces)+rng.choice(['.', '', '?', '!'])+rng.choice(whitespace) for _ in range(rng.randint(0,12))).strip(rng.choice(['', ' ']))
+
+def test_period_spans_match_split():
+    # The subjectivity scorer's sentences are re.sub('\s+',' ',text).split('. ') - over the stdlib re's idea of whitespace
+    rng = random.Random(0)
+    for _ in range(5000):
+        text = random_text(rng)
+        assert list(split_sentences(text, 'period'))==std_re.sub(r'\s+',' ',text).split('. '), repr(text)
+
+def test_punkt_spans_match_sent_tokenize():
+    nltk_tokenize = pytest.importorskip('nltk.tokenize')
+    try:
+        tokenizer = segmentation._punkt_tokenizer()
+    except LookupError:
+        pytest.skip("NLTK's punkt data isn't installed")
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = random_text(rng)
+        assert list(split_sentences(text, 'punkt'))==nltk_tokenize.sent_tokenize(text), repr(text)
+
+def test_punkt_spans_slice_tokenizer_sentences(monkeypatch):
+    # Without the punkt data, an untrained tokenizer still checks that slicing the spans gives what tokenize() does
+    punkt = pytest.importorskip('nltk.tokenize.punkt')
+    tokenizer = punkt.PunktSentenceTokenizer()
+    monkeypatch.setattr(segmentation, '_punkt_tokenizer', lambda language='english': tokenizer)
+    rng = random.Random(2)
+    for _ in range(2000):
+        text = random_text(rng)
+        assert list(segmentation._split_sentences(text, 'punkt'))==tokenizer.tokenize(text), repr(text)
+
+def test_long_texts_are_not_cached(monkeypatch):
+    monkeypatch.setattr(segmentation, 'SENTENCE_CACHE_MAX_CHARS', 100)
+    short_text = 'One. Two.'
+    long_text = 'A sentence. '*20
+    assert split_sentences(short_text) is split_sentences(short_text)
+    assert split_sentences(long_text) is not split_sentences(long_text)
+    assert list(split_sentences(long_text))==['A sentence']*20+['']
+    with pytest.raises(ValueError):
+        list(iter_sentence_spans(short_text, 'comma'))
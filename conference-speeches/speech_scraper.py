@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent scraper for the British Political Speech archive - see Scraping British Political Speech.ipynb
+# Raw HTML is cached on disk by speech number, along with which numbers have no speech, so a refresh only re-requests
+# speeches that have changed (with conditional requests) and numbers it hasn't tried before
+
+DEFAULT_ROOT = 'http://www.britishpoliticalspeech.org/speech-archive.htm'
+DEFAULT_CACHE_DIR = 'speech_html'
+INDEX_FILENAME = 'index.json'
+
+# Responses worth trying again - rate limiting and server-side errors
+retry_statuses = {429, 500, 502, 503, 504}
+
+# One keep-alive session (and set of compiled XPaths) per scraping thread
+_thread_local = threading.local()
+
+columns = ["title", "speaker", "location", "tags", "commentary", "content"]
+
+# Shown in place of a speech for any number with no speech behind it
+error_msg = ["We're sorry, but the requested speech could not be found."]
+
+def _xpaths():
+    # Compiled once per thread, on first use - compiled XPath evaluators can't be shared between threads
+    if hasattr(_thread_local, 'xpaths'):
+        return _thread_local.xpaths
+    from lxml import etree
+    _thread_local.xpaths = {'title':etree.XPath('//h3/text()'),
+                            'speaker':etree.XPath('//p[@class="speech-speaker"]/text()'),
+                            'location':etree.XPath('//p[@class="speech-location"]/text()'),
+                            'tags':etree.XPath('//p[@class="speech-tags"]/text()'),
+                            'commentary':etree.XPath('//div[@class="speech-commentary"]/text()'),
+                            'content':etree.XPath('//div[@class="speech-content"]//p/text()')}
+    return _thread_local.xpaths
+
+def parse_speech_html(content):
+    # [title, speaker, location, tags, commentary, content] of a speech page - all None if there's no speech, as scrape_speech_url()
+    from lxml import html
+    xpaths = _xpaths()
+    tree = html.fromstring(content)
+    if xpaths['title'](tree)==error_msg:
+        return [None]*len(columns)
+    return [' '.join(xpaths[column](tree)) for column in columns]
+
+class SpeechCache:
+    # Raw HTML of each speech on disk, with an index of every speech number tried - its status, ETag/Last-Modified and content hash
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self.index = dict()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                self.index = {int(speech_num):entry for speech_num,entry in json.load(file).items()}
+
+    def html_path(self, speech_num):
+        return os.path.join(self.cache_dir, f"speech_{speech_num}.html")
+
+    def get(self, speech_num):
+        return self.index.get(speech_num)
+
+    def read(self, speech_num):
+        with open(self.html_path(speech_num), 'rb') as file:
+            return file.read()
+
+    def write(self, speech_num, entry, content=None):
+        if content is not None:
+            tmp_path = self.html_path(speech_num)+'.tmp'
+            with open(tmp_path, 'wb') as file:
+                file.write(content)
+            os.replace(tmp_path, self.html_path(speech_num))
+        with self.lock:
+            self.index[speech_num] = entry
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.index_path+'.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump({str(speech_num):entry for speech_num,entry in sorted(self.index.items())}, file)
+            os.replace(tmp_path, self.index_path)
+
+def _get_session():
+    if not hasattr(_thread_local, 'session'):
+        import requests
+        _thread_local.session = requests.Session()
+    return _thread_local.session
+
+def speech_url(root, speech_num):
+    import requests
+    req = requests.models.PreparedRequest()
+    req.prepare_url(root, {"speech": str(speech_num)})
+    return req.url
+
+def _get(url, headers, retries, backoff, timeout):
+    # GET with retries - exponential backoff with jitter, honouring Retry-After where the server sends it, as hansard_downloader.py
+    import requests
+    session = _get_session()
+    for attempt in range(retries+1):
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt==retries:
+                raise
+            time.sleep(backoff*2**attempt*(1+random.random()))
+            continue
+        if response.status_code not in retry_statuses or attempt==retries:
+            return response
+        retry_after = response.headers.get('Retry-After')
+        time.sleep(float(retry_after) if retry_after is not None and retry_after.isdigit() else backoff*2**attempt*(1+random.random()))
+
+def fetch_speech(speech_num, cache, root=DEFAULT_ROOT, refresh=False, timeout=60, retries=5, backoff=1.0):
+    # Return (status, speech) for a speech number - status is 'found', 'missing', 'changed', 'not_modified' or 'cached',
+    # and speech is as parse_speech_html(), or None if there's no speech
+    # ...cached speeches and known-missing numbers aren't requested again unless refresh=True
+    # ...connection errors, timeouts and 429/5xx responses are retried, so one transient failure doesn't end a scrape
+    entry = cache.get(speech_num)
+    if entry is not None and not refresh:
+        return 'cached',(parse_speech_html(cache.read(speech_num)) if entry['status']=='found' else None)
+
+    headers = dict()
+    if entry is not None and entry['status']=='found':
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    page = _get(speech_url(root, speech_num), headers, retries, backoff, timeout)
+    if page.status_code==304:
+        return 'not_modified',parse_speech_html(cache.read(speech_num))
+    page.raise_for_status()
+
+    speech = parse_speech_html(page.content)
+    digest = hashlib.sha256(page.content).hexdigest()
+    if speech[0] is None:
+        cache.write(speech_num, {'status':'missing'})
+        return 'missing',None
+    status = 'changed' if entry is not None and entry.get('sha256') not in (None,digest) else 'found'
+    cache.write(speech_num, {'status':'found',
+                             'etag':page.headers.get('ETag'),
+                             'last_modified':page.headers.get('Last-Modified'),
+                             'sha256':digest}, page.content)
+    return status,speech
+
+def scrape_speeches(root=DEFAULT_ROOT, speech_nums=range(1000), cache_dir=DEFAULT_CACHE_DIR, max_workers=8, refresh=False,
+                    stop_after_missing=200, timeout=60, retries=5, backoff=1.0):
+    # Scrape speech numbers in ascending order, a window at a time, returning a DataFrame of the speeches found indexed by number
+    # ...and stopping early once stop_after_missing numbers in a row past the last speech found have no speech
+    import pandas as pd
+    cache = SpeechCache(cache_dir)
+    speech_nums = list(speech_nums)
+    window = max_workers*4
+    speeches,statuses = dict(),dict()
+    missing_run = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(speech_nums), window):
+                window_nums = speech_nums[start:start+window]
+                results = executor.map(lambda speech_num: fetch_speech(speech_num, cache, root, refresh, timeout, retries, backoff),
+                                      window_nums)
+                for speech_num,(status,speech) in zip(window_nums, results):
+                    statuses[status] = statuses.get(status, 0)+1
+                    if speech is None:
+                        missing_run += 1
+                        continue
+                    missing_run = 0
+                    speeches[speech_num] = speech
+                if stop_after_missing is not None and missing_run>=stop_after_missing:
+                    break
+    finally:
+        cache.save()
+
+    speeches_df = pd.DataFrame.from_dict(speeches, orient='index', columns=columns)
+    return speeches_df,statuses
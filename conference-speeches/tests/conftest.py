@@ -0,0 +1,5 @@
+import os
+import sys
+
+# speech_scraper is imported from the conference-speeches folder, as the notebooks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,90 @@
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('lxml')
+from speech_scraper import scrape_speeches
+
+# A stand-in for the speech archive - speeches 0-9 exist, anything higher is the archive's 'not found' page
+N_SPEECHES = 10
+
+def speech_page(speech_num):
+    if speech_num>=N_SPEECHES:
+        return "<html><body><h3>We're sorry, but the requested speech could not be found.</h3></body></html>"
+    return (f"<html><body><h3>Speech {speech_num}</h3><p class='speech-speaker'>Speaker {speech_num}</p>"
+            f"<p class='speech-location'>Place</p><p class='speech-tags'>Tag</p><div class='speech-commentary'>Notes</div>"
+            f"<div class='speech-content'><p>Words of speech {speech_num}.</p></div></body></html>")
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    # Each number's first request fails as configured on the server - 'drop' closes the connection without a response
+    def do_GET(self):
+        speech_num = int(urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)['speech'][0])
+        with self.server.lock:
+            self.server.requests.append(speech_num)
+            failure = self.server.failures.pop(speech_num, None)
+        if failure=='drop':
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if failure is not None:
+            self.send_response(failure)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        etag = f'"speech-{speech_num}"'
+        if self.headers.get('If-None-Match')==etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = speech_page(speech_num).encode()
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def archive():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ArchiveHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = dict()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def archive_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/speech-archive.htm"
+
+def test_scrape_retries_transient_failures(archive, tmp_path):
+    archive.failures.update({2:503, 4:429, 6:'drop'})
+    speeches_df,statuses = scrape_speeches(archive_url(archive), range(20), cache_dir=str(tmp_path), max_workers=4,
+                                           stop_after_missing=None, backoff=0.01)
+    assert sorted(speeches_df.index)==list(range(N_SPEECHES))
+    assert speeches_df.loc[6,'title']=='Speech 6' and speeches_df.loc[6,'content']=='Words of speech 6.'
+    assert statuses=={'found':N_SPEECHES, 'missing':20-N_SPEECHES}
+    assert sorted(archive.requests)==sorted(list(range(20))+[2,4,6])
+
+def test_scrape_gives_up_after_retries(archive, tmp_path):
+    import requests
+    archive.failures.update({1:503})
+    with pytest.raises(requests.HTTPError):
+        scrape_speeches(archive_url(archive), range(3), cache_dir=str(tmp_path), max_workers=1, retries=0)
+
+def test_refresh_uses_cache(archive, tmp_path):
+    scrape_speeches(archive_url(archive), range(12), cache_dir=str(tmp_path), max_workers=4, stop_after_missing=None)
+    archive.requests.clear()
+    # ...cached numbers aren't requested again
+    speeches_df,statuses = scrape_speeches(archive_url(archive), range(12), cache_dir=str(tmp_path), max_workers=4, stop_after_missing=None)
+    assert archive.requests==[] and statuses=={'cached':12} and len(speeches_df)==N_SPEECHES
+    # ...and a refresh re-checks found speeches with conditional requests, and retries missing numbers
+    speeches_df,statuses = scrape_speeches(archive_url(archive), range(12), cache_dir=str(tmp_path), max_workers=4, stop_after_missing=None,
+                                           refresh=True)
+    assert statuses=={'not_modified':N_SPEECHES, 'missing':2} and len(speeches_df)==N_SPEECHES
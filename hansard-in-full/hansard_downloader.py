@@ -0,0 +1,181 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Concurrent, resumable download of the TheyWorkForYou debate XML - see hansard_scraper.ipynb
+# Every fetch is recorded in a JSONL manifest, so an interrupted run picks up where it left off,
+# and a daily run only pulls debates it hasn't seen (or, with refresh=True, re-checks them with conditional requests)
+
+DEFAULT_BASE_URL = 'https://www.theyworkforyou.com/pwdata/scrapedxml/debates/'
+DEFAULT_OUTPUT_DIR = 'debates_xml'
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# Debate files are named by sitting date, with a letter for each version of that day's record
+debate_filename_pattern = re.compile(r'debates\d{4}-\d{2}-\d{2}[a-z]*\.xml')
+
+# Responses worth trying again - rate limiting and server-side errors
+retry_statuses = {429, 500, 502, 503, 504}
+
+class RateLimiter:
+    # Spaces out requests to each host, shared across every download thread
+    def __init__(self, requests_per_second):
+        self.interval = 1/requests_per_second if requests_per_second else 0
+        self.next_request = dict()
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        # Wait for the host's next slot - any back-off is honoured even with no rate limit, which only drops the spacing
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            request_time = max(now, self.next_request.get(host, now))
+            self.next_request[host] = request_time+self.interval
+        time.sleep(max(0, request_time-now))
+
+    def back_off(self, url, delay):
+        # Hold every thread's requests to a host, e.g. after it answers 429 Too Many Requests
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            self.next_request[host] = max(self.next_request.get(host, 0), time.monotonic()+delay)
+
+class Manifest:
+    # Append-only JSONL record of every downloaded debate - the latest line for a file wins
+    def __init__(self, path):
+        self.path = path
+        self.entries = dict()
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # ...a line cut short by an interrupted run
+                    self.entries[entry['filename']] = entry
+
+    def get(self, filename):
+        return self.entries.get(filename)
+
+    def record(self, entry):
+        with self.lock:
+            self.entries[entry['filename']] = entry
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry)+'\n')
+
+    def compact(self):
+        # Rewrite the manifest with one line per file
+        with self.lock:
+            tmp_path = self.path+'.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                for entry in self.entries.values():
+                    file.write(json.dumps(entry)+'\n')
+            os.replace(tmp_path, self.path)
+
+# One keep-alive session per download thread, as requests sessions aren't guaranteed thread-safe
+_thread_local = threading.local()
+
+def _get_session(pool_size):
+    if not hasattr(_thread_local, 'session'):
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _thread_local.session = session
+    return _thread_local.session
+
+def get_list_of_debate_urls(base_url=DEFAULT_BASE_URL, timeout=60):
+    # Every debate XML linked from the archive's index page, in the order listed
+    import requests
+    response = requests.get(base_url, timeout=timeout)
+    response.raise_for_status()
+    filenames = debate_filename_pattern.findall(response.content.decode(errors='replace'))
+    return [urllib.parse.urljoin(base_url, filename) for filename in dict.fromkeys(filenames)]
+
+def _fetch(url, headers, rate_limiter, retries, backoff, timeout, pool_size):
+    # GET with retries - exponential backoff with jitter, honouring Retry-After where the server sends it
+    import requests
+    session = _get_session(pool_size)
+    for attempt in range(retries+1):
+        rate_limiter.wait(url)
+        try:
+            response = session.get(url, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt==retries:
+                raise
+            time.sleep(backoff*2**attempt*(1+random.random()))
+            continue
+        if response.status_code not in retry_statuses or attempt==retries:
+            return response
+        retry_after = response.headers.get('Retry-After')
+        delay = float(retry_after) if retry_after is not None and retry_after.isdigit() else backoff*2**attempt*(1+random.random())
+        rate_limiter.back_off(url, delay)
+
+def save_debate_xml_to_disk(url, output_dir, manifest, rate_limiter, refresh=False, retries=5, backoff=1.0, timeout=60, pool_size=8):
+    # Download one debate, returning 'downloaded', 'not_modified' or 'skipped'
+    filename = url.split('/')[-1]
+    path = os.path.join(output_dir, filename)
+    entry = manifest.get(filename)
+    have_file = entry is not None and os.path.exists(path)
+    if have_file and not refresh:
+        return 'skipped'
+
+    # Only re-download a debate we already hold if the server says it has changed
+    headers = dict()
+    if have_file:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = _fetch(url, headers, rate_limiter, retries, backoff, timeout, pool_size)
+    if response.status_code==304:
+        return 'not_modified'
+    response.raise_for_status()
+
+    # As the original scraper - where we have a decoding error, replace the tricky byte, then store as UTF-8
+    encoded_response = response.content.decode(errors='replace').encode('utf-8')
+    tmp_path = path+'.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded_response)
+    os.replace(tmp_path, path) # ...so an interrupted write never leaves a truncated debate behind
+
+    manifest.record({'filename':filename,
+                     'url':url,
+                     'etag':response.headers.get('ETag'),
+                     'last_modified':response.headers.get('Last-Modified'),
+                     'size':len(encoded_response),
+                     'fetched':time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())})
+    return 'downloaded'
+
+def download_debates(urls=None, output_dir=DEFAULT_OUTPUT_DIR, base_url=DEFAULT_BASE_URL, max_workers=8, requests_per_second=4,
+                     refresh=False, retries=5, backoff=1.0, timeout=60, progress=True):
+    # Download debates (every debate listed at base_url, by default) into output_dir, returning a count of each outcome
+    # ...and a dict of url:error for any that still failed after retrying - re-running picks these up
+    if urls is None:
+        urls = get_list_of_debate_urls(base_url, timeout)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, MANIFEST_FILENAME))
+    rate_limiter = RateLimiter(requests_per_second)
+
+    outcomes = {'downloaded':0, 'not_modified':0, 'skipped':0, 'failed':0}
+    errors = dict()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(save_debate_xml_to_disk, url, output_dir, manifest, rate_limiter, refresh,
+                                   retries, backoff, timeout, max_workers):url for url in urls}
+        completed = as_completed(futures)
+        if progress:
+            from tqdm import tqdm
+            completed = tqdm(completed, total=len(futures))
+        for future in completed:
+            try:
+                outcomes[future.result()] += 1
+            except Exception as error:
+                outcomes['failed'] += 1
+                errors[futures[future]] = repr(error)
+    manifest.compact()
+    return outcomes,errors
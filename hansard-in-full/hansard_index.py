@@ -0,0 +1,488 @@
+import os
+import json
+import shutil
+import bisect
+import re
+from array import array
+import numpy as np
+
+# Full-text inverted index over the parsed Hansard speeches - see merging_speeches_and_mps.ipynb
+# Speeches are tokenised just as the scorers' clean(), and each word maps to a postings list of the speeches it appears in,
+# with its positions in each, so a term or phrase query reads only the postings of the words in it rather than every speech
+# ...postings are delta- and varint-encoded, stored as .npy files and memory-mapped, and decoded with vectorised numpy
+# ...each speech keeps its speech_id, date, person_id and party, so results can be filtered without touching the dataset
+# An index is a folder of immutable segments - adding speeches (e.g. a newly parsed day of debates) writes a new segment,
+# superseding any earlier copies of the same speeches, and compact() merges segments back together
+
+DEFAULT_SEGMENT_SIZE = 200000
+INFO_FILENAME = 'index_info.json'
+INDEX_VERSION = 1
+# Days are stored as days since 1970-01-01, with missing dates as the smallest int32
+MISSING_DAY = np.iinfo(np.int32).min
+
+# As analysis/scorers/cleaning.py - a word is any run of characters that isn't a space, a newline or punctuation, lower-cased
+# on its own (lower-casing the whole text first can change words, e.g. a Greek final sigma before punctuation)
+# ...copied rather than imported, as the two projects aren't installed as packages - tests/test_hansard_index.py checks they agree
+punctuation = '\\,./|<>?;#:@~[]{}`!"£$%^&*()-=_+\''
+word_pattern = re.compile('[^ \n'+re.escape(punctuation)+']+')
+
+def tokenise(text):
+    # The same words as clean(text)
+    return [word.lower() for word in word_pattern.findall(text)] if isinstance(text, str) else []
+
+def encode_varints(values):
+    # LEB128 varints - 7 bits per byte, low bits first, with the top bit set on every byte but the last of each value
+    # ...returns the encoded bytes and the number of bytes each value took
+    values = np.asarray(values, dtype=np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    remaining = values>>np.uint64(7)
+    while remaining.any():
+        n_bytes += remaining>0
+        remaining >>= np.uint64(7)
+    starts = np.cumsum(n_bytes)-n_bytes
+    encoded = np.empty(int(n_bytes.sum()), dtype=np.uint8)
+    for k in range(int(n_bytes.max()) if len(values)>0 else 0):
+        mask = n_bytes>k
+        low_bits = (values[mask]>>np.uint64(7*k))&np.uint64(0x7f)
+        continues = (n_bytes[mask]>k+1).astype(np.uint64)<<np.uint64(7)
+        encoded[starts[mask]+k] = low_bits|continues
+    return encoded,n_bytes
+
+def decode_varints(data):
+    # Every varint in a byte array at once - each value ends at a byte below 128
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data<128)
+    if len(ends)==len(data):
+        return data.astype(np.int64) # ...every value fits in one byte
+    starts = np.r_[0, ends[:-1]+1]
+    shifts = (np.arange(len(data))-np.repeat(starts, ends-starts+1)).astype(np.uint64)*np.uint64(7)
+    return np.add.reduceat((data&0x7f).astype(np.uint64)<<shifts, starts).astype(np.int64)
+
+def _segment_cumsum(values, lengths):
+    # Running totals of values restarting at each run of lengths - undoing the delta encoding of each doc list or position list
+    totals = np.cumsum(values)
+    run_starts = np.cumsum(lengths)-lengths
+    run_starts = run_starts[lengths>0]
+    return totals-np.repeat(totals[run_starts]-values[run_starts], lengths[lengths>0])
+
+def _runs(sorted_values):
+    # Distinct values of a sorted array, and how many times each appears
+    if len(sorted_values)==0:
+        return sorted_values,np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, sorted_values[1:]!=sorted_values[:-1]])
+    return sorted_values[starts],np.diff(np.r_[starts, len(sorted_values)])
+
+def _intersect_sorted(a, b):
+    # Values of a sorted array also in another sorted array, by binary search rather than the sort np.intersect1d does
+    if len(a)==0 or len(b)==0:
+        return a[:0]
+    idx = np.minimum(np.searchsorted(b, a), len(b)-1)
+    return a[b[idx]==a]
+
+def _string_table(strings):
+    # Strings as one UTF-8 byte array and the offsets of each
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8),offsets
+
+def _days(dates):
+    import pandas as pd
+    days = pd.to_datetime(pd.Series(dates), errors='coerce').values.astype('datetime64[D]')
+    return np.where(np.isnat(days), MISSING_DAY, days.astype(np.int64)).astype(np.int32)
+
+def _day(date):
+    import pandas as pd
+    return int(pd.Timestamp(date).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+def _codes(values):
+    # Dictionary-encode a column of values as int32 codes into an array of the distinct values, with missing values coded -1
+    import pandas as pd
+    categories = pd.Categorical([value if isinstance(value, str) else None for value in values])
+    return categories.codes.astype(np.int32),np.asarray(categories.categories, dtype=object).astype('U')
+
+class _StringTable:
+    # Read-only sequence of the strings in a UTF-8 byte array, as bytes - sorted tables can be searched with bisect
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets)-1
+
+    def __getitem__(self, idx):
+        return self.data[self.offsets[idx]:self.offsets[idx+1]].tobytes()
+
+    def find(self, string):
+        # Position of a string in a sorted table, or -1 - UTF-8 bytes sort in the same order as the strings
+        encoded = string.encode('utf-8')
+        idx = bisect.bisect_left(self, encoded)
+        return idx if idx<len(self) and self[idx]==encoded else -1
+
+    def take(self, idx):
+        # The strings at several positions at once - their bytes are gathered in one go, rather than a slice of the table each
+        idx = np.asarray(idx, dtype=np.int64)
+        starts,lengths = self.offsets[idx],self.offsets[idx+1]-self.offsets[idx]
+        ends = np.cumsum(lengths)
+        data = self.data[np.repeat(starts-(ends-lengths), lengths)+np.arange(ends[-1] if len(ends)>0 else 0)].tobytes()
+        return [data[end-length:end].decode('utf-8') for end,length in zip(ends.tolist(), lengths.tolist())]
+
+# Arrays saved for each segment - all memory-mapped when the segment is opened, except the (small) person and party values
+segment_arrays = ['terms','term_offsets','doc_freqs','postings','postings_offsets','positions','positions_offsets',
+                  'speech_ids','speech_id_offsets','days','person_codes','person_values','party_codes','party_values']
+
+def _write_segment(path, terms, term_ids, docs, positions, speech_ids, days, person_codes, person_values, party_codes, party_values,
+                   superseded):
+    # Write one segment from flat (term_id, doc, position) arrays, one entry per token, ordered by doc and then position
+    # ...terms are sorted, and term_ids index into them
+    order = np.argsort(term_ids, kind='stable') # ...stable, so each term's tokens stay ordered by doc and position
+    term_ids,docs,positions = term_ids[order],docs[order],positions[order]
+    n_terms = len(terms)
+
+    # One doc entry per (term, doc) pair - its gap from the term's previous doc, and the term's frequency in it
+    pair_starts = np.flatnonzero(np.r_[True, (term_ids[1:]!=term_ids[:-1])|(docs[1:]!=docs[:-1])]) if len(docs)>0 else np.zeros(0, dtype=np.int64)
+    pair_terms,pair_docs = term_ids[pair_starts],docs[pair_starts]
+    term_freqs = np.diff(np.r_[pair_starts, len(docs)])
+    doc_freqs = np.bincount(pair_terms, minlength=n_terms).astype(np.int64)
+    term_pair_starts = np.cumsum(doc_freqs)-doc_freqs
+    doc_gaps = np.diff(np.r_[0, pair_docs]).astype(np.int64)
+    doc_gaps[term_pair_starts[doc_freqs>0]] = pair_docs[term_pair_starts[doc_freqs>0]]
+    # ...each term's postings are its doc gaps followed by its term frequencies, so both decode in one call
+    values = np.empty(2*len(pair_docs), dtype=np.int64)
+    gap_idx = np.arange(len(pair_docs))+term_pair_starts[pair_terms]
+    values[gap_idx] = doc_gaps
+    values[gap_idx+doc_freqs[pair_terms]] = term_freqs
+    postings,value_bytes = encode_varints(values)
+    postings_offsets = np.r_[0, np.cumsum(value_bytes)][2*np.r_[0, np.cumsum(doc_freqs)]]
+
+    # Positions of each term in each doc, as gaps from the previous position in the same doc
+    position_gaps = np.diff(np.r_[0, positions]).astype(np.int64)
+    position_gaps[pair_starts] = positions[pair_starts]
+    positions_encoded,position_bytes = encode_varints(position_gaps)
+    positions_offsets = np.r_[0, np.cumsum(position_bytes)][np.r_[0, np.cumsum(np.bincount(term_ids, minlength=n_terms))]]
+
+    terms,term_offsets = _string_table(terms)
+    speech_ids,speech_id_offsets = _string_table(speech_ids)
+    arrays = {'terms':terms, 'term_offsets':term_offsets, 'doc_freqs':doc_freqs,
+              'postings':postings, 'postings_offsets':postings_offsets.astype(np.int64),
+              'positions':positions_encoded, 'positions_offsets':positions_offsets.astype(np.int64),
+              'speech_ids':speech_ids, 'speech_id_offsets':speech_id_offsets, 'days':days,
+              'person_codes':person_codes, 'person_values':person_values, 'party_codes':party_codes, 'party_values':party_values}
+    # Written to a temporary folder and moved into place, so a segment is either complete or absent
+    tmp_path = path+'.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    for name in segment_arrays:
+        np.save(os.path.join(tmp_path, name+'.npy'), arrays[name], allow_pickle=False)
+    # ...and the docs of earlier segments this one replaces, by segment name
+    np.savez(os.path.join(tmp_path, 'superseded.npz'), **superseded)
+    os.replace(tmp_path, path)
+
+class _Segment:
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        arrays = {name:np.load(os.path.join(path, name+'.npy'), mmap_mode=None if name.endswith('_values') else 'r', allow_pickle=False)
+                  for name in segment_arrays}
+        self.terms = _StringTable(arrays['terms'], arrays['term_offsets'])
+        self.doc_freqs = arrays['doc_freqs']
+        self.postings,self.postings_offsets = arrays['postings'],arrays['postings_offsets']
+        self.positions,self.positions_offsets = arrays['positions'],arrays['positions_offsets']
+        self.speech_ids = _StringTable(arrays['speech_ids'], arrays['speech_id_offsets'])
+        self.days = arrays['days']
+        self.person_codes,self.person_values = arrays['person_codes'],arrays['person_values']
+        self.party_codes,self.party_values = arrays['party_codes'],arrays['party_values']
+        with np.load(os.path.join(path, 'superseded.npz'), allow_pickle=False) as superseded:
+            self.superseded = {name:superseded[name] for name in superseded.files}
+        self.deleted = np.zeros(len(self.days), dtype=bool)
+
+    def __len__(self):
+        return len(self.days)
+
+    def term_id(self, term):
+        return self.terms.find(term)
+
+    def docs(self, term_id):
+        # The docs holding a term, and its frequency in each
+        values = decode_varints(self.postings[self.postings_offsets[term_id]:self.postings_offsets[term_id+1]])
+        doc_freq = len(values)//2
+        return np.cumsum(values[:doc_freq]),values[doc_freq:]
+
+    def positions_of(self, term_id, term_freqs):
+        # Every position of a term, in the order of its docs
+        position_gaps = decode_varints(self.positions[self.positions_offsets[term_id]:self.positions_offsets[term_id+1]])
+        return _segment_cumsum(position_gaps, term_freqs)
+
+    def tokens(self):
+        # The whole segment back as flat (term_id, doc, position) arrays, one entry per token - for compaction
+        doc_freqs = np.asarray(self.doc_freqs)
+        values = decode_varints(self.postings)
+        term_pair_starts = np.cumsum(doc_freqs)-doc_freqs
+        pair_terms = np.repeat(np.arange(len(doc_freqs)), doc_freqs)
+        gap_idx = np.arange(len(pair_terms))+term_pair_starts[pair_terms]
+        docs = _segment_cumsum(values[gap_idx], doc_freqs)
+        term_freqs = values[gap_idx+doc_freqs[pair_terms]]
+        positions = _segment_cumsum(decode_varints(self.positions), term_freqs)
+        return np.repeat(pair_terms, term_freqs),np.repeat(docs, term_freqs),positions
+
+    def filter_mask(self, docs, start_day, end_day, person_ids, parties):
+        # Which of the given docs are live and pass every filter
+        mask = ~self.deleted[docs]
+        if start_day is not None or end_day is not None:
+            days = self.days[docs]
+            found = days!=MISSING_DAY
+            mask &= found&(days>=start_day if start_day is not None else found)&(days<=end_day if end_day is not None else found)
+        if person_ids is not None:
+            mask &= np.isin(self.person_codes[docs], np.flatnonzero(np.isin(self.person_values, list(person_ids))))
+        if parties is not None:
+            mask &= np.isin(self.party_codes[docs], np.flatnonzero(np.isin(self.party_values, list(parties))))
+        return mask
+
+    def records(self, docs, matches):
+        # Results as a dict of columns - missing persons and parties (coded -1) look up the None appended to each
+        return {'speech_id':self.speech_ids.take(docs),
+                'speech_date':np.where(self.days[docs]==MISSING_DAY, np.datetime64('NaT'), self.days[docs].astype('datetime64[D]')),
+                'person_id':np.append(self.person_values.astype(object), None)[self.person_codes[docs]],
+                'party':np.append(self.party_values.astype(object), None)[self.party_codes[docs]],
+                'matches':matches}
+
+class HansardIndex:
+    def __init__(self, path):
+        # Open the index in a folder, starting an empty one if there's none there yet
+        self.path = path
+        if not os.path.exists(os.path.join(path, INFO_FILENAME)):
+            os.makedirs(path, exist_ok=True)
+            self._write_info({'version':INDEX_VERSION, 'segments':[], 'next_segment':0})
+        self.reload()
+
+    def _write_info(self, info):
+        tmp_path = os.path.join(self.path, INFO_FILENAME+'.tmp')
+        with open(tmp_path, 'w') as file:
+            json.dump(info, file)
+        os.replace(tmp_path, os.path.join(self.path, INFO_FILENAME))
+        self.info = info
+
+    def reload(self):
+        # (Re)open every segment listed in the index info, marking speeches superseded by a later segment as deleted
+        with open(os.path.join(self.path, INFO_FILENAME)) as file:
+            self.info = json.load(file)
+        self.segments = [_Segment(os.path.join(self.path, name)) for name in self.info['segments']]
+        segments_by_name = {segment.name:segment for segment in self.segments}
+        for segment in self.segments:
+            for name,docs in segment.superseded.items():
+                if name in segments_by_name:
+                    segments_by_name[name].deleted[docs] = True
+
+    def __len__(self):
+        # Number of live speeches
+        return int(sum(len(segment)-segment.deleted.sum() for segment in self.segments))
+
+    def _new_segment_name(self):
+        name = f"segment-{self.info['next_segment']:06d}"
+        self.info['next_segment'] += 1
+        return name
+
+    def _superseded(self, speech_ids, days):
+        # Live docs of existing segments with the same speech_id as a new speech - only docs on the same days can match,
+        # since speech IDs include the date
+        new_ids = set(speech_ids)
+        new_days = np.unique(days)
+        superseded = dict()
+        for segment in self.segments:
+            candidates = np.flatnonzero(np.isin(segment.days, new_days)&~segment.deleted)
+            docs = [doc for doc,speech_id in zip(candidates, segment.speech_ids.take(candidates)) if speech_id in new_ids]
+            if len(docs)>0:
+                superseded[segment.name] = np.array(docs, dtype=np.int64)
+        return superseded
+
+    def add(self, df, text_column='text', speech_id_column='speech_id', date_column='speech_date', person_column='person_id',
+            party_column='speech_party'):
+        # Index a DataFrame of speeches as a new segment - any speech already in the index (by speech_id) is replaced
+        # ...a missing party column (e.g. a freshly parsed day, before merging with MP details) leaves parties as None
+        df = df[df[speech_id_column].notna()].drop_duplicates(speech_id_column, keep='last')
+        if len(df)==0:
+            return 0
+        vocabulary,term_ids,doc_lengths = dict(),array('i'),np.zeros(len(df), dtype=np.int64)
+        for doc,text in enumerate(df[text_column]):
+            tokens = tokenise(text)
+            term_ids.extend([vocabulary.setdefault(token, len(vocabulary)) for token in tokens])
+            doc_lengths[doc] = len(tokens)
+        # Terms are stored sorted, so each term's ID is its rank
+        terms = sorted(vocabulary)
+        ranks = np.empty(len(terms), dtype=np.int32)
+        ranks[[vocabulary[term] for term in terms]] = np.arange(len(terms), dtype=np.int32)
+        term_ids = ranks[np.frombuffer(term_ids, dtype=np.int32)] if len(term_ids)>0 else np.zeros(0, dtype=np.int32)
+        docs = np.repeat(np.arange(len(df), dtype=np.int32), doc_lengths)
+        positions = (np.arange(len(docs))-np.repeat(np.cumsum(doc_lengths)-doc_lengths, doc_lengths)).astype(np.int32)
+
+        speech_ids = [str(speech_id) for speech_id in df[speech_id_column]]
+        days = _days(df[date_column]) if date_column in df.columns else np.full(len(df), MISSING_DAY, dtype=np.int32)
+        person_codes,person_values = _codes(df[person_column] if person_column in df.columns else [None]*len(df))
+        party_codes,party_values = _codes(df[party_column] if party_column in df.columns else [None]*len(df))
+
+        name = self._new_segment_name()
+        _write_segment(os.path.join(self.path, name), terms, term_ids, docs, positions, speech_ids, days,
+                       person_codes, person_values, party_codes, party_values, self._superseded(speech_ids, days))
+        self._write_info(dict(self.info, segments=self.info['segments']+[name]))
+        self.reload()
+        return len(df)
+
+    def compact(self, max_docs=None):
+        # Merge segments into one, dropping superseded speeches - every segment, or only those with fewer than max_docs speeches
+        # (e.g. the small segments left by daily updates)
+        # ...the merged segments' postings are held in memory while they're rewritten
+        segments = [segment for segment in self.segments if max_docs is None or len(segment)<max_docs]
+        if len(segments)<2 and not any(segment.deleted.any() for segment in segments):
+            return
+        terms = sorted(set().union(*[segment.terms.take(range(len(segment.terms))) for segment in segments]))
+        term_lookup = {term:term_id for term_id,term in enumerate(terms)}
+        person_values = np.array(sorted(set().union(*[segment.person_values.tolist() for segment in segments])), dtype='U')
+        party_values = np.array(sorted(set().union(*[segment.party_values.tolist() for segment in segments])), dtype='U')
+
+        all_term_ids,all_docs,all_positions = [],[],[]
+        speech_ids,days,person_codes,party_codes = [],[],[],[]
+        n_docs = 0
+        for segment in segments:
+            live = ~segment.deleted
+            doc_map = np.cumsum(live)-1+n_docs
+            term_ids,docs,positions = segment.tokens()
+            keep = live[docs]
+            term_map = np.array([term_lookup[term] for term in segment.terms.take(range(len(segment.terms)))], dtype=np.int32)
+            all_term_ids.append(term_map[term_ids[keep]])
+            all_docs.append(doc_map[docs[keep]])
+            all_positions.append(positions[keep])
+            live_docs = np.flatnonzero(live)
+            speech_ids += segment.speech_ids.take(live_docs)
+            days.append(np.asarray(segment.days)[live_docs])
+            # ...codes are mapped into the merged values, with -1 (missing) mapped to itself by the appended -1
+            person_codes.append(np.append(np.searchsorted(person_values, segment.person_values), -1).astype(np.int32)[segment.person_codes[live_docs]])
+            party_codes.append(np.append(np.searchsorted(party_values, segment.party_values), -1).astype(np.int32)[segment.party_codes[live_docs]])
+            n_docs += len(live_docs)
+
+        # Terms only found in superseded speeches are dropped
+        term_ids = np.concatenate(all_term_ids)
+        used_terms,term_ids = np.unique(term_ids, return_inverse=True)
+        # ...speeches the merged segments superseded in segments left as they are stay superseded
+        merged_names = {segment.name for segment in segments}
+        superseded = dict()
+        for segment in segments:
+            for superseded_name,docs in segment.superseded.items():
+                if superseded_name not in merged_names:
+                    superseded[superseded_name] = np.union1d(superseded.get(superseded_name, docs[:0]), docs)
+        name = self._new_segment_name()
+        _write_segment(os.path.join(self.path, name), [terms[term_id] for term_id in used_terms], term_ids.astype(np.int32),
+                       np.concatenate(all_docs).astype(np.int32), np.concatenate(all_positions).astype(np.int32),
+                       speech_ids, np.concatenate(days), np.concatenate(person_codes), person_values,
+                       np.concatenate(party_codes), party_values, superseded)
+        self._write_info(dict(self.info, segments=[segment.name for segment in self.segments if segment.name not in merged_names]+[name]))
+        for merged_name in merged_names:
+            shutil.rmtree(os.path.join(self.path, merged_name))
+        self.reload()
+
+    def _segment_matches(self, segment, tokens, mode):
+        # Docs of one segment matching the query, and the number of matches in each
+        term_ids = [segment.term_id(token) for token in tokens]
+        if mode=='any':
+            found = [segment.docs(term_id) for term_id in term_ids if term_id!=-1]
+            if len(found)==0:
+                return np.zeros(0, dtype=np.int64),np.zeros(0, dtype=np.int64)
+            docs,inverse = np.unique(np.concatenate([docs for docs,term_freqs in found]), return_inverse=True)
+            return docs,np.bincount(inverse, weights=np.concatenate([term_freqs for docs,term_freqs in found])).astype(np.int64)
+        if -1 in term_ids:
+            return np.zeros(0, dtype=np.int64),np.zeros(0, dtype=np.int64)
+        postings = [segment.docs(term_id) for term_id in term_ids]
+        # Rarest terms first, so the candidate docs shrink as fast as possible
+        order = np.argsort([len(docs) for docs,term_freqs in postings], kind='stable')
+        docs = postings[order[0]][0]
+        for idx in order[1:]:
+            docs = _intersect_sorted(docs, postings[idx][0])
+        if mode=='all' or len(tokens)==1:
+            return docs,np.sum([term_freqs[np.searchsorted(term_docs, docs)] for term_docs,term_freqs in postings], axis=0)
+        # Phrases - each word's positions, shifted back by its place in the phrase, must line up at the same (doc, position)
+        # ...only decoded for terms whose docs still overlap
+        phrase_keys = None
+        for offset,(term_id,(term_docs,term_freqs)) in enumerate(zip(term_ids, postings)):
+            if len(docs)==0:
+                break
+            positions = segment.positions_of(term_id, term_freqs)
+            position_docs = np.repeat(term_docs, term_freqs)
+            keep = np.isin(position_docs, docs)
+            keys = (position_docs[keep]<<32)+(positions[keep]-offset) # ...a position before the phrase start is harmless
+            phrase_keys = keys if phrase_keys is None else _intersect_sorted(phrase_keys, keys)
+            docs = _runs(phrase_keys>>32)[0] # ...keys are sorted, starting from the first word's
+        if phrase_keys is None:
+            return np.zeros(0, dtype=np.int64),np.zeros(0, dtype=np.int64)
+        return _runs(phrase_keys>>32)
+
+    def search(self, query, mode='phrase', start=None, end=None, person_ids=None, parties=None):
+        # Speeches matching a query, tokenised as the speeches were - with the number of matches in each, by date
+        # ...mode='phrase' matches the words in order, 'all' every word anywhere in a speech, and 'any' at least one of them
+        # ...start and end bound the speech date (inclusive), and person_ids and parties are lists of values to keep, e.g.
+        #    index.search('austerity', start='2010-01-01', end='2015-12-31', parties=['Labour'])
+        import pandas as pd
+        if mode not in ('phrase','all','any'):
+            raise ValueError(f"Unknown query mode {mode!r}")
+        tokens = tokenise(query)
+        start_day = _day(start) if start is not None else None
+        end_day = _day(end) if end is not None else None
+        columns = {'speech_id':[], 'speech_date':[], 'person_id':[], 'party':[], 'matches':[]}
+        for segment in self.segments if len(tokens)>0 else []:
+            docs,matches = self._segment_matches(segment, tokens, mode)
+            mask = segment.filter_mask(docs, start_day, end_day, person_ids, parties)
+            for column,values in segment.records(docs[mask], matches[mask]).items():
+                columns[column].append(np.asarray(values, dtype=object if column!='speech_date' else 'datetime64[D]'))
+        results = pd.DataFrame({column:np.concatenate(values) if len(values)>0 else [] for column,values in columns.items()})
+        results['speech_date'] = pd.to_datetime(results.speech_date)
+        results['matches'] = results.matches.astype(np.int64)
+        return results.sort_values(['speech_date','speech_id']).reset_index(drop=True)
+
+    def count(self, query, mode='phrase', **filters):
+        return len(self.search(query, mode, **filters))
+
+    def stats(self):
+        # Size of each segment, on disk and in speeches and terms
+        import pandas as pd
+        return pd.DataFrame([{'segment':segment.name, 'speeches':len(segment), 'live_speeches':int(len(segment)-segment.deleted.sum()),
+                              'terms':len(segment.terms),
+                              'mb':sum(os.path.getsize(os.path.join(self.path, segment.name, filename))
+                                       for filename in os.listdir(os.path.join(self.path, segment.name)))/2**20}
+                             for segment in self.segments])
+
+def _iter_dataset_chunks(root, chunksize):
+    # Read a dataset folder chunksize rows at a time - its batches follow its files and row groups, so are gathered up to size
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from hansard_storage import INFO_FILENAME as DATASET_INFO_FILENAME
+    dataset = ds.dataset(root, format='parquet', partitioning='hive', ignore_prefixes=['.','_',DATASET_INFO_FILENAME])
+    batches,n_rows = [],0
+    for batch in dataset.to_batches():
+        batches.append(batch)
+        n_rows += batch.num_rows
+        if n_rows>=chunksize:
+            yield pa.Table.from_batches(batches, schema=dataset.schema).to_pandas()
+            batches,n_rows = [],0
+    if n_rows>0:
+        yield pa.Table.from_batches(batches, schema=dataset.schema).to_pandas()
+
+def index_speeches(source, index_path, segment_size=DEFAULT_SEGMENT_SIZE, intervals_path=None, progress=True, **columns):
+    # Add speeches to an index a segment at a time - from a dataset folder (see hansard_storage.py), or a CSV, csv.gz or Parquet file
+    # ...if the speeches have no party column, e.g. a day just parsed by hansard_xml_parser.py, it can be resolved from each speaker's
+    #    memberships on the day, with the interval index saved by mps_data.ipynb
+    from hansard_storage import _iter_chunks
+    index = HansardIndex(index_path)
+    party_column = columns.get('party_column', 'speech_party')
+    chunks = (_iter_dataset_chunks(source, segment_size) if os.path.isdir(source)
+              else _iter_chunks(source, segment_size, columns.get('date_column', 'speech_date')))
+    if progress:
+        from tqdm import tqdm
+        chunks = tqdm(chunks, desc=f"Indexing {source}")
+    intervals = None
+    if intervals_path is not None:
+        from membership_intervals import MembershipIntervals
+        intervals = MembershipIntervals.load(intervals_path)
+    for chunk in chunks:
+        if intervals is not None and party_column not in chunk.columns:
+            chunk[party_column] = intervals.resolve(chunk[columns.get('person_column', 'person_id')],
+                                                    chunk[columns.get('date_column', 'speech_date')], 'party')
+        index.add(chunk, **columns)
+    return index
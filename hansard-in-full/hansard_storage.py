@@ -0,0 +1,157 @@
+import os
+import json
+import shutil
+
+# Partitioned Parquet storage for the Hansard datasets - see hansard_parser.ipynb, merging_speeches_and_mps.ipynb and compressor.ipynb
+# Each dataset is a folder of Parquet files, partitioned by year (and optionally party), with typed columns:
+# dates as timestamps, person IDs and parties as dictionary-encoded categoricals, and speech text as large strings
+# Loading reads only the columns asked for, and skips any partitions (and row groups) the filters rule out
+
+DEFAULT_CHUNKSIZE = 500000
+INFO_FILENAME = 'dataset_info.json'
+# A century of years, by a dozen or so parties each year, is more than pyarrow's default limit
+MAX_PARTITIONS = 10000
+
+# Columns stored as categoricals - a small number of distinct values, repeated across many rows
+categorical_columns = ['person_id','questioner_id','answerer_id',
+                       'speech_party','questioner_party','answerer_party',
+                       'speech_constituency','questioner_constituency','answerer_constituency']
+# Columns holding the text of a speech, which can run to gigabytes across the whole archive
+text_columns = ['text','question_text','answer_text']
+
+def _as_strings(series):
+    # Object columns are written as strings - anything else in them (e.g. the constituency and party dicts) as it was written to CSV
+    import pandas as pd
+    return series.map(lambda x: x if isinstance(x,str) else (None if pd.api.types.is_scalar(x) and pd.isna(x) else str(x)))
+
+def _to_table(df, date_column):
+    # Convert a DataFrame to an Arrow table with the dataset's column types, adding the year to partition by
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    names,arrays = [],[]
+    for column in df.columns:
+        series = df[column]
+        if column==date_column:
+            dates = pd.to_datetime(series, errors='coerce').values.astype('datetime64[ms]')
+            array = pa.array(dates, from_pandas=True)
+        elif column in categorical_columns:
+            array = pa.array(_as_strings(series), type=pa.string(), from_pandas=True).dictionary_encode()
+        elif column in text_columns:
+            array = pa.array(_as_strings(series), type=pa.large_string(), from_pandas=True)
+        elif series.dtype==object or pd.api.types.is_string_dtype(series.dtype):
+            array = pa.array(_as_strings(series), type=pa.string(), from_pandas=True)
+        else:
+            array = pa.array(series, from_pandas=True)
+        names.append(column)
+        arrays.append(array)
+    names.append('year')
+    arrays.append(pc.year(arrays[names.index(date_column)]).cast(pa.int16()))
+    return pa.Table.from_arrays(arrays, names=names)
+
+def _write_table(table, root, partition_by, basename, existing_data_behavior):
+    import pyarrow.dataset as ds
+    ds.write_dataset(table, root, format='parquet',
+                     partitioning=partition_by, partitioning_flavor='hive',
+                     basename_template=basename+'-{i}.parquet',
+                     existing_data_behavior=existing_data_behavior,
+                     max_partitions=MAX_PARTITIONS,
+                     file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'))
+
+def _prepare_root(root, date_column, party_column):
+    # Start from an empty folder, recording which columns the dataset is partitioned by
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+    partition_by = ['year'] if party_column is None else ['year',party_column]
+    with open(os.path.join(root, INFO_FILENAME), 'w') as file:
+        json.dump({'date_column':date_column, 'party_column':party_column, 'partition_by':partition_by}, file)
+    return partition_by
+
+def write_dataset(df, root, date_column='speech_date', party_column=None):
+    # Write a DataFrame to a dataset folder, replacing any dataset already there
+    # ...partitioned by the year of date_column, and also by party_column if given
+    partition_by = _prepare_root(root, date_column, party_column)
+    _write_table(_to_table(df.drop(columns=['Unnamed: 0'], errors='ignore'), date_column), root, partition_by, 'part-0', 'overwrite_or_ignore')
+
+def _numeric_dtypes(chunk, skip_columns):
+    # The numeric type of each column (not in skip_columns) whose values in this chunk all read as numbers
+    import pandas as pd
+    dtypes = dict()
+    for column in chunk.columns:
+        values = chunk[column].dropna()
+        if column in skip_columns or len(values)==0:
+            continue
+        try:
+            numbers = pd.to_numeric(values)
+        except (ValueError, TypeError):
+            continue
+        dtypes[column] = 'Int64' if pd.api.types.is_integer_dtype(numbers) else 'float64'
+    return dtypes
+
+def _iter_chunks(path, chunksize, date_column):
+    # Read a CSV (optionally gzipped) or Parquet file a chunk of rows at a time
+    import pandas as pd
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+    # Everything is read as text, then any numeric columns are typed as the first chunk reads them - so no chunk's types
+    # depend on what happens to be in it, and every file in the dataset shares one schema
+    numeric_dtypes = None
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+        chunk = chunk.drop(columns=['Unnamed: 0'], errors='ignore')
+        if numeric_dtypes is None:
+            numeric_dtypes = _numeric_dtypes(chunk, set([date_column]+categorical_columns+text_columns))
+        for column,dtype in numeric_dtypes.items():
+            chunk[column] = pd.to_numeric(chunk[column]).astype(dtype)
+        yield chunk
+
+def convert_to_dataset(path, root, date_column='speech_date', party_column=None, chunksize=DEFAULT_CHUNKSIZE, progress=True):
+    # Convert a CSV, csv.gz or Parquet file into a dataset folder, streaming it a chunk at a time rather than reading it all into memory
+    partition_by = _prepare_root(root, date_column, party_column)
+    chunks = _iter_chunks(path, chunksize, date_column)
+    if progress:
+        from tqdm import tqdm
+        chunks = tqdm(chunks, desc=f"Converting {path}")
+    n_rows = 0
+    for idx,chunk in enumerate(chunks):
+        _write_table(_to_table(chunk, date_column), root, partition_by, f"part-{idx}", 'overwrite_or_ignore')
+        n_rows += len(chunk)
+    return n_rows
+
+def dataset_info(root):
+    with open(os.path.join(root, INFO_FILENAME)) as file:
+        return json.load(file)
+
+def _partitioning(info):
+    # The partition columns' types are given rather than inferred from the folder names - inferring them as dictionaries
+    # fails on a null partition (e.g. speeches with no party), which pyarrow can't unify with the other partitions
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    fields = [pa.field(column, pa.int16() if column=='year' else pa.string()) for column in info['partition_by']]
+    return ds.partitioning(pa.schema(fields), flavor='hive')
+
+def load_dataset(root, columns=None, filters=None, years=None, parties=None):
+    # Load a dataset folder to a DataFrame, reading only the given columns and the rows matching every filter
+    # ...filters are (column, op, value) tuples, as pandas.read_parquet, and years=(first, last) and parties=[...] are shorthands for
+    # filters on the partition columns - e.g. PMQs answers 1997-2010, text only:
+    # load_dataset('hansard_pmqs', columns=['answer_text'], years=(1997,2010))
+    import pyarrow.parquet as pq
+    info = dataset_info(root)
+    filters = list(filters) if filters is not None else []
+    if years is not None:
+        first_year,last_year = years
+        filters += [('year','>=',first_year),('year','<=',last_year)]
+    if parties is not None:
+        if info['party_column'] is None:
+            raise ValueError(f"Dataset {root} isn't partitioned by party")
+        filters.append((info['party_column'],'in',list(parties)))
+    table = pq.read_table(root, columns=columns, filters=filters if len(filters)>0 else None, partitioning=_partitioning(info),
+                          ignore_prefixes=['.','_',INFO_FILENAME])
+    # ...the party is still loaded as a categorical, as it's stored within each file
+    party_column = info['party_column']
+    if party_column in table.column_names:
+        table = table.set_column(table.column_names.index(party_column), party_column, table[party_column].dictionary_encode())
+    return table.to_pandas()
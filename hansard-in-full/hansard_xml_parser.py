@@ -0,0 +1,110 @@
+import os
+import multiprocessing
+
+# Streaming parser for the debate XML saved by hansard_scraper.ipynb - see hansard_parser.ipynb
+# Each file is iterparsed one <speech> at a time, clearing elements as we go, and speeches are written
+# to disk as columnar record batches, so memory stays flat however much of the archive is parsed
+
+DEFAULT_BATCH_SIZE = 100000
+
+# Columns of the parsed dataset, as produced by the original BeautifulSoup parser (plus the speech date)
+columns = ['name','speech_id','person_id','text','speech_date']
+
+def _speech_date(speech_id):
+    # Speech IDs look like 'uk.org.publicwhip/debate/1919-02-04a.3.1', so the date is the start of the last part
+    return speech_id.split('/')[-1][:10] if speech_id is not None else None
+
+def iter_speeches(path, memberid2personid_lookup, filter_no_speaker=True):
+    # Yield (name, speech_id, person_id, text, speech_date) for each speech in a debate file
+    from lxml import etree
+    # recover=True tolerates the odd malformed file, much as BeautifulSoup did
+    context = etree.iterparse(path, events=('end',), tag='speech', recover=True, huge_tree=True)
+    for _,speech_xml in context:
+        name = speech_xml.get('speakername')
+        if name is not None or not filter_no_speaker: # If we're filtering 'no speaker' lines, then drop speeches with no name
+            speech_id = speech_xml.get('id')
+            person_id = speech_xml.get('person_id')
+            if person_id is None:
+                person_id = memberid2personid_lookup.get(speech_xml.get('speakerid'))
+            text = speech_xml.find('.//p') # As the original parser, only the first paragraph is kept
+            if text is not None:
+                text = ''.join(text.itertext())
+            yield name,speech_id,person_id,text,_speech_date(speech_id)
+
+        # Free this speech, and everything before it, before moving on
+        speech_xml.clear()
+        while speech_xml.getprevious() is not None:
+            del speech_xml.getparent()[0]
+    del context
+
+def parse_hansard_file(path, memberid2personid_lookup, filter_no_speaker=True):
+    # Parse one debate file into a dict of column lists
+    debate_dict = {column:[] for column in columns}
+    for speech in iter_speeches(path, memberid2personid_lookup, filter_no_speaker):
+        for column,value in zip(columns, speech):
+            debate_dict[column].append(value)
+    return debate_dict
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([('name',pa.string()),
+                      ('speech_id',pa.string()),
+                      ('person_id',pa.string()),
+                      ('text',pa.string()),
+                      ('speech_date',pa.date32())])
+
+def _record_batch(debate_dict, schema):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    arrays = [pa.array(debate_dict[column], type=pa.string()) for column in columns[:-1]]
+    arrays.append(pc.strptime(pa.array(debate_dict['speech_date'], type=pa.string()), format='%Y-%m-%d', unit='s', error_is_null=True).cast(pa.date32()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+# Workers receive the lookup once, when they start, rather than with every file
+_worker_lookup = None
+_worker_filter_no_speaker = True
+
+def _init_worker(memberid2personid_lookup, filter_no_speaker):
+    global _worker_lookup,_worker_filter_no_speaker
+    _worker_lookup = memberid2personid_lookup
+    _worker_filter_no_speaker = filter_no_speaker
+
+def _parse_file_task(path):
+    return parse_hansard_file(path, _worker_lookup, _worker_filter_no_speaker)
+
+def _iter_parsed_files(paths, memberid2personid_lookup, filter_no_speaker, processes):
+    if processes==1:
+        for path in paths:
+            yield parse_hansard_file(path, memberid2personid_lookup, filter_no_speaker)
+        return
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(memberid2personid_lookup,filter_no_speaker)) as pool:
+        yield from pool.imap(_parse_file_task, paths, chunksize=8)
+
+def parse_hansard_archive(paths, output_path, memberid2personid_lookup, filter_no_speaker=True, batch_size=DEFAULT_BATCH_SIZE,
+                          processes=None, progress=True):
+    # Parse debate files (in order) into a single Parquet file at output_path, writing a record batch every batch_size speeches
+    # ...files are parsed in parallel (processes=1 parses in this process), and results are written in input order
+    import pyarrow.parquet as pq
+    schema = _schema()
+    paths = list(paths)
+    parsed_files = _iter_parsed_files(paths, memberid2personid_lookup, filter_no_speaker, processes)
+    if progress:
+        from tqdm import tqdm
+        parsed_files = tqdm(parsed_files, total=len(paths))
+
+    n_speeches = 0
+    buffer = {column:[] for column in columns}
+    tmp_path = output_path+'.tmp'
+    with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+        for debate_dict in parsed_files:
+            for column in columns:
+                buffer[column].extend(debate_dict[column])
+            if len(buffer['speech_id'])>=batch_size:
+                writer.write_batch(_record_batch(buffer, schema))
+                n_speeches += len(buffer['speech_id'])
+                buffer = {column:[] for column in columns}
+        if len(buffer['speech_id'])>0 or n_speeches==0:
+            writer.write_batch(_record_batch(buffer, schema))
+            n_speeches += len(buffer['speech_id'])
+    os.replace(tmp_path, output_path) # ...so an interrupted run never leaves a partial dataset behind
+    return n_speeches
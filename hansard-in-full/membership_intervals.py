@@ -0,0 +1,145 @@
+import ast
+import numpy as np
+
+# Vectorised lookup of each speaker's party and constituency on the date of a speech
+# - see merging_speeches_and_mps.ipynb and ../hansard-pmqs/pmqs_parser.ipynb
+# The (start_date, end_date):value dicts in people.csv are parsed once, flattened into disjoint intervals keyed by
+# (person, day), and stored in sorted arrays, so a whole column of speeches is resolved with one binary search
+
+# Memberships ending on or after this date are taken to be current, and extended up to today
+DEFAULT_THRESHOLD = '2019-01-01'
+# Days are stored as YYYYMMDD integers - keys are person_code*DAY_SPAN+day, so each person's days occupy their own range
+DAY_SPAN = 10**8
+# An extended membership runs to the end of time - every speech is on or before today
+OPEN_END = DAY_SPAN-1
+
+# The people.csv column holding each kind of membership, by the name of the variable it gives
+fields = {'constituency':'constituencies',
+          'party':'parties'}
+
+def parse_periods(periods):
+    # A dict of (start_date, end_date):value, from people.csv (as a string) or mps_data.ipynb (as a dict) - or None if missing
+    if isinstance(periods, str):
+        return ast.literal_eval(periods)
+    if isinstance(periods, dict):
+        return dict(periods)
+    return None
+
+def extend_current_periods(periods, current_day, threshold=DEFAULT_THRESHOLD):
+    # As extend_current_speech_variables() - the latest period, if it ends after threshold, is extended to current_day
+    # ...and, as it's popped and re-inserted, moved to the end of the dict
+    if periods is None or len(periods)==0:
+        return periods
+    periods = dict(periods)
+    latest_date = max([end_date for (start_date,end_date),value in periods.items()])
+    if latest_date>=threshold:
+        old_key = [key for key in periods.keys() if key[1]==latest_date][0]
+        periods[(old_key[0],current_day)] = periods.pop(old_key)
+    return periods
+
+def date_number(date):
+    # 'YYYY-MM-DD' as the integer YYYYMMDD - partial dates are padded with zeros ('1918' -> 19180000),
+    # which orders them just as comparing the date strings did
+    digits = ''.join(character for character in str(date) if character.isdigit())[:8]
+    return int(digits.ljust(8, '0')) if len(digits)>0 else None
+
+def _flatten(periods, extended_key):
+    # Disjoint (start, end, value) intervals for one person - where periods overlap, the first listed wins,
+    # as the first match was taken in get_speech_variables()
+    covered,intervals = [],[]
+    for key,value in periods.items():
+        start,end = date_number(key[0]),(OPEN_END if key==extended_key else date_number(key[1]))
+        if start is None or end is None or start>end:
+            continue
+        pieces = [(start,end)]
+        for covered_start,covered_end in covered:
+            pieces = [piece for piece_start,piece_end in pieces
+                      for piece in [(piece_start,min(piece_end,covered_start-1)),(max(piece_start,covered_end+1),piece_end)]
+                      if piece[0]<=piece[1]]
+        intervals += [(piece_start,piece_end,value) for piece_start,piece_end in pieces]
+        covered.append((start,end))
+    return intervals
+
+class MembershipIntervals:
+    def __init__(self, person_ids, starts, ends, value_codes, values):
+        # person_ids is sorted, and for each field, starts/ends are sorted composite keys with value_codes indexing into values
+        self.person_ids = person_ids
+        self.starts = starts
+        self.ends = ends
+        self.value_codes = value_codes
+        self.values = values
+
+    @classmethod
+    def from_people(cls, people_df, threshold=DEFAULT_THRESHOLD):
+        # Build from a people DataFrame with person_id, constituencies and parties columns, as people.csv
+        person_ids = np.array(sorted(set(people_df.person_id.dropna())), dtype='U')
+        person_codes = {person_id:code for code,person_id in enumerate(person_ids)}
+        starts,ends,value_codes,values = dict(),dict(),dict(),dict()
+        for field,column in fields.items():
+            value_lookup,intervals = dict(),[]
+            for person_id,periods in zip(people_df.person_id, people_df[column]):
+                periods = parse_periods(periods)
+                if person_id not in person_codes or periods is None or len(periods)==0:
+                    continue
+                # Extend just as extend_current_speech_variables() does, but with no end date, so the index never goes stale
+                extended_periods = extend_current_periods(periods, None, threshold)
+                extended_key = next((key for key in extended_periods if key[1] is None), None)
+                key_offset = person_codes[person_id]*DAY_SPAN
+                for start,end,value in _flatten(extended_periods, extended_key):
+                    intervals.append((key_offset+start, key_offset+end, value_lookup.setdefault(value, len(value_lookup))))
+            intervals.sort()
+            starts[field] = np.array([interval[0] for interval in intervals], dtype=np.int64)
+            ends[field] = np.array([interval[1] for interval in intervals], dtype=np.int64)
+            value_codes[field] = np.array([interval[2] for interval in intervals], dtype=np.int32)
+            values[field] = np.array(list(value_lookup.keys()), dtype='U')
+        return cls(person_ids, starts, ends, value_codes, values)
+
+    def save(self, path):
+        # Plain typed arrays, so loading needs neither eval nor pickle
+        arrays = {'person_ids':self.person_ids}
+        for field in fields:
+            arrays[field+'_starts'] = self.starts[field]
+            arrays[field+'_ends'] = self.ends[field]
+            arrays[field+'_value_codes'] = self.value_codes[field]
+            arrays[field+'_values'] = self.values[field]
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays['person_ids'],
+                       {field:arrays[field+'_starts'] for field in fields},
+                       {field:arrays[field+'_ends'] for field in fields},
+                       {field:arrays[field+'_value_codes'] for field in fields},
+                       {field:arrays[field+'_values'] for field in fields})
+
+    def _keys(self, person_ids, dates):
+        # Composite keys for each (person_id, date) pair, or -1 where the person is unknown or the date missing
+        # ...each distinct person and date is converted once, however many speeches share it
+        import pandas as pd
+        # (a -1 is appended to each category lookup, so missing values, coded -1, map to it)
+        person_categories = pd.Categorical(person_ids)
+        category_ids = np.asarray(person_categories.categories, dtype=object).astype('U')
+        category_codes = np.searchsorted(self.person_ids, category_ids)
+        category_found = category_codes<len(self.person_ids)
+        category_found[category_found] = self.person_ids[category_codes[category_found]]==category_ids[category_found]
+        person_codes = np.append(np.where(category_found, category_codes, -1), -1)[person_categories.codes]
+
+        dates = pd.Series(dates)
+        date_categories = pd.Categorical(dates.astype(str).where(dates.notna()))
+        category_days = [date_number(date) for date in date_categories.categories]
+        days = np.array([day if day is not None else -1 for day in category_days]+[-1], dtype=np.int64)[date_categories.codes]
+
+        keys = person_codes.astype(np.int64)*DAY_SPAN+days
+        keys[(person_codes==-1)|(days==-1)] = -1
+        return keys
+
+    def resolve(self, person_ids, dates, field):
+        # The value of field ('party' or 'constituency') for each (person_id, date) pair, or None where there's none
+        keys = self._keys(person_ids, dates)
+        idx = np.searchsorted(self.starts[field], keys, side='right')-1
+        found = (keys!=-1)&(idx>=0)
+        found[found] = keys[found]<=self.ends[field][idx[found]]
+        resolved = np.full(len(keys), None, dtype=object)
+        resolved[found] = self.values[field][self.value_codes[field][idx[found]]].astype(object)
+        return resolved
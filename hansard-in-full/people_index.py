@@ -0,0 +1,170 @@
+import numpy as np
+
+# Index of the ParlParse people.json - see mps_data.ipynb
+# Built in a single pass over the JSON, and saved as plain typed arrays, so the lookups between people, member IDs,
+# posts and parties load instantly rather than being rebuilt (with eval) from people.csv by each notebook
+
+PEOPLE_JSON_URL = 'https://raw.githubusercontent.com/mysociety/parlparse/master/members/people.json'
+
+def _strings(values):
+    # A typed string array - numpy can't infer a width from an empty list
+    return np.array(values, dtype='U') if len(values)>0 else np.zeros(0, dtype='U1')
+
+class PeopleIndex:
+    # person_ids is sorted, and the members of person_ids[i] are member_ids[member_offsets[i]:member_offsets[i+1]], in people.json order
+    # ...for each membership, member_person_codes indexes into person_ids, with post/party and dates ('' where missing)
+    # ...json_positions is each person's position in people.json, which people.csv is ordered (and labelled) by
+    array_names = ['person_ids','json_positions','redirect_ids','first_names','family_names',
+                   'member_offsets','member_ids','member_person_codes',
+                   'member_constituencies','member_parties','member_start_dates','member_end_dates']
+
+    def __init__(self, **arrays):
+        for name in self.array_names:
+            setattr(self, name, arrays[name])
+        self._person_codes = None
+        self._member_order = None
+        self._resolved_person_ids = None
+
+    @classmethod
+    def from_people_json(cls, people_json):
+        # Build from the parsed people.json - persons, memberships, posts and organizations are each read once
+        person_ids,redirect_ids,first_names,family_names = [],[],[],[]
+        for person_json in people_json['persons']:
+            person_ids.append(person_json['id'])
+            # Entries with no names just redirect to another entry
+            redirect_ids.append(person_json.get('redirect', '') if 'other_names' not in person_json else '')
+            # Names are collapsed across all of a person's name entries, as in parse_person_json()
+            name_dict = {k:v for name_dict in person_json.get('other_names', []) for k,v in name_dict.items()}
+            first_names.append(name_dict.get('given_name', ''))
+            family_names.append(name_dict.get('family_name', ''))
+        order = np.argsort(_strings(person_ids), kind='stable')
+        person_ids = _strings(person_ids)[order]
+        person_codes = {person_id:code for code,person_id in enumerate(person_ids)}
+
+        postid2constituency = {entry['id']:entry['area']['name'] for entry in people_json['posts'] if entry.get('role')=='Member of Parliament'}
+        partyid2party = {entry['id']:entry['name'] for entry in people_json['organizations'] if entry.get('classification')=='party'}
+
+        memberships = []
+        for entry in people_json['memberships']:
+            if entry.get('person_id') not in person_codes:
+                continue
+            memberships.append((person_codes[entry['person_id']],
+                                entry['id'],
+                                postid2constituency.get(entry.get('post_id'), ''),
+                                partyid2party.get(entry.get('on_behalf_of_id'), ''),
+                                entry.get('start_date', ''),
+                                entry.get('end_date', '')))
+        memberships.sort(key=lambda membership: membership[0]) # ...a stable sort, so each person's members stay in people.json order
+        member_person_codes = np.array([membership[0] for membership in memberships], dtype=np.int32)
+        member_offsets = np.searchsorted(member_person_codes, np.arange(len(person_ids)+1)).astype(np.int64)
+
+        return cls(person_ids=person_ids,
+                   json_positions=order.astype(np.int64),
+                   redirect_ids=_strings(redirect_ids)[order],
+                   first_names=_strings(first_names)[order],
+                   family_names=_strings(family_names)[order],
+                   member_offsets=member_offsets,
+                   member_ids=_strings([membership[1] for membership in memberships]),
+                   member_person_codes=member_person_codes,
+                   member_constituencies=_strings([membership[2] for membership in memberships]),
+                   member_parties=_strings([membership[3] for membership in memberships]),
+                   member_start_dates=_strings([membership[4] for membership in memberships]),
+                   member_end_dates=_strings([membership[5] for membership in memberships]))
+
+    @classmethod
+    def download(cls, url=PEOPLE_JSON_URL):
+        import requests
+        return cls.from_people_json(requests.get(url).json())
+
+    def save(self, path):
+        np.savez_compressed(path, **{name:getattr(self, name) for name in self.array_names})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(**{name:arrays[name] for name in cls.array_names})
+
+    def person_code(self, person_id):
+        if self._person_codes is None:
+            self._person_codes = {person_id:code for code,person_id in enumerate(self.person_ids.tolist())}
+        return self._person_codes.get(person_id)
+
+    def resolve_redirect(self, person_id):
+        # Follow redirects to the entry holding a person's details - None if the ID is unknown (or the redirects loop)
+        for _ in range(len(self.person_ids)):
+            code = self.person_code(person_id)
+            if code is None:
+                return None
+            redirect_id = self.redirect_ids[code]
+            if redirect_id=='':
+                return person_id
+            person_id = str(redirect_id)
+        return None
+
+    def person_memberships(self, person_id):
+        # Member IDs of a person, in people.json order
+        code = self.person_code(person_id)
+        if code is None:
+            return []
+        return self.member_ids[self.member_offsets[code]:self.member_offsets[code+1]].tolist()
+
+    def resolved_person_ids(self):
+        # person_ids with every redirect followed through to the entry it points at
+        if self._resolved_person_ids is None:
+            self._resolved_person_ids = np.array([self.resolve_redirect(person_id) if redirect_id!='' else person_id
+                                                  for person_id,redirect_id in zip(self.person_ids.tolist(), self.redirect_ids.tolist())],
+                                                 dtype=object)
+        return self._resolved_person_ids
+
+    def memberid2personid(self):
+        # Dict from member ID to person ID, with redirects resolved - as memberid2personid_lookup in the parser notebooks
+        resolved_ids = self.resolved_person_ids()
+        return {member_id:resolved_ids[code] for member_id,code in zip(self.member_ids.tolist(), self.member_person_codes.tolist())
+                if resolved_ids[code] is not None}
+
+    def member_person_ids(self, member_ids):
+        # Vectorised member ID -> person ID lookup, with redirects resolved (None where unknown), by binary search over the sorted member IDs
+        if self._member_order is None:
+            self._member_order = np.argsort(self.member_ids, kind='stable')
+        sorted_ids = self.member_ids[self._member_order]
+        member_ids = np.asarray(member_ids, dtype='U')
+        person_ids = np.full(len(member_ids), None, dtype=object)
+        if len(sorted_ids)==0:
+            return person_ids
+        idx = np.minimum(np.searchsorted(sorted_ids, member_ids), len(sorted_ids)-1)
+        found = sorted_ids[idx]==member_ids
+        person_ids[found] = self.resolved_person_ids()[self.member_person_codes[self._member_order[idx[found]]]]
+        return person_ids
+
+    def member_periods(self, person_id, field):
+        # A person's (start_date, end_date):constituency or party dict, as built in mps_data.ipynb - only memberships with both dates
+        values = {'constituency':self.member_constituencies, 'party':self.member_parties}[field]
+        code = self.person_code(person_id)
+        if code is None:
+            return dict()
+        periods = dict()
+        for idx in range(self.member_offsets[code], self.member_offsets[code+1]):
+            if values[idx]!='' and self.member_start_dates[idx]!='' and self.member_end_dates[idx]!='':
+                periods[(str(self.member_start_dates[idx]),str(self.member_end_dates[idx]))] = str(values[idx])
+        return periods
+
+    def people_frame(self):
+        # people.csv, as mps_data.ipynb built it, in one pass - names, member IDs, and constituency and party periods for each person
+        # ...a redirect entry takes the details of the entry it points to, and each person is kept once, labelled by the people.json
+        #    position of the first entry resolving to them (as redirecting row by row then dropping duplicate person IDs did)
+        import pandas as pd
+        resolved_ids = self.resolved_person_ids()
+        first_positions = dict()
+        for position,code in sorted(zip(self.json_positions.tolist(), range(len(self.person_ids)))):
+            if resolved_ids[code] is not None:
+                first_positions.setdefault(resolved_ids[code], position)
+        rows = sorted((position,person_id) for person_id,position in first_positions.items())
+        person_ids = [person_id for position,person_id in rows]
+        codes = [self.person_code(person_id) for person_id in person_ids]
+        return pd.DataFrame({'person_id':person_ids,
+                             'first_name':[str(self.first_names[code]) or None for code in codes],
+                             'family_name':[str(self.family_names[code]) or None for code in codes],
+                             'memberships':[self.person_memberships(person_id) for person_id in person_ids],
+                             'constituencies':[self.member_periods(person_id, 'constituency') for person_id in person_ids],
+                             'parties':[self.member_periods(person_id, 'party') for person_id in person_ids]},
+                            index=[position for position,person_id in rows])
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Hansard modules are imported from the hansard-in-full folder, as the notebooks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,126 @@
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+import pytest
+
+pytest.importorskip('requests')
+from hansard_downloader import download_debates,MANIFEST_FILENAME
+
+# A stand-in for the TheyWorkForYou debates archive - an index page linking each debate, which is served with an ETag
+debates = {f"debates2001-01-0{day}a.xml":f"<publicwhip><speech id='uk.org.publicwhip/debate/2001-01-0{day}a.1.0'/></publicwhip>".encode()
+           for day in range(1,6)}
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    # Each filename's first request fails as configured on the server, with Retry-After: 0
+    def do_GET(self):
+        filename = self.path.split('/')[-1]
+        with self.server.lock:
+            self.server.requests.append((filename,self.headers.get('If-None-Match')))
+            failure = self.server.failures.pop(filename, None)
+        if failure is not None:
+            self.send_response(failure)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if filename=='':
+            body = ''.join(f'<a href="{filename}">{filename}</a>\n' for filename in debates).encode()
+            etag = None
+        elif filename in debates:
+            body = debates[filename]
+            etag = f'"{filename}"'
+            if self.headers.get('If-None-Match')==etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def archive():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ArchiveHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = dict()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/debates/"
+
+def download(server, output_dir, **kwargs):
+    return download_debates(base_url=base_url(server), output_dir=str(output_dir), max_workers=4, requests_per_second=None,
+                            backoff=0.01, progress=False, **kwargs)
+
+def debate_requests(server):
+    return sorted(filename for filename,etag in server.requests if filename!='')
+
+def test_fresh_download(archive, tmp_path):
+    outcomes,errors = download(archive, tmp_path)
+    assert outcomes=={'downloaded':5, 'not_modified':0, 'skipped':0, 'failed':0} and errors=={}
+    for filename,body in debates.items():
+        assert (tmp_path/filename).read_bytes()==body
+    manifest = [json.loads(line) for line in (tmp_path/MANIFEST_FILENAME).read_text().splitlines()]
+    assert sorted(entry['filename'] for entry in manifest)==sorted(debates)
+    assert all(entry['etag']==f'"{entry["filename"]}"' and entry['size']==len(debates[entry['filename']]) for entry in manifest)
+    assert not any(filename.endswith('.tmp') for filename in os.listdir(tmp_path))
+
+def test_rerun_skips_downloaded_debates(archive, tmp_path):
+    download(archive, tmp_path)
+    archive.requests.clear()
+    outcomes,errors = download(archive, tmp_path)
+    assert outcomes=={'downloaded':0, 'not_modified':0, 'skipped':5, 'failed':0}
+    assert debate_requests(archive)==[] # ...only the index page is fetched
+
+def test_refresh_sends_conditional_requests(archive, tmp_path):
+    download(archive, tmp_path)
+    archive.requests.clear()
+    outcomes,errors = download(archive, tmp_path, refresh=True)
+    assert outcomes=={'downloaded':0, 'not_modified':5, 'skipped':0, 'failed':0}
+    assert sorted(archive.requests)==sorted([('',None)]+[(filename,f'"{filename}"') for filename in debates])
+
+def test_retries_transient_failures(archive, tmp_path):
+    archive.failures.update({'debates2001-01-01a.xml':503, 'debates2001-01-02a.xml':429, 'debates2001-01-03a.xml':502})
+    outcomes,errors = download(archive, tmp_path)
+    assert outcomes=={'downloaded':5, 'not_modified':0, 'skipped':0, 'failed':0} and errors=={}
+    assert debate_requests(archive)==sorted(list(debates)+['debates2001-01-01a.xml','debates2001-01-02a.xml','debates2001-01-03a.xml'])
+    assert (tmp_path/'debates2001-01-01a.xml').read_bytes()==debates['debates2001-01-01a.xml']
+
+def test_gives_up_after_retries(archive, tmp_path):
+    archive.failures.update({'debates2001-01-04a.xml':503})
+    outcomes,errors = download(archive, tmp_path, retries=0)
+    assert outcomes=={'downloaded':4, 'not_modified':0, 'skipped':0, 'failed':1}
+    assert list(errors)==[base_url(archive)+'debates2001-01-04a.xml']
+    assert not (tmp_path/'debates2001-01-04a.xml').exists()
+
+def test_resumes_from_truncated_manifest(archive, tmp_path):
+    # An interrupted run - two debates written and recorded, the second's manifest line cut short
+    download(archive, tmp_path)
+    lines = (tmp_path/MANIFEST_FILENAME).read_text().splitlines()
+    recorded = [json.loads(line)['filename'] for line in lines[:2]]
+    (tmp_path/MANIFEST_FILENAME).write_text(lines[0]+'\n'+lines[1][:len(lines[1])//2])
+    for filename in debates:
+        if filename!=recorded[0]:
+            os.remove(tmp_path/filename)
+    archive.requests.clear()
+
+    outcomes,errors = download(archive, tmp_path)
+    assert outcomes=={'downloaded':4, 'not_modified':0, 'skipped':1, 'failed':0}
+    assert debate_requests(archive)==sorted(filename for filename in debates if filename!=recorded[0])
+    # ...and the manifest is rewritten whole, one line per debate
+    manifest = [json.loads(line) for line in (tmp_path/MANIFEST_FILENAME).read_text().splitlines()]
+    assert sorted(entry['filename'] for entry in manifest)==sorted(debates)
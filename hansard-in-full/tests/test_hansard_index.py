@@ -0,0 +1,149 @@
+import os
+import sys
+import random
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+from hansard_index import HansardIndex,tokenise,encode_varints,decode_varints,index_speeches
+import hansard_index
+
+analysis_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'analysis')
+
+def test_tokenise_matches_clean():
+    # The index's tokeniser is a copy of the scorers' clean() - the two must split and lower-case every text alike
+    sys.path.insert(0, analysis_path)
+    try:
+        from scorers import cleaning
+    finally:
+        sys.path.remove(analysis_path)
+    assert hansard_index.punctuation==cleaning.punctuation
+    assert hansard_index.word_pattern.pattern==cleaning.word_pattern.pattern
+    rng = random.Random(0)
+    alphabet = list("abcXYZ 09\n\t\r'-.,£$ΣσςΑΙİıßé")+list(cleaning.punctuation)
+    for _ in range(20000):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0,20)))
+        assert tokenise(text)==cleaning.clean(text), repr(text)
+    assert tokenise(None)==[]
+
+def test_varints_round_trip():
+    values = np.array([0,1,127,128,255,16383,16384,2**31-1,2**40+5,3], dtype=np.int64)
+    encoded,n_bytes = encode_varints(values)
+    assert n_bytes.tolist()==[1,1,1,2,2,2,3,5,6,1] and len(encoded)==n_bytes.sum()
+    assert decode_varints(encoded).tolist()==values.tolist()
+    assert decode_varints(encode_varints(np.arange(100))[0]).tolist()==list(range(100))
+    assert decode_varints(encode_varints(np.zeros(0, dtype=np.int64))[0]).tolist()==[]
+
+vocabulary = ['the','house','of','commons','prime','minister','order','question','hon','member','bill','vote']
+parties = ['Labour','Conservative',None]
+
+def random_speeches(rng, n_speeches, prefix='s'):
+    return pd.DataFrame({'speech_id':[f"uk.org.publicwhip/debate/2001-01-{1+idx%28:02d}a.{prefix}{idx}" for idx in range(n_speeches)],
+                         'speech_date':[f"2001-01-{1+idx%28:02d}" if idx%17!=0 else None for idx in range(n_speeches)],
+                         'person_id':[rng.choice(['p1','p2','p3',None]) for _ in range(n_speeches)],
+                         'speech_party':[rng.choice(parties) for _ in range(n_speeches)],
+                         'text':[' '.join(rng.choice(vocabulary).capitalize() if rng.random()<0.1 else rng.choice(vocabulary)
+                                          for _ in range(rng.randint(0,30)))+rng.choice(['','.','?'])
+                                 for _ in range(n_speeches)]})
+
+speech_tokens = dict()
+
+def brute_force_search(df, query, mode, start=None, end=None, person_ids=None, parties=None):
+    # Matching speeches and the number of matches in each, by reading every speech
+    query_tokens = tokenise(query)
+    results = dict()
+    for speech in df.itertuples():
+        if speech.text not in speech_tokens:
+            speech_tokens[speech.text] = tokenise(speech.text)
+        tokens = speech_tokens[speech.text]
+        if mode=='phrase':
+            matches = sum(tokens[idx:idx+len(query_tokens)]==query_tokens for idx in range(len(tokens)))
+        else:
+            freqs = [tokens.count(token) for token in query_tokens]
+            matches = sum(freqs) if (all(freqs) if mode=='all' else any(freqs)) else 0
+        date = pd.Timestamp(speech.speech_date) if not pd.isna(speech.speech_date) else None
+        if start is not None and (date is None or date<pd.Timestamp(start)):
+            continue
+        if end is not None and (date is None or date>pd.Timestamp(end)):
+            continue
+        if person_ids is not None and speech.person_id not in person_ids:
+            continue
+        if parties is not None and speech.speech_party not in parties:
+            continue
+        if matches>0:
+            results[speech.speech_id] = matches
+    return results
+
+def random_queries(rng, n_queries):
+    for _ in range(n_queries):
+        query = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1,3)))
+        filters = rng.choice([{}, {'start':'2001-01-05','end':'2001-01-20'}, {'person_ids':['p1','p3']}, {'parties':['Labour']},
+                              {'end':'2001-01-10','parties':['Conservative','Labour']}])
+        yield query,rng.choice(['phrase','all','any']),filters
+
+def assert_matches_brute_force(index, df, rng, n_queries=100):
+    for query,mode,filters in random_queries(rng, n_queries):
+        results = index.search(query, mode, **filters)
+        assert dict(zip(results.speech_id, results.matches))==brute_force_search(df, query, mode, **filters), (query,mode,filters)
+        assert results.speech_date.is_monotonic_increasing or results.speech_date.isna().any()
+        assert index.count(query, mode, **filters)==len(results)
+
+def test_search_matches_brute_force(tmp_path):
+    rng = random.Random(1)
+    df = random_speeches(rng, 300)
+    index = HansardIndex(str(tmp_path/'index'))
+    # ...across several segments
+    for chunk_start in range(0, len(df), 100):
+        index.add(df.iloc[chunk_start:chunk_start+100])
+    assert len(index.segments)==3 and len(index)==300
+    assert_matches_brute_force(index, df, rng)
+
+    # The index reopens from disk just as it was
+    assert_matches_brute_force(HansardIndex(str(tmp_path/'index')), df, rng, n_queries=50)
+    assert index.search('order', parties=['Labour']).party.eq('Labour').all()
+    with pytest.raises(ValueError):
+        index.search('order', mode='near')
+    assert len(index.search('...'))==0
+
+def test_updates_supersede_and_compact(tmp_path):
+    rng = random.Random(2)
+    df = random_speeches(rng, 200)
+    index = HansardIndex(str(tmp_path/'index'))
+    index.add(df)
+
+    # A day's speeches parsed again, with new text, and a few new speeches - the new copies replace the old
+    update_df = random_speeches(rng, 20, prefix='new')
+    replaced = df.iloc[[3,4,40]].assign(text='a brand new speech about the vote')
+    index.add(pd.concat([replaced, update_df]))
+    current_df = pd.concat([df.drop(index=[3,4,40]), replaced, update_df])
+    assert len(index)==len(current_df)==220 and len(index.segments)==2
+    assert set(index.search('brand new speech').speech_id)==set(replaced.speech_id)
+    assert_matches_brute_force(index, current_df, rng)
+
+    # A third, small segment replacing speeches from both earlier ones
+    replaced_again = pd.concat([df.iloc[[5]], update_df.iloc[[0]]]).assign(text='order order')
+    index.add(replaced_again)
+    current_df = pd.concat([current_df[~current_df.speech_id.isin(replaced_again.speech_id)], replaced_again])
+    assert_matches_brute_force(index, current_df, rng)
+
+    # Compacting only the small segments keeps the large one, with its speeches replaced by the merged segment still superseded
+    index.compact(max_docs=50)
+    assert [len(segment) for segment in index.segments]==[200,24] and len(index)==len(current_df)
+    assert_matches_brute_force(index, current_df, rng)
+    assert_matches_brute_force(HansardIndex(str(tmp_path/'index')), current_df, rng, n_queries=50)
+
+    # ...and compacting everything leaves one segment of live speeches, and no leftover segment folders
+    index.compact()
+    assert len(index.segments)==1 and len(index.segments[0])==len(current_df) and not index.segments[0].deleted.any()
+    assert_matches_brute_force(index, current_df, rng)
+    assert sorted(name for name in os.listdir(str(tmp_path/'index')) if name.startswith('segment'))==[index.segments[0].name]
+    assert index.stats().live_speeches.tolist()==[len(current_df)]
+
+def test_index_speeches_from_csv(tmp_path):
+    rng = random.Random(3)
+    df = random_speeches(rng, 120)
+    csv_path = str(tmp_path/'hansard.csv')
+    df.to_csv(csv_path)
+    index = index_speeches(csv_path, str(tmp_path/'index'), segment_size=50, progress=False)
+    assert len(index.segments)==3 and len(index)==120
+    assert_matches_brute_force(index, df, rng, n_queries=50)
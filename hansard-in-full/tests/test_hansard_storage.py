@@ -0,0 +1,52 @@
+import pytest
+
+pd = pytest.importorskip('pandas')
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+from hansard_storage import write_dataset,convert_to_dataset,load_dataset
+
+# Speeches over two years, including one by the Speaker - with no party, so written to the null (__HIVE_DEFAULT_PARTITION__) partition
+speeches_df = pd.DataFrame({'speech_id':['s1','s2','s3','s4'],
+                            'person_id':['p1','p2','p3','p1'],
+                            'speech_party':['Labour',None,'Conservative','Labour'],
+                            'speech_date':['1997-05-14','1997-05-14','2005-06-01','2010-01-12'],
+                            'text':['First speech.','Order, order.','Third speech.','Fourth speech.']})
+
+def test_null_partition_round_trip(tmp_path):
+    root = str(tmp_path/'hansard_with_mp_details')
+    write_dataset(speeches_df, root, party_column='speech_party')
+
+    df = load_dataset(root).sort_values('speech_id').reset_index(drop=True)
+    assert df.speech_id.to_list()==['s1','s2','s3','s4']
+    assert df.speech_party.isna().to_list()==[False,True,False,False]
+    assert isinstance(df.speech_party.dtype, pd.CategoricalDtype)
+    assert df.year.to_list()==[1997,1997,2005,2010]
+    assert df.speech_date.to_list()==list(pd.to_datetime(speeches_df.speech_date))
+
+    df = load_dataset(root, columns=['speech_id','text'], years=(1997,2005))
+    assert sorted(df.speech_id)==['s1','s2','s3'] and list(df.columns)==['speech_id','text']
+    assert sorted(load_dataset(root, columns=['speech_id'], parties=['Labour']).speech_id)==['s1','s4']
+    assert load_dataset(root, filters=[('speech_party','=','Labour'),('year','>=',2000)]).speech_id.to_list()==['s4']
+
+def test_convert_csv_keeps_column_types(tmp_path):
+    csv_path = str(tmp_path/'hansard.csv')
+    df = speeches_df.assign(word_count=pd.array([2,2,2,None], dtype='Int64'), score=[0.5,None,1.25,2.0])
+    df.to_csv(csv_path)
+    root = str(tmp_path/'hansard')
+    # ...a chunk at a time, where a column's values in a later chunk would read as a different type on their own
+    assert convert_to_dataset(csv_path, root, party_column='speech_party', chunksize=2, progress=False)==4
+
+    # ...every file is written with the same types
+    schemas = [pq.read_schema(str(path)) for path in tmp_path.glob('hansard/**/*.parquet')]
+    assert len(schemas)==4
+    for schema in schemas:
+        assert schema.field('word_count').type==pa.int64() and schema.field('score').type==pa.float64()
+        assert schema.field('speech_id').type==pa.string() and schema.field('text').type==pa.large_string()
+
+    loaded_df = load_dataset(root).sort_values('speech_id').reset_index(drop=True)
+    assert 'Unnamed: 0' not in loaded_df.columns
+    assert loaded_df.word_count.to_list()[:3]==[2,2,2] and loaded_df.word_count.isna().to_list()==[False,False,False,True]
+    assert loaded_df.score.isna().sum()==1
+    assert loaded_df.speech_date.dtype.kind=='M'
+    assert isinstance(loaded_df.person_id.dtype, pd.CategoricalDtype)
+    assert loaded_df.text.to_list()==df.text.to_list()
@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip('lxml')
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+from hansard_xml_parser import iter_speeches,parse_hansard_file,parse_hansard_archive,columns
+
+memberid2personid_lookup = {'uk.org.publicwhip/member/1':'uk.org.publicwhip/person/10001'}
+
+def debate_xml(date, n_speeches):
+    # A debate file holding speeches tagged in each of the ways TheyWorkForYou does
+    speeches = [f'<speech id="uk.org.publicwhip/debate/{date}a.1.0" speakername="A Member" person_id="uk.org.publicwhip/person/10002">'
+                f'<p>First <i>paragraph</i>.</p><p>Second paragraph.</p></speech>',
+                f'<speech id="uk.org.publicwhip/debate/{date}a.1.1" speakername="Mr Speaker" speakerid="uk.org.publicwhip/member/1">'
+                f'<p>Order.</p></speech>',
+                f'<speech id="uk.org.publicwhip/debate/{date}a.1.2" speakerid="uk.org.publicwhip/member/1"><p>No name.</p></speech>',
+                f'<speech id="uk.org.publicwhip/debate/{date}a.1.3" speakername="Unknown" speakerid="uk.org.publicwhip/member/2"></speech>']
+    return f'<publicwhip><major-heading>Heading</major-heading>{"".join(speeches[:n_speeches])}</publicwhip>'
+
+@pytest.fixture
+def debate_paths(tmp_path):
+    paths = []
+    for date in ['2001-01-01','2001-01-02','2001-01-03']:
+        path = tmp_path/f"debates{date}a.xml"
+        path.write_text(debate_xml(date, 4))
+        paths.append(str(path))
+    return paths
+
+def test_iter_speeches(debate_paths):
+    speeches = list(iter_speeches(debate_paths[0], memberid2personid_lookup))
+    assert speeches==[('A Member','uk.org.publicwhip/debate/2001-01-01a.1.0','uk.org.publicwhip/person/10002','First paragraph.','2001-01-01'),
+                      # ...a speech tagged only with a member ID takes its person ID from the lookup
+                      ('Mr Speaker','uk.org.publicwhip/debate/2001-01-01a.1.1','uk.org.publicwhip/person/10001','Order.','2001-01-01'),
+                      # ...and a speech with no <p> has no text, and with an unknown member ID no person ID
+                      ('Unknown','uk.org.publicwhip/debate/2001-01-01a.1.3',None,None,'2001-01-01')]
+
+    # Speeches with no speaker name are only kept when asked for
+    speeches = parse_hansard_file(debate_paths[0], memberid2personid_lookup, filter_no_speaker=False)
+    assert speeches['name']==['A Member','Mr Speaker',None,'Unknown']
+    assert speeches['person_id'][2]=='uk.org.publicwhip/person/10001' and speeches['text'][2]=='No name.'
+
+@pytest.mark.parametrize('processes', [1,2])
+def test_archive_is_written_in_batches(debate_paths, tmp_path, processes):
+    # Three files of three speeches each - the buffer is flushed once it holds four or more, and what's left at the end
+    output_path = str(tmp_path/'hansard_in_full.parquet')
+    n_speeches = parse_hansard_archive(debate_paths, output_path, memberid2personid_lookup, batch_size=4, processes=processes, progress=False)
+    assert n_speeches==9
+
+    parquet_file = pq.ParquetFile(output_path)
+    assert [parquet_file.metadata.row_group(idx).num_rows for idx in range(parquet_file.num_row_groups)]==[6,3]
+    assert parquet_file.schema_arrow.names==columns and parquet_file.schema_arrow.field('speech_date').type==pa.date32()
+
+    table = parquet_file.read()
+    expected = [speech for path in debate_paths for speech in iter_speeches(path, memberid2personid_lookup)]
+    assert table['speech_id'].to_pylist()==[speech[1] for speech in expected] # ...in input order
+    assert table['person_id'].to_pylist()==[speech[2] for speech in expected]
+    assert [str(date) for date in table['speech_date'].to_pylist()]==[speech[4] for speech in expected]
+    assert not (tmp_path/'hansard_in_full.parquet.tmp').exists()
+
+def test_empty_archive(tmp_path):
+    path = tmp_path/'debates2001-01-01a.xml'
+    path.write_text('<publicwhip></publicwhip>')
+    output_path = str(tmp_path/'hansard_in_full.parquet')
+    assert parse_hansard_archive([str(path)], output_path, memberid2personid_lookup, processes=1, progress=False)==0
+    assert pq.read_table(output_path).num_rows==0
@@ -0,0 +1,76 @@
+import os
+import re
+import json
+import multiprocessing
+from pmqs_extraction import _is_pmqs_heading
+
+# Offline PMQs date discovery - see pmqs_finder.ipynb
+# Rather than searching the Hansard website a month at a time, scan the 'major-heading's of the debate XML already
+# downloaded for hansard-in-full, matching them against the same session names used to extract PMQs
+# Results are kept per file in a state file, so later runs only scan files that are new (or have changed) since the last run
+
+DEFAULT_DEBATES_FOLDER = '../hansard-in-full/debates_xml/'
+DEFAULT_STATE_PATH = 'pmqs_finder_state.json'
+
+# Debate files are named by sitting date, with a letter for each version of that day's record
+debate_filename_pattern = re.compile(r'debates(\d{4}-\d{2}-\d{2})[a-z]*\.xml$')
+
+def file_has_pmqs_heading(path):
+    # Stream a debate file's headings, stopping at the first that names a PMQs session
+    from lxml import etree
+    context = etree.iterparse(path, events=('end',), tag='major-heading', recover=True, huge_tree=True)
+    try:
+        for _,heading in context:
+            if _is_pmqs_heading(''.join(heading.itertext())):
+                return True
+            heading.clear()
+        return False
+    finally:
+        del context
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _load_state(state_path):
+    if state_path is None or not os.path.exists(state_path):
+        return dict()
+    with open(state_path) as file:
+        return json.load(file)
+
+def _save_state(state, state_path):
+    tmp_path = state_path+'.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(state, file)
+    os.replace(tmp_path, state_path)
+
+def find_pmqs_dates(debates_folder=DEFAULT_DEBATES_FOLDER, state_path=DEFAULT_STATE_PATH, processes=None, progress=True):
+    # Sorted dates of every debate file with a PMQs heading - only files not already in the state file (or changed since) are scanned
+    state = _load_state(state_path)
+    filenames = sorted(filename for filename in os.listdir(debates_folder) if debate_filename_pattern.match(filename))
+    signatures = {filename:_file_signature(os.path.join(debates_folder, filename)) for filename in filenames}
+    to_scan = [filename for filename in filenames if filename not in state or state[filename]['signature']!=signatures[filename]]
+
+    if len(to_scan)>0:
+        paths = [os.path.join(debates_folder, filename) for filename in to_scan]
+        if processes==1:
+            results = map(file_has_pmqs_heading, paths)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap(file_has_pmqs_heading, paths, chunksize=16)
+        if progress:
+            from tqdm import tqdm
+            results = tqdm(results, total=len(paths))
+        try:
+            for filename,has_pmqs in zip(to_scan, results):
+                state[filename] = {'signature':signatures[filename], 'has_pmqs':has_pmqs}
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if state_path is not None:
+                _save_state(state, state_path) # ...saving whatever was scanned, even if interrupted
+
+    dates = {debate_filename_pattern.match(filename).group(1) for filename in filenames if state[filename]['has_pmqs']}
+    return sorted(dates)
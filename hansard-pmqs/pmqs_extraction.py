@@ -0,0 +1,182 @@
+import bisect
+import multiprocessing
+from datetime import datetime
+
+# Streaming extraction of PMQs sessions from the daily debate XML - see pmqs_parser.ipynb
+# Each file is read in one pass over its top-level elements, which stops as soon as the PMQs session has been found,
+# and files are processed in parallel
+
+pmqs_session_name_list = ["prime minister's questions",
+                          "questions to the prime minister",
+                          "prime minister",
+                          "the prime minister",
+                          "oral answers to questions - prime minister",
+                          "oral answers to questions - the prime minister",
+                          "questions to the prime minister",
+                          "oral answers to questions - questions to the prime minister",
+                          "oral answers to questions - questions to prime minister",
+                          "prime minister (engagements)",
+                          "oral answers to questions - prime minister (engagements)"]
+
+# Sitting Prime Ministers, in order, with the dates they took office - the last is in office until today
+pm_list = [['Robert Gascoyne-Cecil','1895-06-25'],
+           ['Arthur Balfour','1902-07-12'],
+           ['Henry Campbell-Bannerman','1905-12-05'],
+           ['H.H. Asquith','1908-04-04'],
+           ['David Lloyd George','1916-12-06'],
+           ['Andrew Bonar Law','1922-10-20'],
+           ['Stanley Baldwin','1923-05-21'],
+           ['Ramsay MacDonald','1924-01-23'],
+           ['Stanley Baldwin','1924-11-05'],
+           ['Ramsay MacDonald','1929-06-05'],
+           ['Stanley Baldwin','1935-06-08'],
+           ['Neville Chamberlain','1937-05-29'],
+           ['Winston Churchill','1940-05-10'],
+           ['Clement Attlee','1945-07-27'],
+           ['Winston Churchill','1951-10-27'],
+           ['Anthony Eden','1955-04-06'],
+           ['Harold Macmillan','1957-01-10'],
+           ['Alec Douglas-Home','1963-10-19'],
+           ['Harold Wilson','1964-10-17'],
+           ['Edward Heath','1970-06-20'],
+           ['Harold Wilson','1974-03-05'],
+           ['James Callaghan','1976-04-06'],
+           ['Margaret Thatcher','1979-05-05'],
+           ['John Major','1990-11-29'],
+           ['Tony Blair','1997-05-03'],
+           ['Gordon Brown','2007-06-28'],
+           ['David Cameron','2010-05-12'],
+           ['Theresa May','2016-07-14'],
+           ['Boris Johnson','2019-07-25']]
+pm_term_starts = [start_date for pm,start_date in pm_list]
+
+def sitting_prime_minister(date):
+    # Each term runs until the day before the next starts, so the sitting PM is found by binary search on the start dates
+    idx = bisect.bisect_right(pm_term_starts, date)-1
+    current_day = datetime.strftime(datetime.now(), format="%Y-%m-%d")
+    if idx<0 or (idx==len(pm_list)-1 and date>current_day):
+        raise IndexError(f"No sitting Prime Minister on {date}")
+    return pm_list[idx][0]
+
+def _is_pmqs_heading(heading_text):
+    # Every session name also contains 'prime minister', so that check alone picks out the same headings
+    heading_text = heading_text.lower()
+    return heading_text.strip() in pmqs_session_name_list or 'prime minister' in heading_text
+
+def find_pmqs_session(path, threshold=5):
+    # Return the top-level elements of the first PMQs session in a debate file, or None - as find_pmqs_session_in_hansard()
+    # The session runs from the first PMQs 'major-heading' up to the next one, or if that comes within threshold elements
+    # (a double-headed section), up to the one after - and is None if the file ends before that heading
+    from lxml import etree
+    context = etree.iterparse(path, events=('start','end'), recover=True, huge_tree=True)
+    depth,root = 0,None
+    session,headings_in_session = None,0
+    try:
+        for event,elem in context:
+            if event=='start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth!=1:
+                continue # ...only top-level elements are considered, once they've been read in full
+
+            is_heading = elem.tag=='major-heading'
+            if session is None:
+                if is_heading and _is_pmqs_heading(''.join(elem.itertext())):
+                    session = []
+                # Nothing before the session is needed
+                elem.clear()
+                root.remove(elem)
+                continue
+
+            if is_heading:
+                if headings_in_session==0 and len(session)<threshold:
+                    headings_in_session = 1 # ...a double-headed section, so read on to the following heading
+                else:
+                    return session
+            session.append(elem)
+        return None
+    finally:
+        del context
+
+def _speaker_details(speech_xml, memberid2personid_lookup):
+    # (person_id, speakername, text) of a speech - or Nones if it has no speaker
+    if speech_xml is None or speech_xml.get('speakername') is None:
+        return None,None,None
+    person_id = speech_xml.get('person_id')
+    if person_id is None:
+        person_id = memberid2personid_lookup.get(speech_xml.get('speakerid'))
+    return person_id,speech_xml.get('speakername'),''.join(speech_xml.itertext())
+
+def parse_pmqs_session(list_of_xml, date, memberid2personid_lookup):
+    # Question/answer pairs from a PMQs session - as parse_pmqs_session() in pmqs_parser.ipynb, returning a dict of column lists
+    pmqs = {'questioner_id':[],
+            'questioner_name':[],
+            'question_text':[],
+            'answerer_id':[],
+            'answerer_name':[],
+            'answer_text':[]}
+
+    sitting_prime_minister_name = sitting_prime_minister(date).lower()
+    for idx,answer in enumerate(list_of_xml):
+        # Find entries in PMQs where the Prime Minister speaks
+        speakername = answer.get('speakername')
+        if speakername is not None and ('prime minister' in speakername.lower() or sitting_prime_minister_name in speakername.lower()):
+            # The question is the line preceding the answer - as in the original, an answer opening the session pairs with its last line
+            question = list_of_xml[idx-1]
+            questioner_id,questioner_name,question_text = _speaker_details(question, memberid2personid_lookup)
+            answerer_id,answerer_name,answer_text = _speaker_details(answer, memberid2personid_lookup)
+            for variable,value in zip(pmqs.keys(), [questioner_id,questioner_name,question_text,answerer_id,answerer_name,answer_text]):
+                pmqs[variable].append(value)
+    return pmqs
+
+def extract_pmqs_file(path, date, memberid2personid_lookup, threshold=5):
+    # PMQs question/answer pairs from one debate file, with the date of the session - None if it has no PMQs session
+    session = find_pmqs_session(path, threshold)
+    if session is None:
+        return None
+    pmqs = parse_pmqs_session(session, date, memberid2personid_lookup)
+    pmqs['date'] = [date]*len(pmqs['questioner_id'])
+    return pmqs
+
+# Workers receive the lookup once, when they start, rather than with every file
+_worker_lookup = None
+_worker_threshold = 5
+
+def _init_worker(memberid2personid_lookup, threshold):
+    global _worker_lookup,_worker_threshold
+    _worker_lookup = memberid2personid_lookup
+    _worker_threshold = threshold
+
+def _extract_pmqs_task(args):
+    path,date = args
+    return extract_pmqs_file(path, date, _worker_lookup, _worker_threshold)
+
+def extract_pmqs(paths, dates, memberid2personid_lookup, threshold=5, processes=None, progress=True):
+    # Extract PMQs from each (path, date) across a pool of workers (processes=1 works in this process), returning a DataFrame in input order
+    import pandas as pd
+    tasks = list(zip(paths, dates))
+    if processes==1:
+        results = (extract_pmqs_file(path, date, memberid2personid_lookup, threshold) for path,date in tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(memberid2personid_lookup,threshold))
+        results = pool.imap(_extract_pmqs_task, tasks, chunksize=4)
+    if progress:
+        from tqdm import tqdm
+        results = tqdm(results, total=len(tasks))
+
+    columns = ['questioner_id','questioner_name','question_text','answerer_id','answerer_name','answer_text','date']
+    df_dict = {column:[] for column in columns}
+    try:
+        for pmqs in results:
+            if pmqs is not None:
+                for column in columns:
+                    df_dict[column].extend(pmqs[column])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return pd.DataFrame(df_dict)
@@ -0,0 +1,160 @@
+import os
+import io
+import json
+import time
+import hashlib
+import multiprocessing
+
+# Batch OCR of Election Leaflets images - see img_to_text.ipynb
+# Images come from a folder or a manifest (of paths or URLs), and are OCRed with tesseract across a pool of workers
+# Each image is downscaled and binarised before OCR, and rotated upright using tesseract's orientation detection
+# Text is cached by a hash of the image (and the OCR settings), so re-runs skip leaflets already done
+
+DEFAULT_CACHE_DIR = 'ocr_cache'
+# Longest side an image is scaled down to before OCR - leaflets scanned at higher resolution gain little but take far longer
+DEFAULT_MAX_SIDE = 2000
+image_extensions = ('.jpg','.jpeg','.png','.tif','.tiff','.bmp','.gif','.webp')
+
+# Stages timed for each image
+stages = ['load','preprocess','orientation','ocr']
+
+def list_images(source):
+    # Image paths (or URLs) from a folder - searched recursively - or a manifest file with one per line (or a CSV with a 'path' column)
+    if os.path.isdir(source):
+        return sorted(os.path.join(folder, filename) for folder,_,filenames in os.walk(source)
+                      for filename in filenames if filename.lower().endswith(image_extensions))
+    if source.endswith('.csv'):
+        import pandas as pd
+        return pd.read_csv(source)['path'].dropna().to_list()
+    with open(source) as file:
+        return [line.strip() for line in file if line.strip()!='']
+
+def read_image_bytes(source):
+    if source.startswith('http://') or source.startswith('https://'):
+        import requests
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        return response.content
+    with open(source, 'rb') as file:
+        return file.read()
+
+def otsu_threshold(pixels):
+    # Grey level best separating ink from paper - maximising the between-class variance of the histogram
+    import numpy as np
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram*np.arange(256))
+    total_weight,total_mean = weights[-1],means[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variances = (total_mean*weights-means*total_weight)**2/(weights*(total_weight-weights))
+    # A blank page has a single grey level, and nothing to separate - split it at mid-grey
+    if np.isnan(variances).all():
+        return 127
+    return int(np.nanargmax(variances))
+
+def preprocess(image, max_side=DEFAULT_MAX_SIDE, binarise=True):
+    # Greyscale, downscale so the longest side is at most max_side, then binarise with Otsu's threshold
+    import numpy as np
+    from PIL import Image
+    image = image.convert('L')
+    scale = max_side/max(image.size) if max_side is not None else 1
+    if scale<1:
+        image = image.resize((round(image.width*scale),round(image.height*scale)), Image.LANCZOS)
+    if binarise:
+        pixels = np.asarray(image)
+        image = Image.fromarray(np.where(pixels>otsu_threshold(pixels), 255, 0).astype(np.uint8))
+    return image
+
+def detect_rotation(image):
+    # Degrees clockwise the image needs turning to be upright, from tesseract's orientation and script detection
+    # ...0 where there's too little text to tell
+    import pytesseract
+    try:
+        return int(pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)['rotate'])
+    except pytesseract.TesseractError:
+        return 0
+
+def cache_key(image_bytes, settings):
+    return hashlib.sha256(image_bytes+json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+def ocr_image(source, cache_dir=DEFAULT_CACHE_DIR, max_side=DEFAULT_MAX_SIDE, binarise=True, detect_orientation=True,
+              lang='eng', config=''):
+    # OCR one image, returning a dict of its text, whether it came from the cache, the rotation applied and the time spent in each stage
+    import pytesseract
+    timings = dict.fromkeys(stages, 0.0)
+
+    start = time.perf_counter()
+    image_bytes = read_image_bytes(source)
+    settings = {'max_side':max_side, 'binarise':binarise, 'detect_orientation':detect_orientation, 'lang':lang, 'config':config}
+    key = cache_key(image_bytes, settings)
+    cache_path = os.path.join(cache_dir, key+'.json') if cache_dir is not None else None
+    timings['load'] = time.perf_counter()-start
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as file:
+            cached = json.load(file)
+        return {'path':source, 'hash':key, 'text':cached['text'], 'rotation':cached['rotation'], 'cached':True, **timings}
+
+    from PIL import Image # ...only once the image isn't cached
+    start = time.perf_counter()
+    image = preprocess(Image.open(io.BytesIO(image_bytes)), max_side, binarise)
+    timings['preprocess'] = time.perf_counter()-start
+
+    rotation = 0
+    if detect_orientation:
+        start = time.perf_counter()
+        rotation = detect_rotation(image)
+        if rotation!=0:
+            image = image.rotate(-rotation, expand=True, fillcolor=255) # ...PIL rotates anticlockwise
+        timings['orientation'] = time.perf_counter()-start
+
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(image, lang=lang, config=config)
+    timings['ocr'] = time.perf_counter()-start
+
+    if cache_path is not None:
+        tmp_path = cache_path+'.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'path':source, 'text':text, 'rotation':rotation}, file)
+        os.replace(tmp_path, cache_path)
+    return {'path':source, 'hash':key, 'text':text, 'rotation':rotation, 'cached':False, **timings}
+
+def _init_worker(tesseract_cmd):
+    # One tesseract thread per worker - the pool already keeps every core busy, and OpenMP threads would only contend
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    if tesseract_cmd is not None:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+def _ocr_task(args):
+    source,kwargs = args
+    try:
+        return ocr_image(source, **kwargs)
+    except Exception as error:
+        return {'path':source, 'error':repr(error)}
+
+def ocr_images(source, processes=None, tesseract_cmd=None, cache_dir=DEFAULT_CACHE_DIR, progress=True, **kwargs):
+    # OCR every image in a folder or manifest across a pool of workers, returning a DataFrame with one row per image
+    # ...holding its text and the seconds spent in each stage - images that failed have an 'error' instead
+    import pandas as pd
+    paths = list_images(source) if isinstance(source, str) else list(source)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    kwargs['cache_dir'] = cache_dir
+    tasks = [(path,kwargs) for path in paths]
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(tesseract_cmd,)) as pool:
+        results = pool.imap(_ocr_task, tasks, chunksize=1) # ...OCR time varies widely by leaflet, so hand out one at a time
+        if progress:
+            from tqdm import tqdm
+            results = tqdm(results, total=len(tasks))
+        results_df = pd.DataFrame(list(results))
+    return results_df
+
+def timing_summary(results_df):
+    # Total and mean seconds spent in each stage, over the images actually OCRed (cached images only spend time loading)
+    import pandas as pd
+    stage_columns = [stage for stage in stages if stage in results_df.columns]
+    ocred = results_df[results_df.cached==False] if 'cached' in results_df.columns else results_df.iloc[:0]
+    summary = pd.DataFrame({'total_seconds':results_df[stage_columns].sum(),
+                            'mean_seconds_per_ocred_image':ocred[stage_columns].mean()})
+    summary['share_of_total'] = summary.total_seconds/summary.total_seconds.sum()
+    return summary
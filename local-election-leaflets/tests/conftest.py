@@ -0,0 +1,34 @@
+import os
+import sys
+import types
+import pytest
+
+# batch_ocr is imported from the local-election-leaflets folder, as the notebook does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class _TesseractError(Exception):
+    pass
+
+@pytest.fixture
+def stub_pytesseract(monkeypatch):
+    # A stand-in for pytesseract, so the OCR pipeline can be tested without tesseract
+    # ...image_to_osd reports the rotation set on it (or fails, like tesseract on a page with too little text, if it's None),
+    #    and image_to_string records every image it's given
+    tesseract = types.ModuleType('pytesseract')
+    tesseract.Output = types.SimpleNamespace(DICT='dict')
+    tesseract.TesseractError = _TesseractError
+    tesseract.pytesseract = types.SimpleNamespace(tesseract_cmd='tesseract')
+    tesseract.rotation = 0
+    tesseract.osd_images,tesseract.ocr_images = [],[]
+    def image_to_osd(image, output_type=None):
+        tesseract.osd_images.append(image)
+        if tesseract.rotation is None:
+            raise _TesseractError(1, 'Too few characters')
+        return {'rotate':tesseract.rotation, 'orientation':(360-tesseract.rotation)%360}
+    def image_to_string(image, lang='eng', config=''):
+        tesseract.ocr_images.append(image)
+        return f"text of a {image.width}x{image.height} image"
+    tesseract.image_to_osd = image_to_osd
+    tesseract.image_to_string = image_to_string
+    monkeypatch.setitem(sys.modules, 'pytesseract', tesseract)
+    return tesseract
@@ -0,0 +1,132 @@
+import io
+import os
+import json
+import numpy as np
+import pytest
+
+pd = pytest.importorskip('pandas')
+from batch_ocr import otsu_threshold,cache_key,list_images,timing_summary,ocr_image,stages
+
+def between_class_variance(pixels, threshold):
+    dark,light = pixels[pixels<=threshold],pixels[pixels>threshold]
+    if len(dark)==0 or len(light)==0:
+        return 0.0
+    return len(dark)*len(light)*(dark.mean()-light.mean())**2
+
+def test_otsu_threshold_maximises_between_class_variance():
+    rng = np.random.default_rng(0)
+    for n in range(20):
+        # Dark ink on light paper, with noise - and a few images of uniform noise
+        ink = rng.normal(rng.uniform(20,100), 15, 2000) if n<15 else rng.uniform(0, 255, 2000)
+        paper = rng.normal(rng.uniform(150,240), 15, 8000) if n<15 else rng.uniform(0, 255, 8000)
+        pixels = np.clip(np.concatenate([ink,paper]), 0, 255).astype(np.uint8).reshape(100,100)
+        variances = [between_class_variance(pixels.ravel().astype(np.float64), threshold) for threshold in range(256)]
+        threshold = otsu_threshold(pixels)
+        assert np.isclose(variances[threshold], max(variances), rtol=1e-9)
+        if n<15:
+            assert np.percentile(ink, 90)<threshold<np.percentile(paper, 10)
+
+def test_otsu_threshold_of_two_and_one_grey_levels():
+    pixels = np.array([[0,0,255],[255,255,255]], dtype=np.uint8)
+    assert 0<=otsu_threshold(pixels)<255
+    # A blank page keeps its colour once binarised
+    for level in [0,255]:
+        assert (np.full((4,4), level, dtype=np.uint8)>otsu_threshold(np.full((4,4), level, dtype=np.uint8))).all()==(level==255)
+
+def test_cache_key_is_stable():
+    settings = {'max_side':2000, 'binarise':True, 'detect_orientation':True, 'lang':'eng', 'config':''}
+    key = cache_key(b'leaflet', settings)
+    assert len(key)==64 and int(key, 16)>=0
+    # ...across processes and runs, and whatever order the settings are given in
+    assert key==cache_key(b'leaflet', dict(reversed(list(settings.items()))))
+    assert key=='c49aa8c5dc9facbce8464aad8f04e09785d20b6164fbf87600ed1b64a1728b9c'
+    # ...but changes with the image and with every setting
+    assert key!=cache_key(b'leaflet ', settings)
+    for name,value in [('max_side',1000),('binarise',False),('detect_orientation',False),('lang','cym'),('config','--psm 6')]:
+        assert key!=cache_key(b'leaflet', {**settings, name:value})
+
+def test_list_images_from_a_folder(tmp_path):
+    for name in ['b.JPG','a.png','notes.txt','scans/c.tiff','scans/d.jpeg','scans/thumbs.db','scans/more/e.webp']:
+        path = tmp_path/name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+    assert list_images(str(tmp_path))==[os.path.join(str(tmp_path), name) for name in
+                                         ['a.png','b.JPG','scans/c.tiff','scans/d.jpeg','scans/more/e.webp']]
+
+def test_list_images_from_a_manifest(tmp_path):
+    pd.DataFrame({'leaflet_id':[1,2,3,4],
+                  'path':['https://example.com/1.jpg',None,'leaflets/3.png','leaflets/4 (back).png']}).to_csv(tmp_path/'manifest.csv', index=False)
+    assert list_images(str(tmp_path/'manifest.csv'))==['https://example.com/1.jpg','leaflets/3.png','leaflets/4 (back).png']
+    (tmp_path/'manifest.txt').write_text('https://example.com/1.jpg\n\nleaflets/3.png  \n\n')
+    assert list_images(str(tmp_path/'manifest.txt'))==['https://example.com/1.jpg','leaflets/3.png']
+
+def test_timing_summary():
+    results_df = pd.DataFrame([{'path':'a', 'cached':False, 'load':0.1, 'preprocess':0.5, 'orientation':1.0, 'ocr':2.0},
+                               {'path':'b', 'cached':True, 'load':0.3, 'preprocess':0.0, 'orientation':0.0, 'ocr':0.0},
+                               {'path':'c', 'cached':False, 'load':0.2, 'preprocess':0.7, 'orientation':3.0, 'ocr':4.0},
+                               {'path':'d', 'error':"FileNotFoundError('d')"}])
+    summary = timing_summary(results_df)
+    assert summary.index.to_list()==stages
+    assert np.allclose(summary.total_seconds, [0.6,1.2,4.0,6.0])
+    # Means are over the images actually OCRed - not the cached image, nor the one that failed
+    assert np.allclose(summary.mean_seconds_per_ocred_image, [0.15,0.6,2.0,3.0])
+    assert np.isclose(summary.share_of_total.sum(), 1) and np.isclose(summary.share_of_total['ocr'], 6.0/11.8)
+    # ...and where every image was cached, the means are NaN
+    summary = timing_summary(results_df[results_df.path=='b'])
+    assert np.allclose(summary.total_seconds, [0.3,0,0,0]) and summary.mean_seconds_per_ocred_image.isna().all()
+
+def test_cached_images_skip_ocr(stub_pytesseract, tmp_path):
+    image_path = tmp_path/'leaflet.png'
+    image_path.write_bytes(b'not even an image - a cached result never opens it')
+    settings = {'max_side':2000, 'binarise':True, 'detect_orientation':True, 'lang':'eng', 'config':''}
+    key = cache_key(image_path.read_bytes(), settings)
+    (tmp_path/(key+'.json')).write_text(json.dumps({'path':str(image_path), 'text':'Vote for me', 'rotation':90}))
+
+    result = ocr_image(str(image_path), cache_dir=str(tmp_path))
+    assert result['cached'] and result['text']=='Vote for me' and result['rotation']==90 and result['hash']==key
+    assert result['preprocess']==result['orientation']==result['ocr']==0.0
+    assert stub_pytesseract.osd_images==[] and stub_pytesseract.ocr_images==[]
+
+def upright_leaflet():
+    # A wide page with a black block in its top left corner, so every rotation and reflection of it is distinct
+    from PIL import Image
+    pixels = np.full((30,60), 255, dtype=np.uint8)
+    pixels[2:10,3:20] = 0
+    return Image.fromarray(pixels)
+
+@pytest.mark.parametrize('rotation', [0,90,180,270])
+def test_osd_rotation_turns_the_page_upright(stub_pytesseract, tmp_path, rotation):
+    pytest.importorskip('PIL')
+    upright = upright_leaflet()
+    # tesseract's 'rotate' is how far clockwise the page must turn to be upright - so scan it turned that far anticlockwise,
+    # ...as PIL's rotate() turns it
+    scanned = upright.rotate(rotation, expand=True)
+    image_path = tmp_path/'leaflet.png'
+    buffer = io.BytesIO()
+    scanned.save(buffer, format='PNG')
+    image_path.write_bytes(buffer.getvalue())
+
+    stub_pytesseract.rotation = rotation
+    result = ocr_image(str(image_path), cache_dir=str(tmp_path/'cache'))
+    assert not result['cached'] and result['rotation']==rotation
+    assert np.array_equal(np.asarray(stub_pytesseract.osd_images[0]), np.asarray(scanned))
+    assert np.array_equal(np.asarray(stub_pytesseract.ocr_images[0]), np.asarray(upright))
+
+    # The result is cached, so the page is only OCRed once
+    cached = ocr_image(str(image_path), cache_dir=str(tmp_path/'cache'))
+    assert cached['cached'] and cached['text']==result['text'] and cached['rotation']==rotation
+    assert len(stub_pytesseract.osd_images)==len(stub_pytesseract.ocr_images)==1
+
+def test_failed_orientation_detection_leaves_the_page(stub_pytesseract, tmp_path):
+    pytest.importorskip('PIL')
+    scanned = upright_leaflet().rotate(90, expand=True)
+    image_path = tmp_path/'leaflet.png'
+    scanned.save(str(image_path))
+    stub_pytesseract.rotation = None
+    result = ocr_image(str(image_path), cache_dir=None)
+    assert result['rotation']==0
+    assert np.array_equal(np.asarray(stub_pytesseract.ocr_images[0]), np.asarray(scanned))
+    # ...and with orientation detection off, tesseract isn't asked
+    stub_pytesseract.osd_images.clear()
+    assert ocr_image(str(image_path), cache_dir=None, detect_orientation=False)['rotation']==0
+    assert stub_pytesseract.osd_images==[]